@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+
+import glob
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import List, Set, Callable, Tuple, Optional
+
+from main import UrlRegex, Util, TEIReader, Validator, Document, EXTRACTORS, ANNOTATORS, get_extractor, run_command
+
+
+def read_texts(text_dir: str) -> List[str]:
+  texts = []
+  for fp in sorted(glob.glob(f'{text_dir}/*.txt')):
+    with open(fp, 'r', encoding='utf-8') as f:
+      texts.append(f.read())
+  return texts
+
+
+def measure(fn: Callable[[], object], rounds: int) -> float:
+  # return the best time of several rounds, to reduce noise
+  best = float('inf')
+  for _ in range(rounds):
+    time_start = time.perf_counter()
+    fn()
+    best = min(best, time.perf_counter() - time_start)
+  return best
+
+
+def bench_tld(text_dir: str, rounds: int):
+  """
+  Compare per-MB scan time of URL regexes using the trie-structured TLD regex against a plain TLD alternation
+
+  """
+  texts = read_texts(text_dir)
+  size_mb = sum(len(text.encode('utf-8')) for text in texts) / 2 ** 20
+  legacy_tld = rf"({r'|'.join(Util.read_tld_list())})"
+  print(f'corpus: {len(texts)} files, {size_mb:.3f} MB')
+  print(f"{'option':>6} {'pattern':>8} {'matches':>8} {'before (s/MB)':>14} {'after (s/MB)':>13} {'speedup':>8}")
+  for option in [1, 2, 3, 4]:
+    before = UrlRegex.get_url_regex(option, tld=legacy_tld)
+    after = UrlRegex.get_url_regex(option)
+    for name, r_before, r_after in zip(['FULL', 'PARTIAL'], before, after):
+      m_before = [m.span() for text in texts for m in r_before.finditer(text)]
+      m_after = [m.span() for text in texts for m in r_after.finditer(text)]
+      assert m_before == m_after, f'option {option} ({name}) gives different matches'
+      t_before = measure(lambda: [m for text in texts for m in r_before.finditer(text)], rounds) / size_mb
+      t_after = measure(lambda: [m for text in texts for m in r_after.finditer(text)], rounds) / size_mb
+      print(f'{option:>6} {name:>8} {len(m_after):>8} {t_before:>14.4f} {t_after:>13.4f} {t_before / t_after:>7.1f}x')
+
+
+def measure_peak(fn: Callable[[], object]) -> float:
+  # return the peak memory allocated by Python objects while running fn, in MB
+  tracemalloc.start()
+  try:
+    fn()
+    return tracemalloc.get_traced_memory()[1] / 2 ** 20
+  finally:
+    tracemalloc.stop()
+
+
+def generate_urls(n: int, seed: int = 0) -> Set[str]:
+  """
+  Generate a synthetic pool of canonical URLs, where some URLs are prefixes or hosts of others (as in reference
+  lists that cite several pages of the same site)
+
+  """
+  rnd = random.Random(seed)
+  words = [''.join(rnd.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rnd.randint(2, 8))) for _ in range(500)]
+  hosts = [f"{rnd.choice(['', 'www.'])}{rnd.choice(words)}.{rnd.choice(['com', 'org', 'edu', 'io'])}"
+           for _ in range(max(n // 10, 1))]
+  urls = set()
+  while len(urls) < n:
+    path = '/'.join(rnd.choice(words) for _ in range(rnd.randint(0, 5)))
+    urls.add(f"https://{rnd.choice(hosts)}/{path}".rstrip('/'))
+  return urls
+
+
+def bench_dedupe(_: str, rounds: int):
+  """
+  Compare the scaling of URL deduplication (pick_uniq_urls, pick_new_urls) using the Aho-Corasick index against
+  pairwise substring tests
+
+  """
+
+  def pick_uniq_pairwise(pool: Set[str], prefer_long=False):
+    uniq_urls = set()
+    for url in sorted(pool, key=len, reverse=prefer_long):
+      if not Util.has_match(url, uniq_urls):
+        uniq_urls.add(url)
+    return uniq_urls
+
+  def pick_new_pairwise(pool: Set[str], blacklist: Set[str]):
+    return set(url for url in pool if not Util.has_match(url, blacklist))
+
+  print(f"{'urls':>7} {'function':>14} {'pairwise (s)':>13} {'indexed (s)':>12} {'speedup':>8}")
+  for n in [100, 1000, 10000, 100000]:
+    pool = generate_urls(n, seed=n)
+    blacklist = generate_urls(max(n // 10, 1), seed=n + 1)
+    cases = [
+      ('uniq (short)', lambda: Util.pick_uniq_urls(pool), lambda: pick_uniq_pairwise(pool)),
+      ('uniq (long)', lambda: Util.pick_uniq_urls(pool, True), lambda: pick_uniq_pairwise(pool, True)),
+      ('new', lambda: Util.pick_new_urls(pool, blacklist), lambda: pick_new_pairwise(pool, blacklist)),
+    ]
+    for name, indexed, pairwise in cases:
+      t_indexed = measure(indexed, rounds)
+      # pairwise tests take hours beyond 10k URLs
+      if n <= 10000:
+        assert indexed() == pairwise(), f'{name} gives different URLs for {n} URLs'
+        t_pairwise = measure(pairwise, 1)
+        print(f'{n:>7} {name:>14} {t_pairwise:>13.4f} {t_indexed:>12.4f} {t_pairwise / t_indexed:>7.1f}x')
+      else:
+        print(f"{n:>7} {name:>14} {'-':>13} {t_indexed:>12.4f} {'-':>8}")
+
+
+def generate_tei(tei_xml: str, n: int) -> str:
+  """
+  Generate a large TEI-XML document by repeating the body of a given one (e.g. to resemble a long thesis)
+
+  """
+  start = tei_xml.index('<body>') + len('<body>')
+  end = tei_xml.index('</body>')
+  return tei_xml[:start] + tei_xml[start:end] * n + tei_xml[end:]
+
+
+def bench_tei(text_dir: str, rounds: int):
+  """
+  Compare time and peak memory of reading pointer targets and full text from TEI-XML with the streaming reader
+  (one pass, no tree) against BeautifulSoup (two soup trees, as GROBExtractor did)
+
+  """
+  import bs4
+
+  def read_soup(tei_xml: str) -> Tuple[List[str], str]:
+    targets = [m['target'] for m in bs4.BeautifulSoup(tei_xml, 'lxml-xml').find_all('ptr', {'target': True})]
+    text = "\n".join(bs4.BeautifulSoup(tei_xml, 'lxml-xml').find_all(string=True))
+    return targets, text
+
+  def read_stream(tei_xml: str) -> Tuple[List[str], str]:
+    tei = TEIReader.read(tei_xml)
+    return tei.targets, "\n".join(tei.strings)
+
+  # use the TEI-XML with the longest body
+  texts = []
+  for fp in glob.glob(f'{text_dir}/*-GROB.txt'):
+    with open(fp, 'r', encoding='utf-8') as f:
+      texts.append(f.read())
+  texts = [text for text in texts if '</body>' in text]
+  if len(texts) == 0:
+    raise FileNotFoundError(f'No TEI-XML (*-GROB.txt) with a body in {text_dir}')
+  base = max(texts, key=lambda t: t.index('</body>') - t.index('<body>'))
+
+  print(f"{'size (MB)':>9} {'ptrs':>6} {'soup (s)':>9} {'stream (s)':>11} {'speedup':>8} {'soup peak (MB)':>15} "
+        f"{'stream peak (MB)':>17}")
+  for n in [1, 10, 50]:
+    tei_xml = generate_tei(base, n)
+    size_mb = len(tei_xml.encode('utf-8')) / 2 ** 20
+    soup, stream = read_soup(tei_xml), read_stream(tei_xml)
+    assert sorted(soup[0]) == sorted(stream[0]) and soup[1] == stream[1], f'readers differ for {n} copies'
+    t_soup = measure(lambda: read_soup(tei_xml), rounds)
+    t_stream = measure(lambda: read_stream(tei_xml), rounds)
+    m_soup = measure_peak(lambda: read_soup(tei_xml))
+    m_stream = measure_peak(lambda: read_stream(tei_xml))
+    print(f'{size_mb:>9.2f} {len(stream[0]):>6} {t_soup:>9.4f} {t_stream:>11.4f} {t_soup / t_stream:>7.1f}x '
+          f'{m_soup:>15.1f} {m_stream:>17.1f}')
+
+
+def bench_harvest(text_dir: str, rounds: int):
+  """
+  Compare per-MB harvest time, and peak memory of finding URLs in (simplified) full text, with the scanner (label
+  anchored partial URLs, no augmented copy) against matching both patterns over the augmented text
+
+  """
+  from unidecode import unidecode
+
+  def find_augmented(text: str, regex: UrlRegex) -> Set[str]:
+    text = Util.augment(text)
+    urls = set()
+    for r in [regex.FULL_URL, regex.PARTIAL_URL]:
+      urls.update(Util.canonicalize_url(m.group()) for m in r.finditer(text))
+    return urls
+
+  def harvest_augmented(text: str, regex: UrlRegex) -> Set[str]:
+    return Validator().get_valid_urls(find_augmented(unidecode(text), regex))
+
+  texts = read_texts(text_dir)
+  size_mb = sum(len(text.encode('utf-8')) for text in texts) / 2 ** 20
+  # peak memory is measured on the largest text
+  text = unidecode(max(texts, key=len))
+  print(f'corpus: {len(texts)} files, {size_mb:.3f} MB')
+  print(f"{'option':>6} {'urls':>6} {'before (s/MB)':>14} {'after (s/MB)':>13} {'speedup':>8} {'before peak (MB)':>17} "
+        f"{'after peak (MB)':>16}")
+  for option in [1, 2, 3, 4]:
+    regex = UrlRegex(option)
+    after = [Util.harvest_urls(t, regex) for t in texts]
+    assert [harvest_augmented(t, regex) for t in texts] == after, f'option {option} gives different URLs'
+    t_before = measure(lambda: [harvest_augmented(t, regex) for t in texts], rounds) / size_mb
+    t_after = measure(lambda: [Util.harvest_urls(t, regex) for t in texts], rounds) / size_mb
+    m_before = measure_peak(lambda: find_augmented(text, regex))
+    m_after = measure_peak(lambda: Util.find_urls(text, regex))
+    print(f'{option:>6} {sum(map(len, after)):>6} {t_before:>14.4f} {t_after:>13.4f} {t_before / t_after:>7.1f}x '
+          f'{m_before:>17.2f} {m_after:>16.2f}')
+
+
+def generate_cjk(n: int, seed: int = 0) -> str:
+  """
+  Generate a synthetic CJK-heavy text of n characters (CJK ideographs, with some ASCII words, URLs and line breaks)
+
+  """
+  rnd = random.Random(seed)
+  ideographs = [chr(rnd.randint(0x4e00, 0x9fff)) for _ in range(3000)]
+  ascii_words = [' ', '\n', ' PDF ', ' https://example.org/paper ', ' www.example.com ']
+  return ''.join(rnd.choice(ideographs) if rnd.random() < 0.95 else rnd.choice(ascii_words) for _ in range(n))
+
+
+def bench_translit(text_dir: str, rounds: int):
+  """
+  Compare per-MB time and peak memory of transliteration with ASCII spans skipped and a translation table, against
+  unidecode, on the text corpus (ASCII-heavy) and on a synthetic CJK-heavy text
+
+  """
+  from unidecode import unidecode
+
+  samples = [('ascii-heavy', read_texts(text_dir)), ('cjk-heavy', [generate_cjk(300000)])]
+  print(f"{'sample':>11} {'MB':>6} {'non-ascii':>10} {'before (s/MB)':>14} {'after (s/MB)':>13} {'speedup':>8} "
+        f"{'before peak (MB)':>17} {'after peak (MB)':>16}")
+  for name, texts in samples:
+    size_mb = sum(len(text.encode('utf-8')) for text in texts) / 2 ** 20
+    non_ascii = sum(len(text) - len(text.encode('ascii', 'ignore')) for text in texts) / sum(map(len, texts))
+    assert [unidecode(text) for text in texts] == [Util.transliterate(text) for text in texts], f'{name} differs'
+    t_before = measure(lambda: [unidecode(text) for text in texts], rounds) / size_mb
+    t_after = measure(lambda: [Util.transliterate(text) for text in texts], rounds) / size_mb
+    # peak of the largest text
+    text = max(texts, key=len)
+    m_before = measure_peak(lambda: unidecode(text))
+    m_after = measure_peak(lambda: Util.transliterate(text))
+    print(f'{name:>11} {size_mb:>6.2f} {non_ascii:>9.1%} {t_before:>14.4f} {t_after:>13.4f} '
+          f'{t_before / t_after:>7.1f}x {m_before:>17.2f} {m_after:>16.2f}')
+
+
+def generate_pdf(pages: int, urls_per_page: int, seed: int = 0) -> bytes:
+  """
+  Generate a synthetic PDF of a given number of pages and URLs per page. Each page is a column of text with URLs
+  among the words, and every other URL is also a link annotation (so that U_ANN and U_ALL have work to do)
+
+  """
+  rnd = random.Random(seed)
+  words = [''.join(rnd.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rnd.randint(2, 10))) for _ in range(2000)]
+  hosts = [f"{rnd.choice(words)}.{rnd.choice(['com', 'org', 'edu', 'io'])}" for _ in range(200)]
+  objects = [b'<< /Type /Catalog /Pages 2 0 R >>', b'', b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+  kids = []
+  lines_per_page = 60
+  for _ in range(pages):
+    lines = [' '.join(rnd.choice(words) for _ in range(12)) for _ in range(lines_per_page)]
+    annots = []
+    for k in range(urls_per_page):
+      url = f"https://{rnd.choice(hosts)}/{'/'.join(rnd.choice(words) for _ in range(rnd.randint(0, 3)))}"
+      i = rnd.randrange(lines_per_page)
+      lines[i] = f'{lines[i]} {url}'
+      if k % 2 == 0:
+        y = 750 - 12 * i
+        annots.append(f'<< /Type /Annot /Subtype /Link /Rect [50 {y - 2} 550 {y + 10}] /Border [0 0 0] '
+                      f'/A << /S /URI /URI ({url}) >> >>')
+    text = ' T* '.join(f"({line.replace(chr(92), chr(92) * 2).replace('(', '').replace(')', '')}) Tj"
+                       for line in lines)
+    stream = f'BT /F1 8 Tf 10 TL 50 750 Td {text} ET'.encode('latin-1')
+    objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+    objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> "
+                   f"/Contents {len(objects)} 0 R /Annots [{' '.join(annots)}] >>".encode('latin-1'))
+    kids.append(f'{len(objects)} 0 R')
+  objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode('latin-1')
+  out = bytearray(b'%PDF-1.4\n')
+  offsets = []
+  for i, obj in enumerate(objects, start=1):
+    offsets.append(len(out))
+    out += b'%d 0 obj\n%s\nendobj\n' % (i, obj)
+  xref = len(out)
+  out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+  out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+  out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+  return bytes(out)
+
+
+def count_pages(data: bytes) -> int:
+  import io
+  from PyPDF2.pdf import PdfFileReader
+  return PdfFileReader(io.BytesIO(data), strict=False).getNumPages()
+
+
+def percentile(values: List[float], q: float) -> float:
+  # percentile with linear interpolation between closest ranks
+  values = sorted(values)
+  k = (len(values) - 1) * q / 100
+  i = int(k)
+  return values[i] if i + 1 == len(values) else values[i] + (values[i + 1] - values[i]) * (k - i)
+
+
+def list_cases(extractors: List[str], regexes: List[int]) -> List[Tuple[str, Optional[str], Optional[int]]]:
+  """
+  List the (command, extractor or annotator, regex option) cases of the pipeline benchmark
+
+  """
+  cases = [('U_ANN', annotator, None) for annotator in ANNOTATORS]
+  for extractor in extractors:
+    cases.append(('TXT', extractor, None))
+    # PDFIUM can also find URLs without a regex option
+    options = ([None] if extractor == 'PDFIUM' else []) + regexes
+    cases += [(cmd, extractor, regex) for cmd in ['U_TXT', 'U_ALL'] for regex in options]
+  return cases
+
+
+def run_case(cmd: str, name: Optional[str], regex: Optional[int], docs: List[Tuple[str, bytes, int]],
+             rounds: int) -> dict:
+  """
+  Run one case of the pipeline benchmark in-process on each document, and summarize its timings and peak memory
+
+  """
+  kw = {'annotator': name} if cmd == 'U_ANN' else {}
+  if regex is not None:
+    kw['regex'] = UrlRegex(regex)
+  e = get_extractor(name) if cmd != 'U_ANN' else None
+
+  def run(fp: str, data: bytes):
+    # a new document per run, so that no stage output is reused between runs
+    with Document.use(Document(fp, data)) as doc:
+      return run_command(cmd, doc, e, **kw)
+
+  durations, peak_mb, pages, size = [], 0.0, 0, 0
+  for fp, data, n_pages in docs:
+    # warm up (imports, regexes, clients), and check that the case runs at all
+    run(fp, data)
+    for _ in range(rounds):
+      time_start = time.perf_counter()
+      run(fp, data)
+      durations.append(time.perf_counter() - time_start)
+    peak_mb = max(peak_mb, measure_peak(lambda: run(fp, data)))
+    pages += n_pages * rounds
+    size += len(data) * rounds
+  total = sum(durations)
+  return {
+    'command': cmd, 'extractor': name, 'regex': regex, 'documents': len(docs), 'runs': len(durations),
+    'mean': total / len(durations), 'p50': percentile(durations, 50), 'p95': percentile(durations, 95),
+    'p99': percentile(durations, 99), 'max': max(durations), 'pages_per_s': pages / total,
+    'mb_per_s': size / 2 ** 20 / total, 'peak_mb': peak_mb,
+  }
+
+
+def get_case_key(case: dict) -> str:
+  return '/'.join(str(case[key]) for key in ['command', 'extractor', 'regex'])
+
+
+def compare(cases: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+  """
+  Compare the cases of a run against a baseline run, and return the cases whose median time or peak memory grew by
+  more than a tolerance (e.g. 0.1 for 10%)
+
+  """
+  baseline = {get_case_key(case): case for case in baseline if 'error' not in case}
+  regressions = []
+  for case in cases:
+    base = baseline.get(get_case_key(case))
+    if base is None or 'error' in case:
+      continue
+    for metric in ['p50', 'peak_mb']:
+      if case[metric] > base[metric] * (1 + tolerance):
+        regressions.append(f'{get_case_key(case)}: {metric} {base[metric]:.4f} -> {case[metric]:.4f}')
+  return regressions
+
+
+def bench_pipeline(_: str, rounds: int, sample_dir: str = 'test/samples', synthetic: Tuple[str, ...] = (),
+                   extractors: Optional[List[str]] = None, regexes: Optional[List[int]] = None,
+                   output: Optional[str] = None, baseline: Optional[str] = None, tolerance: float = 0.1) -> bool:
+  """
+  Run each command with each extractor (or annotator) and regex option in-process, over the sample PDFs and over
+  synthetic PDFs (PAGESxURLS, e.g. 100x20 for 100 pages with 20 URLs each). Report percentiles of the time per
+  document, throughput, and peak memory, optionally write them as JSON, and compare them against a baseline JSON
+
+  :return: True if no case regressed against the baseline
+  """
+  docs = []
+  for fp in sorted(glob.glob(os.path.join(sample_dir, '*.pdf'))):
+    with open(fp, 'rb') as f:
+      data = f.read()
+    docs.append((fp, data, count_pages(data)))
+  for spec in synthetic:
+    n_pages, n_urls = map(int, spec.lower().split('x'))
+    docs.append((f'synthetic-{spec}.pdf', generate_pdf(n_pages, n_urls, seed=n_pages * 1000 + n_urls), n_pages))
+  if len(docs) == 0:
+    raise FileNotFoundError(f'No PDFs in {sample_dir}, and no synthetic PDFs')
+  size_mb = sum(len(data) for _, data, _ in docs) / 2 ** 20
+  print(f'corpus: {len(docs)} files, {sum(n for *_, n in docs)} pages, {size_mb:.3f} MB')
+
+  print(f"{'command':>7} {'backend':>7} {'regex':>5} {'p50 (s)':>8} {'p95 (s)':>8} {'p99 (s)':>8} {'pages/s':>8} "
+        f"{'MB/s':>7} {'peak (MB)':>10}")
+  cases = []
+  for cmd, name, regex in list_cases(extractors or list(EXTRACTORS), regexes or [3, 4]):
+    try:
+      case = run_case(cmd, name, regex, docs, rounds)
+    except Exception as err:
+      # e.g. GROBID is not running
+      case = {'command': cmd, 'extractor': name, 'regex': regex, 'error': repr(err)}
+      print(f'{cmd:>7} {name:>7} {str(regex or "-"):>5} failed: {err!r}', file=sys.stderr)
+    else:
+      print(f"{cmd:>7} {name:>7} {str(regex or '-'):>5} {case['p50']:>8.4f} {case['p95']:>8.4f} {case['p99']:>8.4f} "
+            f"{case['pages_per_s']:>8.1f} {case['mb_per_s']:>7.3f} {case['peak_mb']:>10.1f}")
+    cases.append(case)
+
+  if output:
+    meta = {'time': time.time(), 'rounds': rounds, 'documents': [fp for fp, *_ in docs], 'python': sys.version}
+    with open(output, 'w', encoding='utf-8') as f:
+      json.dump({'meta': meta, 'cases': cases}, f, indent=2)
+  if baseline:
+    with open(baseline, 'r', encoding='utf-8') as f:
+      regressions = compare(cases, json.load(f)['cases'], tolerance)
+    for regression in regressions:
+      print(f'REGRESSION {regression}')
+    return len(regressions) == 0
+  return True
+
+
+BENCHMARKS = {
+  'tld': bench_tld,
+  'dedupe': bench_dedupe,
+  'tei': bench_tei,
+  'harvest': bench_harvest,
+  'translit': bench_translit,
+  'pipeline': bench_pipeline,
+}
+
+if __name__ == '__main__':
+  import argparse
+
+  parser = argparse.ArgumentParser(description='Link Extractor Benchmarks')
+  parser.add_argument('-b', metavar='BENCHMARK', required=True, help="benchmark to run", choices=list(BENCHMARKS))
+  parser.add_argument('-t', metavar='TEXT_PATH', required=False, default='test/text', help="path to text directory",
+                      type=str)
+  parser.add_argument('-n', metavar='ROUNDS', required=False, default=3, help="number of rounds", type=int)
+  parser.add_argument('-s', metavar='SAMPLE_PATH', required=False, default='test/samples',
+                      help="path to PDF directory (pipeline only)", type=str)
+  parser.add_argument('-e', metavar='EXTRACTOR', required=False, nargs='+', choices=list(EXTRACTORS),
+                      help="extractors to run (pipeline only, default: all)")
+  parser.add_argument('-r', metavar='OPTION_NUMBER', required=False, nargs='+', type=int,
+                      help="regex options to run (pipeline only, default: 3 4)")
+  parser.add_argument('--synthetic', metavar='PAGESxURLS', required=False, nargs='*', default=['10x10', '50x40'],
+                      help="synthetic PDFs to add to the samples (pipeline only, default: 10x10 50x40)")
+  parser.add_argument('--json', metavar='OUTPUT_FILE', required=False, type=str,
+                      help="path to write results as JSON (pipeline only)")
+  parser.add_argument('--baseline', metavar='BASELINE_FILE', required=False, type=str,
+                      help="path to results JSON to compare against, failing on regressions (pipeline only)")
+  parser.add_argument('--tolerance', metavar='FRACTION', required=False, default=0.1, type=float,
+                      help="growth of median time or peak memory over baseline that is a regression (default: 0.1)")
+  args = parser.parse_args()
+  if args.b == 'pipeline':
+    ok = bench_pipeline(str(args.t).rstrip('/ '), args.n, str(args.s).rstrip('/ '), tuple(args.synthetic), args.e,
+                        args.r, args.json, args.baseline, args.tolerance)
+    sys.exit(0 if ok else 1)
+  BENCHMARKS[args.b](str(args.t).rstrip('/ '), args.n)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import glob
+import os
+import sys
+from collections import Counter
+from typing import List
+
+import main
+from main import Batch
+
+CRASH_PREFIX = 'crash-'
+
+
+def process(fp, fallback=False, bounded=True):
+  # stand-in for Batch.process, whose worker exits (as if killed in native code) on documents named crash-*
+  if os.path.basename(fp.fp if isinstance(fp, main.Document) else fp).startswith(CRASH_PREFIX):
+    os._exit(1)
+  return PROCESS(fp, fallback, bounded)
+
+
+PROCESS = Batch.process
+
+
+def run(sample_dir: str, crashes: int, copies: int, workers: int) -> bool:
+  """
+  Run a batch in which some documents break the worker pool, and check that every input gets exactly one result, and
+  that only the documents that broke the pool fail
+
+  :param sample_dir: path to sample PDFs
+  :param crashes: number of documents that break the pool
+  :param copies: number of times each sample is given
+  :param workers: number of worker processes
+  :return: True if the check passed, else False
+  """
+  samples = sorted(glob.glob(f'{sample_dir}/*.pdf')) * copies
+  fps: List[str] = [f'{sample_dir}/{CRASH_PREFIX}{i}.pdf' for i in range(crashes)] + samples
+  # workers are forked, so they call the stand-in
+  Batch.process = staticmethod(process)
+  try:
+    results = list(Batch.run(fps, 'U_ANN', workers=workers))
+  finally:
+    Batch.process = staticmethod(PROCESS)
+  counts = Counter(r.fp for r in results)
+  failed = sorted(set(r.fp for r in results if r.error is not None))
+  expected = Counter(fps)
+  crashed = sorted(fp for fp in set(fps) if os.path.basename(fp).startswith(CRASH_PREFIX))
+  print(f'{len(fps)} inputs, {len(results)} results, {len(failed)} failed')
+  ok = True
+  if counts != expected:
+    print(f'results do not match inputs: missing {expected - counts}, extra {counts - expected}', file=sys.stderr)
+    ok = False
+  if failed != crashed:
+    print(f'failed documents: {failed}, expected: {crashed}', file=sys.stderr)
+    ok = False
+  return ok
+
+
+if __name__ == '__main__':
+  import argparse
+
+  parser = argparse.ArgumentParser(description='Batch Crash Recovery Check')
+  parser.add_argument('-s', metavar='SAMPLE_PATH', required=False, default='test/samples', type=str,
+                      help="path to sample PDFs (default: test/samples)")
+  parser.add_argument('-n', metavar='CRASHES', required=False, default=4, type=int,
+                      help="number of documents that break the worker pool (default: 4)")
+  parser.add_argument('-c', metavar='COPIES', required=False, default=3, type=int,
+                      help="number of times each sample is given (default: 3)")
+  parser.add_argument('-j', metavar='WORKERS', required=False, default=2, type=int,
+                      help="number of worker processes (default: 2)")
+  args = parser.parse_args()
+  sys.exit(0 if run(args.s.rstrip('/ '), args.n, args.c, args.j) else 1)
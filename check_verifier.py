@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import List, Optional
+from urllib.parse import urlsplit, parse_qs
+
+from main import Validator, Verifier
+
+
+class StandIn(BaseHTTPRequestHandler):
+  """
+  Stand-in web server, whose behaviour is chosen by the path of each request:
+
+  /ok/X            200
+  /gone/X          404 (to HEAD and GET)
+  /no-head/X       405 to HEAD, 200 to GET
+  /flaky/X?fail=N  503 to the first N requests, then 200
+  /slow/X?delay=S  200 after S seconds
+
+  Requests are counted per method and path, and the peak number of requests in progress is kept
+
+  """
+
+  # keep connections alive between requests
+  protocol_version = 'HTTP/1.1'
+
+  requests = Counter()
+  in_progress = 0
+  peak = 0
+  lock = threading.Lock()
+
+  def do_HEAD(self):
+    self.handle_request('HEAD')
+
+  def do_GET(self):
+    self.handle_request('GET')
+
+  def handle_request(self, method: str):
+    url = urlsplit(self.path)
+    query = parse_qs(url.query)
+    kind = url.path.split('/')[1]
+    with StandIn.lock:
+      StandIn.requests[method, url.path] += 1
+      count = StandIn.requests['HEAD', url.path] + StandIn.requests['GET', url.path]
+      StandIn.in_progress += 1
+      StandIn.peak = max(StandIn.peak, StandIn.in_progress)
+    try:
+      if kind == 'ok':
+        self.reply(200, method)
+      elif kind == 'no-head':
+        self.reply(405 if method == 'HEAD' else 200, method)
+      elif kind == 'flaky':
+        self.reply(503 if count <= int(query['fail'][0]) else 200, method)
+      elif kind == 'slow':
+        time.sleep(float(query['delay'][0]))
+        self.reply(200, method)
+      else:
+        self.reply(404, method)
+    finally:
+      with StandIn.lock:
+        StandIn.in_progress -= 1
+
+  def reply(self, status: int, method: str):
+    data = b'' if method == 'HEAD' else b'stand-in'
+    try:
+      self.send_response(status)
+      self.send_header('Content-Type', 'text/plain')
+      self.send_header('Content-Length', str(len(data)))
+      self.end_headers()
+      self.wfile.write(data)
+    except ConnectionError:
+      # the client gave up on the request (e.g. at its timeout)
+      self.close_connection = True
+
+  def log_message(self, *args):
+    pass
+
+  @staticmethod
+  def reset():
+    with StandIn.lock:
+      StandIn.requests.clear()
+      StandIn.peak = StandIn.in_progress
+
+
+def expect(failures: List[str], name: str, condition: bool, detail: str):
+  print(f"{'ok' if condition else 'FAIL':<5} {name}: {detail}")
+  if not condition:
+    failures.append(name)
+
+
+def run(port: Optional[int] = None) -> bool:
+  """
+  Verify URLs of a stand-in web server, and check the retries, the fallback from HEAD to GET requests, the per-host
+  connection cap, the deadline, and that only lasting verdicts are cached
+
+  :param port: port of stand-in web server (default: any free port)
+  :return: True if every check passed, else False
+  """
+  server = ThreadingHTTPServer(('127.0.0.1', port or 0), StandIn)
+  server.daemon_threads = True
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  base = f'http://127.0.0.1:{server.server_address[1]}'
+  failures = []
+  try:
+    verifier = Verifier(max_per_host=3, retries=2, backoff=0.05, timeout=5.0, deadline=10.0)
+
+    StandIn.reset()
+    reasons = verifier.verify([f'{base}/flaky/a?fail=2', f'{base}/flaky/b?fail=5'])
+    expect(failures, 'retry', reasons[f'{base}/flaky/a?fail=2'] is None and StandIn.requests['HEAD', '/flaky/a'] == 3,
+           f"recovered after {StandIn.requests['HEAD', '/flaky/a']} requests")
+    expect(failures, 'retries exhausted',
+           reasons[f'{base}/flaky/b?fail=5'] == Validator.UNREACHABLE and StandIn.requests['HEAD', '/flaky/b'] == 3,
+           f"{reasons[f'{base}/flaky/b?fail=5']} after {StandIn.requests['HEAD', '/flaky/b']} requests")
+
+    StandIn.reset()
+    reasons = verifier.verify([f'{base}/no-head/a', f'{base}/gone/a', f'{base}/ok/a'])
+    expect(failures, 'HEAD to GET fallback',
+           reasons[f'{base}/no-head/a'] is None and StandIn.requests['GET', '/no-head/a'] == 1,
+           f"{StandIn.requests['HEAD', '/no-head/a']} HEAD and {StandIn.requests['GET', '/no-head/a']} GET requests")
+    expect(failures, 'not found',
+           reasons[f'{base}/gone/a'] == Validator.UNREACHABLE and reasons[f'{base}/ok/a'] is None,
+           f"{reasons[f'{base}/gone/a']} and {reasons[f'{base}/ok/a']}")
+
+    StandIn.reset()
+    reasons = verifier.verify([f'{base}/slow/{i}?delay=0.3' for i in range(12)])
+    expect(failures, 'per-host cap', all(r is None for r in reasons.values()) and 1 < StandIn.peak <= 3,
+           f'peak of {StandIn.peak} concurrent requests (cap: 3)')
+
+    StandIn.reset()
+    reasons = Verifier(retries=1, backoff=0.05, timeout=0.3).verify([f'{base}/slow/c?delay=2'])
+    expect(failures, 'request timeout', reasons[f'{base}/slow/c?delay=2'] == Validator.TIMEOUT,
+           f"{reasons[f'{base}/slow/c?delay=2']} after {StandIn.requests['HEAD', '/slow/c']} requests")
+
+    StandIn.reset()
+    hanging = [f'{base}/slow/{i}?delay=5' for i in range(4)]
+    time_start = time.monotonic()
+    # the cap leaves a connection free for the URL that answers
+    reasons = Verifier(max_per_host=8, deadline=1.0).verify(hanging + [f'{base}/ok/b'])
+    duration = time.monotonic() - time_start
+    timed_out = sum(reasons[url] == Validator.TIMEOUT for url in hanging)
+    expect(failures, 'deadline', timed_out == len(hanging) and reasons[f'{base}/ok/b'] is None and duration < 2,
+           f'{timed_out} of {len(hanging)} timed out in {duration:.2f} s')
+
+    transient = [url for url in hanging + [f'{base}/slow/c?delay=2'] if url in Verifier.cache]
+    expect(failures, 'cache', len(transient) == 0 and f'{base}/ok/b' in Verifier.cache,
+           f'{len(Verifier.cache)} verdicts cached, {len(transient)} of them transient')
+    StandIn.reset()
+    verifier.verify([f'{base}/ok/b'])
+    expect(failures, 'cache hit', StandIn.requests['HEAD', '/ok/b'] == 0, 'cached verdict reused')
+    Verifier(ttl=0.0).verify([f'{base}/ok/c'])
+    verifier.verify([f'{base}/ok/b'])
+    expect(failures, 'cache expiry', f'{base}/ok/c' not in Verifier.cache, 'expired verdict evicted')
+  finally:
+    server.shutdown()
+    server.server_close()
+  return len(failures) == 0
+
+
+if __name__ == '__main__':
+  import argparse
+
+  parser = argparse.ArgumentParser(description='Online URL Verification Check')
+  parser.add_argument('-p', metavar='PORT', required=False, type=int,
+                      help="port of stand-in web server (default: any free port)")
+  args = parser.parse_args()
+  sys.exit(0 if run(args.p) else 1)
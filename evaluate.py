@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 
+import fnmatch
 import glob
 import os.path
-from typing import Set
+from typing import Set, List, Dict, Tuple, Optional
 
+import numpy as np
 import pandas as pd
 
 pd.options.display.max_columns = None
@@ -11,8 +13,6 @@ pd.options.display.max_rows = None
 pd.options.display.max_colwidth = None
 pd.options.display.expand_frame_repr = False
 
-REGEXES = [3, 4]
-EXTRACTORS = ['PDFIUM', 'PDFM', 'GROB']
 EPSILON = 1e-10  # small constant to avoid ZeroDivisionError
 
 
@@ -21,131 +21,171 @@ def get_urls(fp: str) -> Set[str]:
     return set(map(lambda x: x.lower().strip(' /'), f.readlines()))
 
 
-def calculate_metrics(target: Set[str], got: Set[str]) -> dict:
-  tp_urls = sorted(got.intersection(target))
-  fp_urls = sorted(got.difference(target))
-  fn_urls = sorted(target.difference(got))
-  # calculate metrics
-  [tp, fp, fn] = [*map(len, [tp_urls, fp_urls, fn_urls])]
-  precision = tp / max(tp + fp, EPSILON)
-  recall = tp / max(tp + fn, EPSILON)
-  f_measure = 2 * precision * recall / max(precision + recall, EPSILON)
-  return {
-    'tp_urls': tp_urls,
-    'tp': tp,
-    'fp_urls': fp_urls,
-    'fp': fp,
-    'fn_urls': fn_urls,
-    'fn': fn,
-    'p': precision,
-    'r': recall,
-    'f': f_measure
-  }
-
-
-def calculate_agg_metrics(metrics: dict, cmd: str) -> dict:
-  def agg(exc: str):
-    r = {
-      'tp_urls': {},
-      'tp': 0,
-      'fp_urls': {},
-      'fp': 0,
-      'fn_urls': {},
-      'fn': 0,
-      'mac_p': 0,
-      'mac_r': 0,
-      'mac_f': 0,
-      'mic_p': 0,
-      'mic_r': 0,
-      'mic_f': 0
-    }
-    for sample in metrics:
-      for measure in metrics[sample][exc]:
-        if measure in ['tp_urls', 'fp_urls', 'fn_urls']:
-          r[measure][sample] = metrics[sample][exc][measure]
-        elif measure in ['tp', 'fp', 'fn']:
-          r[measure] += metrics[sample][exc][measure]
-        elif measure in ['p', 'r', 'f']:
-          # update macro average metrics
-          r[f'mac_{measure}'] += (metrics[sample][exc][measure]) / len(metrics)
-    # update micro average metrics
-    r['mic_p'] = r['tp'] / max(r['tp'] + r['fp'], EPSILON)
-    r['mic_r'] = r['tp'] / max(r['tp'] + r['fn'], EPSILON)
-    r['mic_f'] = 2 * r['mic_p'] * r['mic_r'] / max(r['mic_p'] + r['mic_r'], EPSILON)
-    agg_metrics[exc] = r
-
-  agg_metrics = {}
-  if cmd == "U_ANN":
-    # aggregate annotated URL metrics
-    agg(cmd)
-  else:
-    for extractor in EXTRACTORS:
-      if extractor == "PDFIUM":
-        agg(f"{extractor}-{cmd}")
-      else:
-        # aggregate fulltext URL metrics
-        for regex in REGEXES:
-          agg(f"{extractor}-R{regex}-{cmd}")
-
-  return agg_metrics
-
-
 def clean(url: str) -> str:
   return url.strip().lower().rstrip('.,/?')
 
 
-def run(labels_dir: str, urls_dir: str, cmd: str, prefix=None):
-  all_metrics = {}
-
-  # calculate and print metrics for each file
-  print('===============\nmetrics by file\n===============')
-  for full_path in sorted(glob.glob(f"{labels_dir}/*.pdf.txt")):
-    file_name = os.path.basename(full_path[:-4])
-    true_urls = set(map(clean, get_urls(f'{labels_dir}/{file_name}.txt')))
-    metrics = {}
-    if cmd == "U_ANN":
-      # get annotated URL metric
-      exc = cmd
-      extracted_urls = set(map(clean, get_urls(f'{urls_dir}/{file_name}-{exc}.txt')))
-      metrics[exc] = calculate_metrics(true_urls, extracted_urls)
-    else:
-      # get URLs from each method
-      for extractor in EXTRACTORS:
-        if extractor == "PDFIUM":
-          exc = f"{extractor}-{cmd}"
-          extracted_urls = set(map(clean, get_urls(f'{urls_dir}/{file_name}-{exc}.txt')))
-          metrics[exc] = calculate_metrics(true_urls, extracted_urls)
-        else:
-          # get fulltext URL metrics
-          for regex in REGEXES:
-            exc = f"{extractor}-R{regex}-{cmd}"
-            extracted_urls = set(map(clean, get_urls(f'{urls_dir}/{file_name}-{exc}.txt')))
-            metrics[exc] = calculate_metrics(true_urls, extracted_urls)
-    # save metrics
-    all_metrics[file_name] = metrics
-    # print metric
-    df = pd.DataFrame.from_dict(metrics, orient='index').sort_index()
-    df.index.name = f"{file_name} ({len(true_urls)} URLs)"
-    print(df[['tp', 'fp', 'fn', 'p', 'r', 'f']], end="\n\n")
-
-  # calculate and print aggregate metrics
+def list_runs(urls_dir: str, cmd: str, patterns: Optional[List[str]] = None) -> Dict[str, Dict[str, str]]:
+  """
+  Find the output files of a command, named as main.py names them (<file>.pdf-<run>.txt, where run is e.g.
+  PDFM-R3-U_TXT, PDFIUM-U_TXT or U_ANN)
+
+  :param urls_dir: path to urls directory
+  :param cmd: name of command
+  :param patterns: glob patterns of runs to keep (default: all)
+  :return: path of output file of each run, by file
+  """
+  outputs = {}
+  for fp in glob.glob(f'{urls_dir}/*.pdf-*.txt'):
+    file_name, run = os.path.basename(fp)[:-4].split('.pdf-', 1)
+    if run != cmd and not run.endswith(f'-{cmd}'):
+      continue
+    if patterns and not any(fnmatch.fnmatchcase(run, pattern) for pattern in patterns):
+      continue
+    outputs.setdefault(f'{file_name}.pdf', {})[run] = fp
+  return outputs
+
+
+def load_document(item: Tuple[str, str, Dict[str, str]]) -> Tuple[str, List[str], Dict[str, List[str]]]:
+  # read the labels and the outputs of each run of one file
+  file_name, label_fp, output_fps = item
+  true_urls = sorted(set(map(clean, get_urls(label_fp))))
+  return file_name, true_urls, {run: sorted(set(map(clean, get_urls(fp)))) for run, fp in output_fps.items()}
+
+
+def load(labels_dir: str, urls_dir: str, cmd: str, patterns: Optional[List[str]] = None,
+         workers: Optional[int] = None) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+  """
+  Load labels and outputs of every file in parallel, into columnar frames
+
+  :param labels_dir: path to labels directory
+  :param urls_dir: path to urls directory
+  :param cmd: name of command
+  :param patterns: glob patterns of runs to keep (default: all)
+  :param workers: number of worker processes (default: CPU count). If 1, load in the current process
+  :return: labels (sample, url), outputs (run, sample, url), and each run on each labelled file, with whether it has
+    an output (run, sample, found). A run without an output for a file (e.g. as the file failed) scores no URLs on it
+  """
+  outputs = list_runs(urls_dir, cmd, patterns)
+  items = []
+  for fp in sorted(glob.glob(f"{labels_dir}/*.pdf.txt")):
+    file_name = os.path.basename(fp[:-4])
+    items.append((file_name, fp, outputs.get(file_name, {})))
+  if workers == 1:
+    docs = list(map(load_document, items))
+  else:
+    from concurrent.futures import ProcessPoolExecutor
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+      docs = list(pool.map(load_document, items, chunksize=max(len(items) // (4 * workers), 1)))
+
+  def frame(columns: List[str], rows: List[Tuple[List[str], ...]]) -> pd.DataFrame:
+    # build a frame from per-file columns, concatenated once
+    return pd.DataFrame({name: np.concatenate([np.asarray(row[i], dtype=object) for row in rows] or [[]])
+                         for i, name in enumerate(columns)})
+
+  labels = frame(['sample', 'url'], [([name] * len(urls), urls) for name, urls, _ in docs])
+  found = frame(['run', 'sample'], [(list(by_run), [name] * len(by_run)) for name, _, by_run in docs])
+  # every run found, on every labelled file
+  runs = pd.MultiIndex.from_product([sorted(set(found['run'])), [name for name, _, _ in docs]], names=['run', 'sample'])
+  runs = runs.to_frame(index=False)
+  runs['found'] = runs.set_index(['run', 'sample']).index.isin(found.set_index(['run', 'sample']).index)
+  urls = frame(['run', 'sample', 'url'], [
+    ([run] * len(urls), [name] * len(urls), urls) for name, _, by_run in docs for run, urls in by_run.items()
+  ])
+  return labels, urls, runs
+
+
+def calculate_metrics(labels: pd.DataFrame, urls: pd.DataFrame, runs: pd.DataFrame) -> pd.DataFrame:
+  """
+  Calculate the metrics of each run on each file, in bulk
+
+  :param labels: labels (sample, url)
+  :param urls: outputs (run, sample, url)
+  :param runs: each run on each file (run, sample)
+  :return: tp, fp, fn, p, r and f, indexed by run and sample
+  """
+  matched = urls.merge(labels.assign(label=True), on=['sample', 'url'], how='left')['label'].notna().to_numpy()
+  counts = pd.DataFrame({'run': urls['run'], 'sample': urls['sample'], 'tp': matched, 'fp': ~matched})
+  counts = counts.groupby(['run', 'sample']).sum()
+  metrics = runs[['run', 'sample']].set_index(['run', 'sample']).join(counts).fillna(0).astype(int)
+  n_true = labels.groupby('sample').size()
+  metrics['fn'] = n_true.reindex(metrics.index.get_level_values('sample'), fill_value=0).to_numpy() - metrics['tp']
+  tp, fp, fn = (metrics[col].to_numpy(dtype=float) for col in ['tp', 'fp', 'fn'])
+  metrics['p'] = tp / np.maximum(tp + fp, EPSILON)
+  metrics['r'] = tp / np.maximum(tp + fn, EPSILON)
+  metrics['f'] = 2 * metrics['p'] * metrics['r'] / np.maximum(metrics['p'] + metrics['r'], EPSILON)
+  return metrics.sort_index()
+
+
+def calculate_agg_metrics(metrics: pd.DataFrame) -> pd.DataFrame:
+  """
+  Calculate the macro (mean over files) and micro (over pooled counts) metrics of each run
+
+  :param metrics: metrics of each run on each file (see calculate_metrics)
+  :return: tp, fp, fn, mac_p, mac_r, mac_f, mic_p, mic_r and mic_f, indexed by run
+  """
+  grouped = metrics.groupby(level='run')
+  agg = grouped[['tp', 'fp', 'fn']].sum()
+  agg[['mac_p', 'mac_r', 'mac_f']] = grouped[['p', 'r', 'f']].mean().to_numpy()
+  tp, fp, fn = (agg[col].to_numpy(dtype=float) for col in ['tp', 'fp', 'fn'])
+  agg['mic_p'] = tp / np.maximum(tp + fp, EPSILON)
+  agg['mic_r'] = tp / np.maximum(tp + fn, EPSILON)
+  agg['mic_f'] = 2 * agg['mic_p'] * agg['mic_r'] / np.maximum(agg['mic_p'] + agg['mic_r'], EPSILON)
+  return agg.sort_index()
+
+
+def list_urls(labels: pd.DataFrame, urls: pd.DataFrame, runs: pd.DataFrame) -> pd.DataFrame:
+  """
+  List which URLs are tp, fp and fn of each run on each file
+
+  :param labels: labels (sample, url)
+  :param urls: outputs (run, sample, url)
+  :param runs: each run on each file (run, sample)
+  :return: run, metric, sample and url of each URL, sorted
+  """
+  found = urls.merge(labels.assign(label=True), on=['sample', 'url'], how='left')
+  found['metric'] = np.where(found['label'].notna(), 'tp', 'fp')
+  # labels of each file, that the output of each run does not have
+  expected = runs[['run', 'sample']].merge(labels, on='sample')
+  expected = expected.merge(urls, on=['run', 'sample', 'url'], how='left', indicator=True)
+  missed = expected[expected['_merge'] == 'left_only'].assign(metric='fn')
+  table = pd.concat([found, missed], ignore_index=True)[['run', 'metric', 'sample', 'url']]
+  table['metric'] = pd.Categorical(table['metric'], ['tp', 'fp', 'fn'], ordered=True)
+  return table.sort_values(['run', 'metric', 'sample', 'url'], ignore_index=True)
+
+
+def run(labels_dir: str, urls_dir: str, cmd: str, prefix=None, patterns: Optional[List[str]] = None,
+        workers: Optional[int] = None, by_file: bool = True):
+  labels, urls, runs = load(labels_dir, urls_dir, cmd, patterns, workers)
+  metrics = calculate_metrics(labels, urls, runs)
+
+  # print files without an output (scored as if no URL was found)
+  missing = runs[~runs['found']]
+  if len(missing) > 0:
+    print('==============\nmissing output\n==============')
+    print(missing[['run', 'sample']].to_string(index=False), end="\n\n")
+
+  # print metrics for each file
+  if by_file:
+    print('===============\nmetrics by file\n===============')
+    n_true = labels.groupby('sample').size()
+    for sample, df in metrics.groupby(level='sample', sort=True):
+      df = df.droplevel('sample')
+      df.index.name = f"{sample} ({n_true.get(sample, 0)} URLs)"
+      print(df[['tp', 'fp', 'fn', 'p', 'r', 'f']], end="\n\n")
+
+  # print aggregate metrics
   print('=================\naggregate metrics\n=================')
-  agg_metrics = calculate_agg_metrics(all_metrics, cmd)
-  df_agg = pd.DataFrame.from_dict(agg_metrics, orient='index').sort_index()
+  df_agg = calculate_agg_metrics(metrics)
+  df_agg.index.name = None
   print(df_agg[['tp', 'fp', 'fn', 'mac_p', 'mac_r', 'mac_f', 'mic_p', 'mic_r', 'mic_f']], end="\n\n")
 
   # print which urls are tp, fp, fn, and tn of each method
   if prefix:
-    for extractor in sorted(agg_metrics.keys()):
-      table = pd.DataFrame(columns=['metric', 'sample', 'url'])
-      data = agg_metrics[extractor]
-      # transform into table format
-      for metric in ['tp', 'fp', 'fn']:
-        for sample in data[f'{metric}_urls']:
-          for url in data[f'{metric}_urls'][sample]:
-            table.loc[len(table)] = [metric, sample, url]
-      table = table.set_index(['metric', 'sample'])
-      table.to_csv(f"{prefix.strip(' /')}/summary-{extractor}.csv")
+    table = list_urls(labels, urls, runs)
+    for name, df in table.groupby('run', sort=True):
+      df[['metric', 'sample', 'url']].to_csv(f"{prefix.strip(' /')}/summary-{name}.csv", index=False)
 
 
 if __name__ == '__main__':
@@ -156,8 +196,11 @@ if __name__ == '__main__':
   parser.add_argument('-u', metavar="URLS_PATH", required=True, help="path to urls directory", type=str)
   parser.add_argument('-c', metavar="COMMAND", required=True, help="name of command", type=str)
   parser.add_argument('-o', metavar="OUT_CSV_PREFIX", required=False, help="path (with prefix) to output csv", type=str)
+  parser.add_argument('-x', metavar="RUN_PATTERN", required=False, nargs='+',
+                      help="glob patterns of runs to evaluate, e.g. 'PDFM-*' (default: every run found)")
+  parser.add_argument('-j', metavar="WORKERS", required=False, type=int,
+                      help="number of processes to load files with (default: CPU count)")
+  parser.add_argument('--no-files', action='store_true', help="print aggregate metrics only")
   args = parser.parse_args()
-  if args.o:
-    run(str(args.l).rstrip('/ '), str(args.u).rstrip('/ '), str(args.c), prefix=str(args.o))
-  else:
-    run(str(args.l).rstrip('/ '), str(args.u).rstrip('/ '), str(args.c))
+  run(str(args.l).rstrip('/ '), str(args.u).rstrip('/ '), str(args.c), str(args.o) if args.o else None, args.x,
+      args.j, not args.no_files)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+import os
+import random
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional
+
+EMPTY_TEI = '''<?xml version="1.0" encoding="UTF-8"?>
+<TEI xml:space="preserve" xmlns="http://www.tei-c.org/ns/1.0">
+	<teiHeader>
+		<fileDesc>
+			<titleStmt>
+				<title level="a" type="main">{title}</title>
+			</titleStmt>
+		</fileDesc>
+	</teiHeader>
+	<text>
+		<body/>
+	</text>
+</TEI>
+'''
+
+
+class MockGROBID(BaseHTTPRequestHandler):
+  """
+  Stand-in for the GROBID service, that returns canned TEI-XML. A PDF named X is answered with the TEI-XML in
+  {tei_dir}/X-GROB.txt (as written by `main.py -c TXT -e GROB`), or with an empty document if there is none. Like
+  GROBID, it answers 503 when more than max_concurrency requests are in progress, and it can inject latency and
+  random 503 responses to test clients
+
+  """
+
+  # keep connections alive between requests
+  protocol_version = 'HTTP/1.1'
+
+  tei_dir: Optional[str] = None
+  version = '0.7.0-mock'
+  delay = 0.0
+  fail_rate = 0.0
+  max_concurrency = 10
+  in_progress = 0
+  lock = threading.Lock()
+
+  def do_GET(self):
+    if self.path == '/api/isalive':
+      self.reply(200, 'true', 'text/plain')
+    elif self.path == '/api/version':
+      self.reply(200, MockGROBID.version, 'text/plain')
+    else:
+      self.reply(404, 'Not Found', 'text/plain')
+
+  def do_POST(self):
+    body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+    if self.path != '/api/processFulltextDocument':
+      self.reply(404, 'Not Found', 'text/plain')
+      return
+    with MockGROBID.lock:
+      busy = MockGROBID.in_progress >= MockGROBID.max_concurrency
+      if not busy:
+        MockGROBID.in_progress += 1
+    if busy or random.random() < MockGROBID.fail_rate:
+      if not busy:
+        with MockGROBID.lock:
+          MockGROBID.in_progress -= 1
+      self.reply(503, 'Service Unavailable', 'text/plain')
+      return
+    try:
+      name = self.get_file_name(body)
+      if name is None:
+        self.reply(400, 'Bad Request: no input file', 'text/plain')
+        return
+      time.sleep(MockGROBID.delay)
+      self.reply(200, self.get_tei_xml(name), 'application/xml')
+    finally:
+      with MockGROBID.lock:
+        MockGROBID.in_progress -= 1
+
+  def get_file_name(self, body: bytes) -> Optional[str]:
+    """
+    Return the file name of the 'input' field of a multipart/form-data request
+
+    :param body: request body
+    :return: file name, or None if there is no 'input' field
+    """
+    header = f"Content-Type: {self.headers.get('Content-Type', '')}\r\n\r\n".encode('utf-8')
+    message = BytesParser(policy=HTTP).parsebytes(header + body)
+    if not message.is_multipart():
+      return None
+    for part in message.iter_parts():
+      if part.get_param('name', header='content-disposition') == 'input':
+        return os.path.basename(part.get_filename() or 'input.pdf')
+    return None
+
+  @staticmethod
+  def get_tei_xml(name: str) -> str:
+    if MockGROBID.tei_dir is not None:
+      fp = os.path.join(MockGROBID.tei_dir, f"{name}-GROB.txt")
+      if os.path.isfile(fp):
+        with open(fp, 'r', encoding='utf-8') as f:
+          return f.read()
+    return EMPTY_TEI.format(title=name)
+
+  def reply(self, status: int, content: str, content_type: str):
+    data = content.encode('utf-8')
+    self.send_response(status)
+    self.send_header('Content-Type', f"{content_type}; charset=utf-8")
+    self.send_header('Content-Length', str(len(data)))
+    self.end_headers()
+    self.wfile.write(data)
+
+
+if __name__ == '__main__':
+  import argparse
+
+  parser = argparse.ArgumentParser(description='Mock GROBID Service')
+  parser.add_argument('-p', metavar='PORT', required=False, default=8070, help="port to listen on", type=int)
+  parser.add_argument('-t', metavar='TEI_PATH', required=False, default='test/text', type=str,
+                      help="path to directory of canned TEI-XML (<pdf name>-GROB.txt)")
+  parser.add_argument('--delay', metavar='SECONDS', required=False, default=0.0, type=float,
+                      help="time to spend on each conversion (default: 0)")
+  parser.add_argument('--fail-rate', metavar='RATE', required=False, default=0.0, type=float,
+                      help="fraction of conversions to reject with 503 (default: 0)")
+  parser.add_argument('--max-concurrency', metavar='N', required=False, default=10, type=int,
+                      help="maximum number of conversions in progress, beyond which 503 is returned (default: 10)")
+  args = parser.parse_args()
+
+  MockGROBID.tei_dir = args.t
+  MockGROBID.delay = args.delay
+  MockGROBID.fail_rate = args.fail_rate
+  MockGROBID.max_concurrency = args.max_concurrency
+  server = ThreadingHTTPServer(('localhost', args.p), MockGROBID)
+  print(f'Mock GROBID service listening on http://localhost:{args.p}')
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    server.server_close()
@@ -1,14 +1,442 @@
 #!/usr/bin/env python3
 
+import collections
+import contextlib
+import io
+import itertools
+import json
+import os
 import re
+import sys
+import threading
 import time
-from typing import Optional, List, Set
+from typing import Optional, List, Set, Dict, Iterable, Iterator, NamedTuple, Union, Callable, Any, Tuple
+
+
+# ======================================================================================================================
+# TRACING
+# ======================================================================================================================
+
+
+class Span:
+  """
+  Timed stage of the extraction pipeline. Stages set their sizes (bytes_in, bytes_out, urls_in, urls_out) on the span,
+  and the span is emitted to the sinks of Tracer when it ends. While a MemoryMonitor runs, the span also records the
+  peak resident memory of the process during the stage (rss_peak)
+
+  """
+
+  __slots__ = ('stage', 'attrs', 'time_start', 'monitor', 'rss_peak')
+
+  def __init__(self, stage: str, attrs: dict):
+    self.stage = stage
+    self.attrs = attrs
+    self.time_start = 0
+    self.monitor = None
+    self.rss_peak = 0
+
+  def set(self, **attrs):
+    self.attrs.update(attrs)
+
+  def __enter__(self) -> 'Span':
+    self.monitor = MemoryMonitor.current
+    if self.monitor is not None:
+      self.rss_peak = MemoryMonitor.get_rss()
+      self.monitor.spans.add(self)
+    self.time_start = time.perf_counter_ns()
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    duration = (time.perf_counter_ns() - self.time_start) * 1e-9
+    record = {'stage': self.stage, 'duration': duration, **Tracer.context, **self.attrs}
+    if self.monitor is not None:
+      self.monitor.spans.discard(self)
+      record['rss_peak'] = max(self.rss_peak, MemoryMonitor.get_rss())
+    if exc_type is not None:
+      record['error'] = exc_type.__name__
+    for sink in Tracer.sinks:
+      sink.add(record)
+
+
+class NullSpan:
+  """
+  Span that records nothing, used while tracing is disabled
+
+  """
+
+  __slots__ = ()
+
+  def set(self, **attrs):
+    pass
+
+  def __enter__(self) -> 'NullSpan':
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    pass
+
+
+class Tracer:
+  """
+  Process-wide tracing of pipeline stages. While no sink is added, spans are a shared no-op object, so that stages
+  cost one attribute lookup and one call each. Sinks are given every span as a record (a dict with stage, duration,
+  the attributes of Tracer.context, e.g. document, and the attributes set on the span)
+
+  """
+
+  sinks: list = []
+  # attributes added to every span (e.g. document and command)
+  context = {}
+  NULL_SPAN = NullSpan()
+
+  @staticmethod
+  def span(stage: str, **attrs) -> Union[Span, NullSpan]:
+    """
+    Start a span of a stage (to be used as a context manager)
+
+    :param stage: name of stage
+    :param attrs: attributes of span
+    :return: span
+    """
+    if not Tracer.sinks:
+      return Tracer.NULL_SPAN
+    return Span(stage, attrs)
+
+  @staticmethod
+  def fork() -> list:
+    """
+    Return new sinks for a worker process, which write to the same files as the sinks of the current process, and
+    start from empty aggregates
+
+    :return: sinks
+    """
+    return [sink.fork() for sink in Tracer.sinks]
+
+  @staticmethod
+  def close():
+    for sink in Tracer.sinks:
+      sink.close()
+    Tracer.sinks = []
+
+  @staticmethod
+  def collect() -> List[dict]:
+    """
+    Take the aggregates of the metric sinks of the current process (e.g. to send them from a worker process to the
+    main process), and reset them
+
+    :return: aggregates of each metric sink
+    """
+    return [sink.take() for sink in Tracer.sinks if isinstance(sink, MetricsSink)]
+
+  @staticmethod
+  def merge(aggregates: Iterable[dict]):
+    """
+    Add aggregates collected in another process to the metric sinks of the current process
+
+    :param aggregates: aggregates of metric sinks (see collect)
+    """
+    for aggregate in aggregates:
+      for sink in Tracer.sinks:
+        if isinstance(sink, MetricsSink):
+          sink.merge(aggregate)
+
+
+class JsonlSink:
+  """
+  Sink that appends each span to a JSONL file. Worker processes that are given this sink append to the same file
+
+  """
+
+  def __init__(self, fp: str):
+    self.fp = fp
+    self.file = None
+    self.lock = threading.Lock()
+
+  def __getstate__(self):
+    return self.fp
+
+  def __setstate__(self, state):
+    self.__init__(state)
+
+  def fork(self) -> 'JsonlSink':
+    # sink of a worker process
+    return JsonlSink(self.fp)
+
+  def add(self, record: dict):
+    line = json.dumps(record, default=str) + '\n'
+    with self.lock:
+      if self.file is None:
+        self.file = open(self.fp, 'a', encoding='utf-8')
+      # one write per line, so that lines of processes appending to the file do not interleave
+      self.file.write(line)
+      self.file.flush()
+
+  def close(self):
+    with self.lock:
+      if self.file is not None:
+        self.file.close()
+        self.file = None
+
+
+class MetricsSink:
+  """
+  Sink that aggregates spans in memory, per stage: number of spans, errors, total and maximum duration, the totals
+  of bytes and URLs in and out, and the peak resident memory. If a file is given, the aggregates are written to it
+  (in the Prometheus text format) when the sink is closed. Worker processes start from empty aggregates, which are
+  brought back to the main process with Tracer.collect and Tracer.merge. Merged aggregates are kept apart from the
+  spans of the current process, so that collecting a document processed in the main process takes its spans only
+
+  """
+
+  FIELDS = ['bytes_in', 'bytes_out', 'urls_in', 'urls_out']
+  PEAKS = ['max_seconds', 'rss_peak']
+
+  def __init__(self, fp: Optional[str] = None):
+    self.fp = fp
+    # aggregates of spans of the current process (since the last take), and aggregates merged from elsewhere
+    self.stages = {}
+    self.merged = {}
+    self.lock = threading.Lock()
+
+  def __getstate__(self):
+    return self.fp
+
+  def __setstate__(self, state):
+    self.__init__(state)
+
+  def fork(self) -> 'MetricsSink':
+    # sink of a worker process (aggregates are collected by the main process instead of written)
+    return MetricsSink()
+
+  def add(self, record: dict):
+    with self.lock:
+      entry = self.stages.setdefault(record['stage'], {'count': 0, 'errors': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+      entry['count'] += 1
+      entry['errors'] += 'error' in record
+      entry['seconds'] += record['duration']
+      entry['max_seconds'] = max(entry['max_seconds'], record['duration'])
+      for field in MetricsSink.FIELDS:
+        if field in record:
+          entry[field] = entry.get(field, 0) + record[field]
+      if 'rss_peak' in record:
+        entry['rss_peak'] = max(entry.get('rss_peak', 0), record['rss_peak'])
+
+  def take(self) -> dict:
+    with self.lock:
+      stages, self.stages = self.stages, {}
+    return stages
+
+  def merge(self, stages: dict):
+    with self.lock:
+      MetricsSink.combine(self.merged, stages)
+
+  @staticmethod
+  def combine(into: dict, stages: dict):
+    # add aggregates to others (peaks are combined by maximum, and the others by sum)
+    for stage, other in stages.items():
+      entry = into.setdefault(stage, {'count': 0, 'errors': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+      for key, value in other.items():
+        entry[key] = max(entry.get(key, 0), value) if key in MetricsSink.PEAKS else entry.get(key, 0) + value
+
+  def to_prometheus(self, prefix: str = 'pdf_links_stage') -> str:
+    """
+    Format the aggregates in the Prometheus text exposition format
+
+    :param prefix: prefix of metric names
+    :return: metrics text
+    """
+    metrics = [('count', 'spans_total', 'counter'), ('errors', 'errors_total', 'counter'),
+               ('seconds', 'seconds_total', 'counter'), ('max_seconds', 'max_seconds', 'gauge'),
+               ('rss_peak', 'max_rss_bytes', 'gauge')]
+    metrics += [(field, f'{field}_total', 'counter') for field in MetricsSink.FIELDS]
+    lines = []
+    with self.lock:
+      totals = {}
+      MetricsSink.combine(totals, self.merged)
+      MetricsSink.combine(totals, self.stages)
+    for key, name, kind in metrics:
+      lines.append(f'# TYPE {prefix}_{name} {kind}')
+      for stage, entry in sorted(totals.items()):
+        if key in entry:
+          lines.append(f'{prefix}_{name}{{stage="{stage}"}} {entry[key]}')
+    return '\n'.join(lines) + '\n'
+
+  def close(self):
+    if self.fp:
+      with open(self.fp, 'w', encoding='utf-8') as f:
+        f.write(self.to_prometheus())
+
+
+# ======================================================================================================================
+# MEMORY ACCOUNTING
+# ======================================================================================================================
+
+
+class MemoryLimitExceeded(MemoryError):
+  """
+  Raised in the thread that processes a document when the resident memory of its process goes over the ceiling of
+  a MemoryMonitor
+
+  """
+
+
+class MemoryMonitor:
+  """
+  Sample the resident memory (RSS) of the current process in a background thread while a document is processed, and
+  keep its peak (and the peak during each traced stage). RSS is sampled instead of using tracemalloc, as most memory
+  of parsers (PDFium, lxml, and PDFMiner layout objects held by them) is not allocated through Python.
+
+  If a ceiling is given and RSS goes over it, MemoryLimitExceeded is raised in the processing thread at its next
+  Python instruction. If that thread is stuck in native code for longer than a grace period, the process exits with
+  EXIT_CODE, so that its pool replaces it
+
+  """
+
+  # monitor of the document being processed in the current process (spans record their peak while it is set)
+  current: Optional['MemoryMonitor'] = None
+  INTERVAL = 0.01
+  EXIT_CODE = 75
+
+  def __init__(self, ceiling: Optional[int] = None, grace: Optional[float] = 5.0):
+    """
+    :param ceiling: maximum RSS of process, in bytes (default: no limit)
+    :param grace: time to wait for the processing thread to stop after the ceiling is reached, in seconds. If None,
+    wait as long as it takes (e.g. in the main process, which has no pool to replace it)
+    """
+    self.ceiling = ceiling
+    self.grace = grace
+    self.peak = 0
+    self.exceeded = False
+    self.spans = set()
+    self.thread_id = None
+    self.stopped = threading.Event()
+    self.lock = threading.Lock()
+    self.sampler = None
+
+  @staticmethod
+  def get_rss() -> int:
+    """
+    Return the resident memory of the current process, in bytes (or its peak, where the current value is unknown)
+
+    """
+    try:
+      with open('/proc/self/statm', 'rb') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+      import resource
+      # kilobytes on Linux, bytes on macOS
+      peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+      return peak if sys.platform == 'darwin' else peak * 1024
+
+  def __enter__(self) -> 'MemoryMonitor':
+    self.peak = MemoryMonitor.get_rss()
+    self.thread_id = threading.get_ident()
+    self.sampler = threading.Thread(target=self.sample, daemon=True)
+    MemoryMonitor.current = self
+    self.sampler.start()
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    import ctypes
+    with self.lock:
+      self.stopped.set()
+      if self.exceeded:
+        # clear the exception, in case the block ended before it was raised
+        ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(self.thread_id), None)
+    self.sampler.join()
+    MemoryMonitor.current = None
+    self.peak = max(self.peak, MemoryMonitor.get_rss())
+
+  def sample(self):
+    import ctypes
+    while not self.stopped.wait(MemoryMonitor.INTERVAL):
+      rss = MemoryMonitor.get_rss()
+      self.peak = max(self.peak, rss)
+      for span in list(self.spans):
+        span.rss_peak = max(span.rss_peak, rss)
+      if self.ceiling is None or rss <= self.ceiling or self.exceeded:
+        continue
+      with self.lock:
+        if self.stopped.is_set():
+          return
+        self.exceeded = True
+        exc = ctypes.py_object(MemoryLimitExceeded)
+        ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(self.thread_id), exc)
+      # the exception is raised once native code returns, so exit if it does not return in time
+      if self.grace is not None and not self.stopped.wait(self.grace):
+        print(f'exceeded {self.ceiling / 2 ** 20:.0f} MB in native code, exiting', file=sys.stderr)
+        os._exit(MemoryMonitor.EXIT_CODE)
+      return
+
 
-import bs4
 # ======================================================================================================================
 # REGEX CONFIGURATION
 # ======================================================================================================================
-import timeout_decorator
+
+
+class Registry:
+  """
+  Process-wide registry of resource lists and compiled regular expressions. Each entry is built once per process,
+  and rebuilt when any resource file it was built from changes
+
+  """
+
+  entries = {}
+  lock = threading.RLock()
+
+  @staticmethod
+  def stamp(fps: List[str]) -> List[list]:
+    """
+    Return the modification stamp of resource files
+
+    :param fps: paths to resource files
+    :return: [path, mtime, size] of each file
+    """
+    stamp = []
+    for fp in fps:
+      st = os.stat(fp)
+      stamp.append([os.path.abspath(fp), st.st_mtime_ns, st.st_size])
+    return stamp
+
+  @staticmethod
+  def get(key: str, fps: List[str], build: Callable[[], Any]) -> Any:
+    """
+    Return a registry entry, building it if missing or if its resource files changed
+
+    :param key: key of entry
+    :param fps: paths to resource files the entry is built from
+    :param build: function that builds the entry
+    :return: registry entry
+    """
+    stamp = Registry.stamp(fps)
+    with Registry.lock:
+      entry = Registry.entries.get(key)
+      if entry is None or entry[0] != stamp:
+        entry = Registry.entries[key] = (stamp, build())
+      return entry[1]
+
+  @staticmethod
+  def discard(key: str):
+    """
+    Remove a registry entry (if any), so that it is built again on next use
+
+    :param key: key of entry
+    """
+    with Registry.lock:
+      Registry.entries.pop(key, None)
+
+  @staticmethod
+  def get_regex(key: str, fps: List[str], build: Callable[[], List[str]], flags: int = 0) -> List[re.Pattern]:
+    """
+    Return compiled regular expressions of a registry entry
+
+    :param key: key of entry
+    :param fps: paths to resource files the regular expressions are built from
+    :param build: function that builds the sources of regular expressions
+    :param flags: flags to compile regular expressions with
+    :return: compiled regular expressions
+    """
+    return Registry.get(key, fps, lambda: [re.compile(source, flags) for source in build()])
 
 
 class UrlRegex:
@@ -16,12 +444,63 @@ class UrlRegex:
   Configuration class for URL regular expressions
   """
 
+  # characters of the first host label of partial URLs, for options where partial URLs start with one
+  LABEL_CHARS = {1: r"[\w\-]", 2: r"[a-z\d\-]"}
+
+  @staticmethod
+  def get_tld_regex(tlds: List[str]) -> str:
+    """
+    Build a regex that matches any TLD in a list. The regex is structured as a trie, so that each character of a
+    candidate TLD is matched once, instead of trying every TLD in turn. Longer TLDs are preferred over shorter ones,
+    which gives the same matches as an alternation of TLDs sorted by length (longest first)
+
+    :param tlds: list of TLDs
+    :return: regex of TLDs
+    """
+    trie = {}
+    for tld in tlds:
+      node = trie
+      for c in tld:
+        node = node.setdefault(c, {})
+      # mark end of TLD
+      node[''] = {}
+
+    def build(node: dict) -> str:
+      branches = [re.escape(c) + build(child) for c, child in sorted(node.items()) if c]
+      if len(branches) == 0:
+        return ''
+      body = branches[0] if len(branches) == 1 else rf"(?:{r'|'.join(branches)})"
+      # if a TLD ends here, prefer longer TLDs before stopping
+      return rf"(?:{body})?" if '' in node else body
+
+    return rf"({build(trie)})"
+
+  @staticmethod
+  def get_url_regex(option: int, tld: Optional[str] = None) -> List[re.Pattern]:
+    """
+    Return compiled [full URL, partial URL] regular expressions of an option (built once per process)
+
+    :param option: regex option
+    :param tld: regex of TLDs (default: trie of resources/tld.txt, cached)
+    :return: compiled regular expressions
+    """
+    if tld is not None:
+      return [re.compile(source, re.I) for source in UrlRegex.get_url_patterns(option, tld)]
+    return Registry.get_regex(f'url:{option}', [Util.TLD_FILE], lambda: UrlRegex.get_url_patterns(option), re.I)
+
   @staticmethod
-  def get_url_regex(option: int):
+  def get_url_patterns(option: int, tld: Optional[str] = None) -> List[str]:
+    """
+    Build [full URL, partial URL] regex sources of an option
+
+    :param option: regex option
+    :param tld: regex of TLDs (default: trie of resources/tld.txt)
+    :return: regex sources
+    """
 
     __protocol = r"https?://"
     __port = r"(?::\d+)?"
-    __tld = rf"({r'|'.join(Util.read_tld_list())})"
+    __tld = tld or UrlRegex.get_tld_regex(Util.read_tld_list())
 
     # https://stackoverflow.com/questions/6038061/regular-expression-to-find-urls-within-a-string
     if option in [1, 3]:
@@ -41,8 +520,8 @@ class UrlRegex:
         raise NotImplementedError('Option Does Not Exist!')
 
       return [
-        re.compile(rf'({__protocol}{__host}{__port}{__path})', re.I),
-        re.compile(rf'({__p_host}{__port}{__path})', re.I)
+        rf'({__protocol}{__host}{__port}{__path})',
+        rf'({__p_host}{__port}{__path})'
       ]
 
     # http://www.faqs.org/rfcs/rfc3986.html
@@ -64,22 +543,163 @@ class UrlRegex:
         raise NotImplementedError('Option Does Not Exist!')
 
       return [
-        re.compile(rf'({__protocol}{__host}{__port}{__path})', re.I),
-        re.compile(rf'({__p_host}{__port}{__path})', re.I)
+        rf'({__protocol}{__host}{__port}{__path})',
+        rf'({__p_host}{__port}{__path})'
       ]
     else:
       raise NotImplementedError('Option Does Not Exist!')
 
   @staticmethod
-  def get_blacklist_regex():
-    return re.compile(rf".*({'|'.join(Util.read_blacklist())}).*", re.I)
+  def get_label_regex(option: int, partial: re.Pattern) -> List[Optional[re.Pattern]]:
+    """
+    Return compiled [partial URL at label start, label continuation] regular expressions of an option (built once
+    per process), or Nones if partial URLs of the option do not start with a host label. See Util.find_partial_urls
+
+    :param option: regex option
+    :param partial: compiled partial URL regex of option
+    :return: compiled regular expressions
+    """
+    if option not in UrlRegex.LABEL_CHARS:
+      return [None, None]
+    chars = UrlRegex.LABEL_CHARS[option]
+    return Registry.get_regex(
+      f'url:{option}:label', [Util.TLD_FILE], lambda: [rf"(?<!{chars}){partial.pattern}", chars * 2], re.I
+    )
+
+  @staticmethod
+  def get_blacklist_regex() -> re.Pattern:
+    [blacklist] = Registry.get_regex(
+      'blacklist', [Util.BLACKLIST_FILE], lambda: [rf".*({'|'.join(Util.read_blacklist())}).*"], re.I
+    )
+    return blacklist
+
+  @staticmethod
+  def get_blacklist_terms_regex() -> re.Pattern:
+    # matches the blacklisted terms only (a line matches the blacklist regex if it contains one)
+    [terms] = Registry.get_regex(
+      'blacklist:terms', [Util.BLACKLIST_FILE], lambda: [rf"({'|'.join(Util.read_blacklist())})"], re.I
+    )
+    return terms
 
   def __init__(self, option: int):
+    self.option = option
     # set regex URL patterns
     [self.FULL_URL, self.PARTIAL_URL] = self.get_url_regex(option)
+    [self.PARTIAL_URL_AT_LABEL, self.IN_LABEL] = self.get_label_regex(option, self.PARTIAL_URL)
     # set regex URL blacklist
     self.BLACKLIST = self.get_blacklist_regex()
 
+  def __getstate__(self):
+    # other processes rebuild the regexes from their registry, instead of unpickling them
+    return {'option': self.option}
+
+  def __setstate__(self, state):
+    self.__init__(**state)
+
+
+# ======================================================================================================================
+# STRING MATCHING
+# ======================================================================================================================
+
+class Automaton:
+  """
+  Aho-Corasick automaton over a set of keys. Finds every key that occurs in a text in one pass over the text,
+  instead of one substring test per key
+
+  """
+
+  def __init__(self, keys: Iterable[str]):
+    # key id of each distinct key
+    self.ids = {}
+    # trie transitions, failure links, key id ending at each node (-1 if none), and nearest node on the failure
+    # chain where a key ends (-1 if none)
+    self.goto = [{}]
+    self.fail = [0]
+    self.out = [-1]
+    self.link = [-1]
+    for key in keys:
+      self.add(key)
+    self.build()
+
+  def add(self, key: str) -> int:
+    if key in self.ids:
+      return self.ids[key]
+    node = 0
+    for c in key:
+      nxt = self.goto[node].get(c)
+      if nxt is None:
+        nxt = self.goto[node][c] = len(self.goto)
+        self.goto.append({})
+        self.fail.append(0)
+        self.out.append(-1)
+        self.link.append(-1)
+      node = nxt
+    key_id = self.ids[key] = len(self.ids)
+    self.out[node] = key_id
+    return key_id
+
+  def build(self):
+    goto, fail, out, link = self.goto, self.fail, self.out, self.link
+    queue = collections.deque(goto[0].values())
+    while queue:
+      node = queue.popleft()
+      for c, child in goto[node].items():
+        # follow failure links of parent until a transition on c exists
+        f = fail[node]
+        while f and c not in goto[f]:
+          f = fail[f]
+        fail[child] = goto[f].get(c, 0)
+        link[child] = fail[child] if out[fail[child]] >= 0 else link[fail[child]]
+        queue.append(child)
+
+  def find(self, text: str) -> Set[int]:
+    """
+    Return the ids of keys that occur in text
+
+    :param text: text to search
+    :return: set of key ids
+    """
+    goto, fail, out, link = self.goto, self.fail, self.out, self.link
+    found = set()
+    # the empty key (if any) occurs in every text
+    if out[0] >= 0:
+      found.add(out[0])
+    node = 0
+    for c in text:
+      while node and c not in goto[node]:
+        node = fail[node]
+      node = goto[node].get(c, 0)
+      v = node if out[node] >= 0 else link[node]
+      while v > 0 and out[v] not in found:
+        found.add(out[v])
+        v = link[v]
+    return found
+
+
+class TranslitTable(dict):
+  """
+  Translation table (for str.translate) from code points to ASCII, as unidecode transliterates them. Characters
+  that are common in PDF text are mapped ahead of use, and any other character on first use
+
+  """
+
+  # ligatures, quotes, dashes, bullets and spaces of PDF text
+  COMMON = (
+    '\ufb00\ufb01\ufb02\ufb03\ufb04\ufb05\ufb06\u2018\u2019\u201a\u201c\u201d\u201e\u2010\u2011\u2012\u2013\u2014'
+    '\u2022\u2026\u2032\u2212\u00a0\u00ad\u00b4\u00b7\u00d7\u00e9\u00fc\u00f6\u00e4\u00e8'
+  )
+
+  def __init__(self):
+    super().__init__()
+    for char in TranslitTable.COMMON:
+      self.__missing__(ord(char))
+
+  def __missing__(self, codepoint: int) -> str:
+    from unidecode import unidecode
+    # unidecode maps each character on its own, so a character maps the same in any text
+    value = self[codepoint] = unidecode(chr(codepoint))
+    return value
+
 
 # ======================================================================================================================
 # UTILITY FUNCTIONS
@@ -91,15 +711,32 @@ class Util:
 
   """
 
+  BLACKLIST_FILE = 'resources/blacklist.txt'
+  TLD_FILE = 'resources/tld.txt'
+  # largest pool deduplicated with pairwise substring tests
+  PAIRWISE_LIMIT = 256
+  # a run of spaces (without newlines) between words, which neither augment nor URL regexes can match across
+  SAFE_CUT = re.compile(r"(?<=\S)[^\S\n]+(?=\S)")
+  # size of blocks (split at safe cuts) that URLs are found in, to bound the size of rewritten copies
+  BLOCK_SIZE = 2 ** 16
+  # a run of non-ASCII characters
+  NON_ASCII = re.compile(r"[^\x00-\x7f]+")
+
   @staticmethod
-  def read_blacklist(fp: str = 'resources/blacklist.txt') -> List[str]:
-    with open(fp, 'r', encoding='utf-8') as f:
-      return sorted(map(str.strip, f.readlines()))
+  def read_blacklist(fp: str = BLACKLIST_FILE) -> List[str]:
+    def _read():
+      with open(fp, 'r', encoding='utf-8') as f:
+        return sorted(map(str.strip, f.readlines()))
+
+    return list(Registry.get(f'blacklist_list:{fp}', [fp], _read))
 
   @staticmethod
-  def read_tld_list(fp: str = 'resources/tld.txt') -> List[str]:
-    with open(fp, 'r', encoding='utf-8') as f:
-      return sorted(map(str.strip, f.readlines()), key=len, reverse=True)
+  def read_tld_list(fp: str = TLD_FILE) -> List[str]:
+    def _read():
+      with open(fp, 'r', encoding='utf-8') as f:
+        return sorted(map(str.strip, f.readlines()), key=len, reverse=True)
+
+    return list(Registry.get(f'tld_list:{fp}', [fp], _read))
 
   @staticmethod
   def canonicalize_url(url: str) -> Optional[str]:
@@ -128,64 +765,233 @@ class Util:
     :param online: if True, send a HEAD request and check for 200 OK. Else (default) validate syntactically
     :return: subset of valid URLs
     """
-
-    @timeout_decorator.timeout(seconds=2)
-    def is_valid(url: str):
-      # validate against URL blacklist
-      if blacklist.search(url) is not None:
-        return False
-      # validate URL integrity
-      if online:
-        import requests
-        return requests.head(url).ok
-      else:
-        import validators
-        return validators.url(url, public=True)
-
-    blacklist = UrlRegex.get_blacklist_regex()
-    valid_urls = set()
-    for u in s.difference({None}):
-      try:
-        if is_valid(u):
-          valid_urls.add(u)
-      except:
-        continue
-    return valid_urls
+    return Validator(online=online).get_valid_urls(s)
 
   @staticmethod
   def augment(text: str) -> str:
+    with Tracer.span('augment', bytes_in=len(text)) as span:
+      agg_text = f"{Util.rewrite(text)}\n{text}\n"
+      span.set(bytes_out=len(agg_text))
+    return agg_text
+
+  @staticmethod
+  def rewrite(text: str) -> str:
     # remove occurrences of [space(s)-newlines-space(s)]
     aug_text = re.sub(r"(\s*\n+\s*)", r"", text, flags=re.I)
     aug_text = re.sub(r"(https?://www\.|https?://|www\.)", r" \1", aug_text, flags=re.I)
-    agg_text = f"{aug_text}\n{text}\n"
-    return agg_text
+    return aug_text
 
   @staticmethod
-  def harvest_urls(text: str, regex: UrlRegex) -> Set[str]:
+  def harvest_urls(text: str, regex: UrlRegex, validator: Optional['Validator'] = None) -> Set[str]:
     """
     Extract URLs from full text
 
     :param text: full text input
     :param regex: configuration to use
+    :param validator: URL validator to use (default: syntactic validation)
     :return: set of URLs found in full text
     """
-    from unidecode import unidecode
-    # simplify unicode characters in text
-    text = unidecode(text)
-    # augment text
-    text = Util.augment(text)
-    # parse and yield urls
-    urls = set()
+    return set().union(*Util.stream_urls([text], regex, validator))
+
+  @staticmethod
+  def stream_urls(texts: Iterable[str], regex: UrlRegex, validator: Optional['Validator'] = None) -> Iterator[Set[str]]:
+    """
+    Extract URLs from a stream of full text (e.g. pages), yielding valid URLs as soon as they are complete. URLs split
+    across chunks (and lines) are found as if the full text was given at once
+
+    :param texts: chunks of full text input
+    :param regex: configuration to use
+    :param validator: URL validator to use (default: syntactic validation)
+    :return: iterator of sets of new URLs
+    """
+    validator = validator or Validator()
+    seen = set()
+    for segment in Util.split_text(texts):
+      # get new, valid urls
+      with Tracer.span('scan', bytes_in=len(segment)) as span:
+        urls = Util.find_urls(segment, regex)
+        span.set(urls_out=len(urls))
+      urls.difference_update(seen)
+      seen.update(urls)
+      yield validator.get_valid_urls(urls)
 
-    def find_urls(v: str, r: re.Pattern) -> List[str]:
-      for m in r.finditer(v):
-        yield Util.canonicalize_url(m.group())
+  @staticmethod
+  def transliterate(text: str) -> str:
+    """
+    Simplify unicode characters of text to ASCII (the same as unidecode). ASCII text, and ASCII spans of text, are
+    kept as they are, and the other spans are mapped with a translation table (built once per process)
 
-    urls = urls.union(find_urls(text, regex.FULL_URL))
-    urls = urls.union(find_urls(text, regex.PARTIAL_URL))
-    # get valid urls from the set
-    valid_urls = Util.get_valid_urls(urls)
-    return valid_urls
+    :param text: text input
+    :return: ASCII text
+    """
+    if text.isascii():
+      return text
+    table = Registry.get('translit', [], TranslitTable)
+    return Util.NON_ASCII.sub(lambda m: m.group().translate(table), text)
+
+  @staticmethod
+  def split_text(texts: Iterable[str]) -> Iterator[str]:
+    """
+    Simplify a stream of full text (e.g. pages), and split it into segments at safe cuts, so that no URL spans two
+    segments. Each segment is yielded as soon as it is complete
+
+    :param texts: chunks of full text input
+    :return: iterator of segments of (simplified) full text
+    """
+    # text after the last safe cut, which may continue in the next chunk
+    carry = ''
+    for text in texts:
+      # simplify unicode characters in text (character by character, so chunks can be simplified separately)
+      buffer = carry + Util.transliterate(text)
+      # the last run of spaces in carry may become a safe cut, but no earlier one
+      cut = Util.find_last_cut(buffer, len(carry.rstrip()))
+      if cut is None:
+        carry = buffer
+        continue
+      carry = buffer[cut:]
+      yield buffer[:cut]
+    yield carry
+
+  @staticmethod
+  def find_last_cut(text: str, start: int = 0, end: Optional[int] = None) -> Optional[int]:
+    """
+    Find the last safe cut of text, searching back from the end in growing windows (safe cuts are frequent, so
+    this is faster than finding them all)
+
+    :param text: text input
+    :param start: position to search from
+    :param end: position to search until (default: end of text)
+    :return: position of last safe cut within [start, end), or None if there is none
+    """
+    end = len(text) if end is None else end
+    window = 256
+    while True:
+      pos = max(start, end - window)
+      cut = None
+      # a cut is a whole run of spaces (its lookbehind sees the text before pos), so runs after pos are the same
+      for m in Util.SAFE_CUT.finditer(text, pos, end):
+        cut = m.start()
+      if cut is not None or pos == start:
+        return cut
+      window *= 8
+
+  @staticmethod
+  def find_urls(segment: str, regex: UrlRegex) -> Set[Optional[str]]:
+    """
+    Find (unvalidated) URLs in a segment of simplified full text
+
+    :param segment: segment of full text (see split_text)
+    :param regex: configuration to use
+    :return: set of canonical URLs (None for URLs that cannot be canonicalized)
+    """
+    return set(Util.iter_urls(segment, regex))
+
+  @staticmethod
+  def iter_urls(segment: str, regex: UrlRegex) -> Iterator[Optional[str]]:
+    """
+    Find (unvalidated) URLs in a segment of simplified full text, as they are matched. Gives the same URLs as
+    matching the augmented segment (see augment), but scans the rewritten segment and the segment in turn, instead of
+    copying both into one string (URL regexes cannot match across the newline between them)
+
+    :param segment: segment of full text (see split_text)
+    :param regex: configuration to use
+    :return: iterator of canonical URLs (None for URLs that cannot be canonicalized), possibly repeated
+    """
+    # the rewrite and the URL regexes do not cross safe cuts, so blocks are rewritten and matched separately
+    for block in Util.split_blocks(segment):
+      for text in [Util.rewrite(block), block]:
+        for m in regex.FULL_URL.finditer(text):
+          yield Util.canonicalize_url(m.group())
+        for m in Util.find_partial_urls(text, regex):
+          yield Util.canonicalize_url(m.group())
+
+  @staticmethod
+  def split_blocks(text: str) -> Iterator[str]:
+    """
+    Split text into blocks of about BLOCK_SIZE characters, at safe cuts
+
+    :param text: text input
+    :return: iterator of blocks
+    """
+    pos = 0
+    while len(text) - pos > Util.BLOCK_SIZE:
+      # cut at the last safe cut within the block size, or else at the first one after it
+      cut = Util.find_last_cut(text, pos + 1, pos + Util.BLOCK_SIZE)
+      if cut is None:
+        m = Util.SAFE_CUT.search(text, pos + Util.BLOCK_SIZE)
+        if m is None:
+          break
+        cut = m.start()
+      yield text[pos:cut]
+      pos = cut
+    yield text[pos:]
+
+  @staticmethod
+  def find_partial_urls(text: str, regex: UrlRegex) -> Iterator[re.Match]:
+    """
+    Match partial URLs in text, as regex.PARTIAL_URL.finditer does, but only trying to match at the first character
+    of each host label. If a partial URL starts inside a label, another one starts at the first character of that
+    label, so no match is lost (only a previous match may end inside a label, where the next match is tried)
+
+    :param text: text input
+    :param regex: configuration to use
+    :return: iterator of matches of regex.PARTIAL_URL
+    """
+    if regex.PARTIAL_URL_AT_LABEL is None:
+      yield from regex.PARTIAL_URL.finditer(text)
+      return
+    pos = 0
+    while True:
+      m = None
+      if pos > 0 and regex.IN_LABEL.match(text, pos - 1):
+        m = regex.PARTIAL_URL.match(text, pos)
+      if m is None:
+        m = regex.PARTIAL_URL_AT_LABEL.search(text, pos)
+      if m is None:
+        return
+      yield m
+      pos = m.end()
+
+  @staticmethod
+  def scan_urls(texts: Iterable[str], regex: UrlRegex) -> Tuple[str, Set[Optional[str]], Optional[str]]:
+    """
+    Find (unvalidated) URLs in a range of full text (e.g. some pages of a PDF) that may continue a previous range,
+    and be continued by a next one. Only URLs between the first and last safe cuts of range are found, as the text
+    before (head) and after (tail) them is only complete when stitched with the neighbouring ranges (see stitch_urls)
+
+    :param texts: chunks of full text in range
+    :param regex: configuration to use
+    :return: head, set of URLs, and tail of range (tail is None if range has no safe cut, i.e. it is all head)
+    """
+    segments = list(Util.split_text(texts))
+    if len(segments) == 1:
+      return segments[0], set(), None
+    urls = set().union(*(Util.find_urls(segment, regex) for segment in segments[1:-1]))
+    return segments[0], urls, segments[-1]
+
+  @staticmethod
+  def stitch_urls(scans: Iterable[tuple], regex: UrlRegex) -> Set[Optional[str]]:
+    """
+    Merge the scans of consecutive ranges of full text (see scan_urls), finding the URLs that span ranges in the
+    text between the last safe cut of one range and the first safe cut of the next. The result is the same as
+    scanning the full text at once
+
+    :param scans: head, set of URLs, and tail of each range, in order
+    :param regex: configuration to use
+    :return: set of (unvalidated) URLs of full text
+    """
+    urls = set()
+    # text after the last safe cut so far
+    carry = ''
+    for head, range_urls, tail in scans:
+      if tail is None:
+        carry += head
+        continue
+      urls.update(Util.find_urls(carry + head, regex))
+      urls.update(range_urls)
+      carry = tail
+    urls.update(Util.find_urls(carry, regex))
+    return urls
 
   @staticmethod
   def has_match(x: str, pool: Set[str]):
@@ -206,10 +1012,45 @@ class Util:
     :param prefer_long: Whether to favor short URLs (default) or long URLs
     :return: subset of unique URLs
     """
+    with Tracer.span('uniq', urls_in=len(pool)) as span:
+      urls = sorted(pool, key=len, reverse=prefer_long)
+      # pairwise tests are faster than building an index for small pools
+      if len(urls) <= Util.PAIRWISE_LIMIT:
+        uniq_urls = set()
+        for url in urls:
+          if not Util.has_match(url, uniq_urls):
+            uniq_urls.add(url)
+      else:
+        uniq_urls = Util.pick_uniq_indexed(urls)
+      span.set(urls_out=len(uniq_urls))
+    return uniq_urls
+
+  @staticmethod
+  def pick_uniq_indexed(urls: List[str]) -> Set[str]:
+    """
+    Return a subset of unique URLs from a list, picked in order, using an Aho-Corasick index of URLs
+
+    :param urls: list of URLs, in order of preference
+    :return: subset of unique URLs
+    """
+    automaton = Automaton(url[8:] for url in urls)
+    # index which keys (URLs without scheme) contain which other keys
+    sub_keys = [set() for _ in automaton.ids]
+    sup_keys = [set() for _ in automaton.ids]
+    for key, key_id in automaton.ids.items():
+      for sub_id in automaton.find(key):
+        if sub_id != key_id:
+          sub_keys[key_id].add(sub_id)
+          sup_keys[sub_id].add(key_id)
+    # pick URLs in order, skipping any URL whose key is a sub/super string of a picked key
+    picked = set()
     uniq_urls = set()
-    for url in sorted(pool, key=len, reverse=prefer_long):
-      if not Util.has_match(url, uniq_urls):
-        uniq_urls.add(url)
+    for url in urls:
+      key_id = automaton.ids[url[8:]]
+      if key_id in picked or not picked.isdisjoint(sub_keys[key_id]) or not picked.isdisjoint(sup_keys[key_id]):
+        continue
+      picked.add(key_id)
+      uniq_urls.add(url)
     return uniq_urls
 
   @staticmethod
@@ -221,13 +1062,728 @@ class Util:
     :param blacklist: set of URLs to avoid
     :return: subset of new URLs
     """
-    # return subset of uniq_urls that are not in blacklist
-    return set(url for url in pool if not Util.has_match(url, blacklist))
+    with Tracer.span('new', urls_in=len(pool)) as span:
+      if len(blacklist) == 0:
+        new_urls = set(pool)
+      # pairwise tests are faster than building an index for small pools
+      elif len(pool) * len(blacklist) <= Util.PAIRWISE_LIMIT ** 2:
+        new_urls = set(url for url in pool if not Util.has_match(url, blacklist))
+      else:
+        new_urls = Util.pick_new_indexed(pool, blacklist)
+      span.set(urls_out=len(new_urls))
+    return new_urls
 
+  @staticmethod
+  def pick_new_indexed(pool: Set[str], blacklist: Set[str]) -> Set[str]:
+    """
+    Return a subset of URLs from pool that are not in the blacklist, using Aho-Corasick indexes of both
 
-# ======================================================================================================================
-# PYPDF2 FUNCTIONS
-# ======================================================================================================================
+    :param pool: pool of URLs
+    :param blacklist: set of URLs to avoid
+    :return: subset of new URLs
+    """
+    # URLs whose key (URL without scheme) contains a blacklisted key
+    blacklist_automaton = Automaton(url[8:] for url in blacklist)
+    matched = set(url for url in pool if len(blacklist_automaton.find(url[8:])) > 0)
+    # URLs whose key is contained in a blacklisted key
+    pool_automaton = Automaton(url[8:] for url in pool)
+    matched_ids = set()
+    for url in blacklist:
+      matched_ids.update(pool_automaton.find(url[8:]))
+    matched.update(url for url in pool if pool_automaton.ids[url[8:]] in matched_ids)
+    # return subset of pool that does not match the blacklist
+    return set(url for url in pool if url not in matched)
+
+
+# ======================================================================================================================
+# URL VALIDATION
+# ======================================================================================================================
+
+class Validator:
+  """
+  Batched URL validation. The blacklist is evaluated over the whole set of URLs at once, and the time budget is
+  checked between URLs instead of using signals, so a Validator can be used from any thread or event loop
+
+  """
+
+  # rejection reasons
+  BLACKLISTED = 'blacklisted'
+  MALFORMED = 'malformed'
+  TOO_LONG = 'too long'
+  UNREACHABLE = 'unreachable'
+  TIMEOUT = 'timeout'
+  ERROR = 'error'
+  # reasons that may not hold on a later attempt
+  TRANSIENT = {TIMEOUT, ERROR}
+
+  # URLs longer than this are rejected without a syntax check (as too long). None to check URLs of any length
+  MAX_URL_LENGTH: Optional[int] = 2048
+  # version of the syntax check, to be bumped whenever its code changes (other than the URL syntax regex and the
+  # length limit, which are part of the version tag of syntax verdicts already)
+  SYNTAX_VERSION = 1
+  # time budget for verifying a whole set of URLs online when no deadline is given, in seconds (URLs are verified
+  # concurrently, so the time budget per URL does not add up)
+  ONLINE_DEADLINE = 60.0
+
+  def __init__(self, online: bool = False, timeout: float = 2.0, deadline: Optional[float] = None,
+               verifier: Optional['Verifier'] = None, cache: Optional['ValidationCache'] = None):
+    """
+    :param online: if True, verify that URLs are reachable. Else (default) validate syntactically
+    :param timeout: time budget per URL, in seconds
+    :param deadline: time budget for a whole set of URLs, in seconds (default: timeout per URL, up to
+    ONLINE_DEADLINE when verifying online)
+    :param verifier: online verifier to use (default: Verifier with the given timeout and deadline)
+    :param cache: persistent cache of verdicts to reuse across documents (default: none)
+    """
+    self.online = online
+    self.timeout = timeout
+    self.deadline = deadline
+    self.verifier = verifier
+    self.cache = cache
+
+  @staticmethod
+  def get_syntax_regex() -> re.Pattern:
+    """
+    Return the URL pattern of the validators package, with each host label rewritten into an equivalent form that
+    cannot backtrack. The original form, (?:xn--|X-?)*X+, splits a label in exponentially many ways, which makes a
+    failed match run for minutes on long hosts
+
+    :return: URL syntax regex
+    """
+
+    def build():
+      import validators
+      pattern = sys.modules['validators.url'].pattern
+      # a label is a run of characters X and single hyphens, that starts and ends with X. A double hyphen is only
+      # allowed after 'xn'. Nothing that follows a label can extend it, so the label is matched atomically (as a
+      # lookahead, which is not backtracked into, and a backreference to what it matched)
+      labels = itertools.count()
+
+      def atomic(m: re.Match) -> str:
+        name = f'_label{next(labels)}'
+        return rf'(?=(?P<{name}>{m[1]}(?:{m[1]}|-(?={m[1]})|(?<=xn)--(?={m[1]}))*))(?P={name})'
+
+      source = re.sub(r'\(\?:\(\?:xn--\)\|(\[[^]]+])-\?\)\*\1\+', atomic, pattern.pattern)
+      return re.compile(source, pattern.flags)
+
+    return Registry.get('validators:url', [], build)
+
+  @staticmethod
+  def get_syntax_version() -> str:
+    """
+    Return the version tag of syntax verdicts, from a fingerprint of the URL syntax regex and the URL length limit,
+    so that cached verdicts are not reused once either changes (e.g. with another version of the validators package)
+
+    :return: version tag (e.g. 1:3f2a9c1b04de:2048)
+    """
+
+    def build():
+      import hashlib
+      regex = Validator.get_syntax_regex()
+      return hashlib.sha256(f"{regex.pattern}\0{regex.flags}".encode('utf-8')).hexdigest()[:12]
+
+    fingerprint = Registry.get('validators:url:fingerprint', [], build)
+    return f"{Validator.SYNTAX_VERSION}:{fingerprint}:{Validator.MAX_URL_LENGTH}"
+
+  @staticmethod
+  def is_valid_syntax(url: str, regex: Optional[re.Pattern] = None) -> bool:
+    """
+    Check if a URL is syntactically valid and public, as validators.url(url, public=True) does
+
+    :param url: URL
+    :param regex: URL syntax regex (default: see get_syntax_regex)
+    :return: True if valid, else False
+    """
+    m = (regex or Validator.get_syntax_regex()).match(url)
+    return m is not None and m['private_ip'] is None and m['private_host'] is None
+
+  def find_blacklisted(self, urls: List[str]) -> Set[str]:
+    """
+    Return the subset of URLs that match the URL blacklist, in one scan over all URLs
+
+    :param urls: list of URLs
+    :return: subset of blacklisted URLs
+    """
+    import bisect
+    # search for the terms, instead of matching whole lines (which is retried from every position of a line)
+    blacklist = UrlRegex.get_blacklist_terms_regex()
+    # URLs with line breaks cannot be scanned as one line each
+    multiline = [url for url in urls if '\n' in url]
+    lines = [url for url in urls if '\n' not in url]
+    blacklisted = set(url for url in multiline if blacklist.search(url) is not None)
+    # the blacklist regex does not match across lines, so each match falls within one URL
+    starts = list(itertools.accumulate((len(url) + 1 for url in lines), initial=0))
+    for m in blacklist.finditer('\n'.join(lines)):
+      blacklisted.add(lines[bisect.bisect_right(starts, m.start()) - 1])
+    return blacklisted
+
+  def validate(self, s: Iterable[Optional[str]]) -> Dict[str, Optional[str]]:
+    """
+    Validate a set of URLs
+
+    :param s: set of URLs to validate
+    :return: rejection reason of each URL (None if valid)
+    """
+    urls = sorted(set(s).difference({None}))
+    reasons = dict.fromkeys(urls)
+    # validate against URL blacklist
+    for url in self.find_blacklisted(urls):
+      reasons[url] = Validator.BLACKLISTED
+    # validate URL integrity, reusing cached verdicts (syntax verdicts only of the same version)
+    kind = 'online' if self.online else f'syntax:{Validator.get_syntax_version()}'
+    pending = [url for url in urls if reasons[url] is None]
+    if self.cache is not None:
+      cached = self.cache.get(pending, kind)
+      reasons.update(cached)
+      pending = [url for url in pending if url not in cached]
+    checked = self.check_online(pending) if self.online else self.check_syntax(pending)
+    reasons.update(checked)
+    # cache verdicts, except for transient failures
+    if self.cache is not None:
+      self.cache.put({url: r for url, r in checked.items() if r not in Validator.TRANSIENT}, kind)
+    return reasons
+
+  def check_syntax(self, urls: List[str]) -> Dict[str, Optional[str]]:
+    """
+    Validate URLs syntactically, within the time budget
+
+    :param urls: list of URLs
+    :return: rejection reason of each URL (None if valid)
+    """
+    reasons = dict.fromkeys(urls)
+    if len(urls) == 0:
+      return reasons
+    # built outside of the checks, so that a pattern that does not compile is an error (not a verdict of each URL)
+    regex = Validator.get_syntax_regex()
+    budget = self.deadline if self.deadline is not None else self.timeout * len(urls)
+    time_end = time.monotonic() + budget
+    for url in urls:
+      if time.monotonic() >= time_end:
+        reasons[url] = Validator.TIMEOUT
+        continue
+      if Validator.MAX_URL_LENGTH is not None and len(url) > Validator.MAX_URL_LENGTH:
+        reasons[url] = Validator.TOO_LONG
+        continue
+      try:
+        if not Validator.is_valid_syntax(url, regex):
+          reasons[url] = Validator.MALFORMED
+      except Exception:
+        reasons[url] = Validator.ERROR
+    return reasons
+
+  def check_online(self, urls: List[str]) -> Dict[str, Optional[str]]:
+    """
+    Validate URLs by verifying that they are reachable, within the time budget
+
+    :param urls: list of URLs
+    :return: rejection reason of each URL (None if valid)
+    """
+    if len(urls) == 0:
+      return {}
+    if self.deadline is not None:
+      deadline = self.deadline
+    else:
+      deadline = min(self.timeout * len(urls), Validator.ONLINE_DEADLINE)
+    verifier = self.verifier or Verifier(timeout=self.timeout, deadline=deadline)
+    return verifier.verify(urls)
+
+  def get_valid_urls(self, s: Iterable[Optional[str]]) -> Set[str]:
+    """
+    Return the subset of valid URLs from a given set of URLs
+
+    :param s: set of URLs to pick valid URLs from
+    :return: subset of valid URLs
+    """
+    with Tracer.span('validate') as span:
+      reasons = self.validate(s)
+      valid_urls = set(url for url, reason in reasons.items() if reason is None)
+      span.set(urls_in=len(reasons), urls_out=len(valid_urls))
+    return valid_urls
+
+
+class ValidationCache:
+  """
+  Persistent cache of URL verdicts, keyed by canonical URL and kind of verdict (syntax verdicts are kept apart per
+  version of the syntax check). Verdicts are stored in an SQLite database (in WAL mode), so that one cache file can be
+  shared by concurrent worker processes
+
+  """
+
+  # maximum number of URLs per query (SQLite limits the number of query parameters)
+  CHUNK_SIZE = 500
+
+  def __init__(self, fp: str, ttl: Optional[float] = None):
+    """
+    :param fp: path to cache file
+    :param ttl: time-to-live of verdicts, in seconds (default: no expiry)
+    """
+    self.fp = fp
+    self.ttl = ttl
+    self.conn = None
+    self.pid = None
+    self.lock = threading.Lock()
+
+  def __getstate__(self):
+    # connections cannot be shared with other processes, so each process opens its own
+    return {'fp': self.fp, 'ttl': self.ttl}
+
+  def __setstate__(self, state):
+    self.__init__(**state)
+
+  def connect(self):
+    import sqlite3
+    if self.conn is None or self.pid != os.getpid():
+      self.conn = sqlite3.connect(self.fp, timeout=60, isolation_level=None, check_same_thread=False)
+      self.conn.execute('PRAGMA journal_mode=WAL')
+      self.conn.execute(
+        'CREATE TABLE IF NOT EXISTS verdicts ('
+        'url TEXT NOT NULL, kind TEXT NOT NULL, reason TEXT, checked_at REAL NOT NULL, PRIMARY KEY (url, kind))'
+      )
+      self.pid = os.getpid()
+    return self.conn
+
+  def get(self, urls: List[str], kind: str) -> Dict[str, Optional[str]]:
+    """
+    Return cached verdicts of URLs
+
+    :param urls: list of URLs
+    :param kind: kind of verdict ('online', or 'syntax:' and the version tag of syntax verdicts)
+    :return: rejection reason (None if valid) of each URL with a cached verdict
+    """
+    keys = {Util.canonicalize_url(url): url for url in urls}
+    min_checked_at = time.time() - self.ttl if self.ttl is not None else 0
+    verdicts = {}
+    with self.lock:
+      conn = self.connect()
+      key_list = list(keys)
+      for i in range(0, len(key_list), ValidationCache.CHUNK_SIZE):
+        chunk = key_list[i:i + ValidationCache.CHUNK_SIZE]
+        rows = conn.execute(
+          'SELECT url, reason FROM verdicts WHERE kind = ? AND checked_at >= ? '
+          f"AND url IN ({','.join('?' * len(chunk))})",
+          [kind, min_checked_at, *chunk]
+        )
+        for key, reason in rows:
+          verdicts[keys[key]] = reason
+    return verdicts
+
+  def put(self, verdicts: Dict[str, Optional[str]], kind: str):
+    """
+    Store verdicts of URLs
+
+    :param verdicts: rejection reason (None if valid) of each URL
+    :param kind: kind of verdict ('online', or 'syntax:' and the version tag of syntax verdicts)
+    """
+    if len(verdicts) == 0:
+      return
+    checked_at = time.time()
+    rows = [(Util.canonicalize_url(url), kind, reason, checked_at) for url, reason in verdicts.items()]
+    with self.lock:
+      conn = self.connect()
+      conn.executemany('INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?)', rows)
+
+
+class Verifier:
+  """
+  Asynchronous online URL verification. Requests share a pooled HTTP client with global and per-host connection
+  limits, failed requests are retried with exponential backoff, and URLs still pending at the deadline are given up.
+  Verdicts are cached for the process, with a time-to-live, except transient ones (timeouts and errors)
+
+  """
+
+  # verdict cache of the process: URL -> (rejection reason, expiry time), oldest first
+  cache = {}
+  cache_lock = threading.Lock()
+  # maximum number of cached verdicts, beyond which the oldest are evicted
+  MAX_CACHE_SIZE = 100000
+
+  # statuses worth retrying, and statuses of servers that do not support HEAD requests
+  RETRY_STATUS = {429, 500, 502, 503, 504}
+  NO_HEAD_STATUS = {403, 404, 405, 501}
+
+  def __init__(self, max_connections: int = 100, max_per_host: int = 4, retries: int = 2, backoff: float = 0.5,
+               timeout: float = 10.0, deadline: float = 60.0, ttl: float = 3600.0):
+    """
+    :param max_connections: maximum number of concurrent connections
+    :param max_per_host: maximum number of concurrent connections per host
+    :param retries: number of retries of a failed request
+    :param backoff: delay before the first retry, in seconds (doubled on each retry)
+    :param timeout: time budget per request, in seconds
+    :param deadline: time budget for a whole set of URLs, in seconds
+    :param ttl: time-to-live of cached verdicts, in seconds
+    """
+    self.max_connections = max_connections
+    self.max_per_host = max_per_host
+    self.retries = retries
+    self.backoff = backoff
+    self.timeout = timeout
+    self.deadline = deadline
+    self.ttl = ttl
+
+  async def check(self, session, url: str) -> Optional[str]:
+    """
+    Check whether a URL is reachable (HEAD request, falling back to GET)
+
+    :param session: aiohttp client session
+    :param url: URL to check
+    :return: rejection reason (None if reachable)
+    """
+    import asyncio
+    import aiohttp
+    reason = Validator.UNREACHABLE
+    for attempt in range(self.retries + 1):
+      if attempt > 0:
+        await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+      try:
+        async with session.head(url, allow_redirects=True) as response:
+          status = response.status
+        if status in Verifier.NO_HEAD_STATUS:
+          async with session.get(url, allow_redirects=True) as response:
+            status = response.status
+        if status < 400:
+          return None
+        reason = Validator.UNREACHABLE
+        if status not in Verifier.RETRY_STATUS:
+          return reason
+      except asyncio.TimeoutError:
+        reason = Validator.TIMEOUT
+      except aiohttp.ClientError:
+        reason = Validator.UNREACHABLE
+    return reason
+
+  async def verify_async(self, urls: Iterable[str]) -> Dict[str, Optional[str]]:
+    """
+    Verify a set of URLs online
+
+    :param urls: URLs to verify
+    :return: rejection reason of each URL (None if reachable)
+    """
+    import asyncio
+    import aiohttp
+    reasons = {}
+    pending_urls = []
+    with Verifier.cache_lock:
+      Verifier.prune(time.monotonic())
+      for url in set(urls):
+        if url in Verifier.cache:
+          reasons[url] = Verifier.cache[url][0]
+        else:
+          pending_urls.append(url)
+    if len(pending_urls) == 0:
+      return reasons
+
+    connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.max_per_host)
+    timeout = aiohttp.ClientTimeout(total=self.timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, trust_env=True) as session:
+      tasks = {asyncio.ensure_future(self.check(session, url)): url for url in pending_urls}
+      done, pending = await asyncio.wait(tasks, timeout=self.deadline)
+      # give up on URLs that did not complete before the deadline
+      for task in pending:
+        task.cancel()
+        reasons[tasks[task]] = Validator.TIMEOUT
+      expiry = time.monotonic() + self.ttl
+      for task in done:
+        url = tasks[task]
+        reasons[url] = Validator.ERROR if task.exception() is not None else task.result()
+      with Verifier.cache_lock:
+        for url in (tasks[task] for task in done):
+          if reasons[url] not in Validator.TRANSIENT:
+            # re-insert, so that the cache stays ordered from oldest to newest
+            Verifier.cache.pop(url, None)
+            Verifier.cache[url] = (reasons[url], expiry)
+        Verifier.prune(time.monotonic())
+      if len(pending) > 0:
+        await asyncio.wait(pending)
+    return reasons
+
+  @staticmethod
+  def prune(now: float):
+    """
+    Evict expired verdicts, and the oldest verdicts beyond the size bound of cache (with cache_lock held)
+
+    :param now: current time (time.monotonic)
+    """
+    for url in [url for url, (_, expiry) in Verifier.cache.items() if expiry <= now]:
+      del Verifier.cache[url]
+    for url in list(itertools.islice(Verifier.cache, max(len(Verifier.cache) - Verifier.MAX_CACHE_SIZE, 0))):
+      del Verifier.cache[url]
+
+  def verify(self, urls: Iterable[str]) -> Dict[str, Optional[str]]:
+    """
+    Verify a set of URLs online (from synchronous code)
+
+    :param urls: URLs to verify
+    :return: rejection reason of each URL (None if reachable)
+    """
+    import asyncio
+    try:
+      asyncio.get_running_loop()
+    except RuntimeError:
+      return asyncio.run(self.verify_async(urls))
+    # an event loop is already running on this thread, so verify on a separate thread
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(1) as executor:
+      return executor.submit(asyncio.run, self.verify_async(urls)).result()
+
+
+# ======================================================================================================================
+# DOCUMENT CONTEXT
+# ======================================================================================================================
+
+class ExtractionCache:
+  """
+  On-disk cache of stage outputs (e.g. full text, TEI-XML, annotated URLs), keyed by the content hash of the PDF,
+  the stage, the version of the library that computed it, and the format version of the stage. Entries are JSON
+  files, written atomically so that worker processes can share one cache directory. When the cache grows beyond its
+  size bound, the least recently used entries are evicted
+
+  """
+
+  # format version of each stage, to be bumped whenever the code that computes its output changes (stages not listed
+  # are at version 1)
+  STAGE_VERSIONS = {
+    'pypdf2:annot_urls': 1,
+    'pdfm:text': 1,
+    'grob:tei_xml': 1,
+    'pdfium:urls': 1,
+    'pdfium:annot_urls': 1,
+    'pdfium:text': 1,
+  }
+
+  def __init__(self, root: str, max_bytes: int = 2 ** 30):
+    """
+    :param root: path to cache directory
+    :param max_bytes: maximum size of cache, in bytes (default: 1 GiB)
+    """
+    self.root = root
+    self.max_bytes = max_bytes
+    # size of cache, as last seen by this process
+    self.size = None
+
+  def __getstate__(self):
+    return {'root': self.root, 'max_bytes': self.max_bytes}
+
+  def __setstate__(self, state):
+    self.__init__(**state)
+
+  @staticmethod
+  def get_version(dist: str) -> str:
+    """
+    Return the version tag of an installed library
+
+    :param dist: distribution name of library
+    :return: version tag (e.g. pdfminer.six==20201018)
+    """
+
+    def build():
+      from importlib.metadata import version, PackageNotFoundError
+      try:
+        return f"{dist}=={version(dist)}"
+      except PackageNotFoundError:
+        return f"{dist}==unknown"
+
+    return Registry.get(f'version:{dist}', [], build)
+
+  def get_path(self, digest: str, stage: str, version: str) -> str:
+    import hashlib
+    stage_version = ExtractionCache.STAGE_VERSIONS.get(stage, 1)
+    key = hashlib.sha256(f"{digest}\0{stage}\0{version}\0{stage_version}".encode('utf-8')).hexdigest()
+    return os.path.join(self.root, key[:2], f"{key}.json")
+
+  def get(self, digest: str, stage: str, version: str) -> Optional[dict]:
+    """
+    Return a cached stage output
+
+    :param digest: content hash of PDF
+    :param stage: name of stage
+    :param version: version tag of stage
+    :return: {'value': output of stage} if cached, else None
+    """
+    fp = self.get_path(digest, stage, version)
+    try:
+      with open(fp, 'r', encoding='utf-8') as f:
+        entry = json.load(f)
+      # mark as recently used
+      os.utime(fp)
+    except (OSError, ValueError):
+      return None
+    value = entry['value']
+    return {'value': set(value) if entry['type'] == 'set' else value}
+
+  def put(self, digest: str, stage: str, version: str, value: Any):
+    """
+    Store a stage output, evicting least recently used entries if the cache grows beyond its size bound
+
+    :param digest: content hash of PDF
+    :param stage: name of stage
+    :param version: version tag of stage
+    :param value: output of stage (str, set, or any other JSON-serializable value)
+    """
+    fp = self.get_path(digest, stage, version)
+    entry = {'stage': stage, 'version': version, 'stage_version': ExtractionCache.STAGE_VERSIONS.get(stage, 1)}
+    if isinstance(value, set):
+      entry.update({'type': 'set', 'value': list(value)})
+    else:
+      entry.update({'type': type(value).__name__, 'value': value})
+    os.makedirs(os.path.dirname(fp), exist_ok=True)
+    # size of the entry this one replaces (if any)
+    try:
+      old_size = os.path.getsize(fp)
+    except OSError:
+      old_size = 0
+    # write atomically, as other processes may read the cache concurrently
+    tmp_file = f"{fp}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+      json.dump(entry, f)
+    os.replace(tmp_file, fp)
+    if self.size is None:
+      self.size = sum(size for _, _, size in self.list_entries())
+    else:
+      self.size += os.path.getsize(fp) - old_size
+    if self.size > self.max_bytes:
+      self.evict()
+
+  def list_entries(self) -> List[tuple]:
+    """
+    List the entries of cache
+
+    :return: [mtime, path, size] of each entry
+    """
+    import glob
+    entries = []
+    for sub_dir in glob.glob(os.path.join(self.root, '??')):
+      for entry in os.scandir(sub_dir):
+        if entry.name.endswith('.json'):
+          try:
+            st = entry.stat()
+            entries.append((st.st_mtime_ns, entry.path, st.st_size))
+          except FileNotFoundError:
+            # evicted by another process
+            pass
+    return entries
+
+  def evict(self):
+    """
+    Evict least recently used entries until the cache fits its size bound, with some headroom so that the cache is
+    not scanned on every store
+
+    """
+    entries = sorted(self.list_entries())
+    self.size = sum(size for _, _, size in entries)
+    for _, fp, size in entries:
+      if self.size <= 0.9 * self.max_bytes:
+        break
+      with contextlib.suppress(FileNotFoundError):
+        os.remove(fp)
+      self.size -= size
+
+
+class Document:
+  """
+  PDF that is read from disk once, and whose parsed forms and stage outputs are shared between the annotation and
+  text stages of an extractor. If an extraction cache is set, versioned stage outputs are also reused across runs
+
+  """
+
+  # process-wide extraction cache (default: none)
+  cache: Optional[ExtractionCache] = None
+
+  def __init__(self, fp: str, data: Optional[bytes] = None):
+    """
+    :param fp: path to PDF (or, if data is given, its file name)
+    :param data: content of PDF (default: read from fp)
+    """
+    self.fp = fp
+    if data is None:
+      with open(fp, "rb") as file:
+        data = file.read()
+    self.data = data
+    self.digest = None
+    self.stages = {}
+    self.closers = []
+
+  @staticmethod
+  @contextlib.contextmanager
+  def use(fp: Union[str, 'Document']) -> Iterator['Document']:
+    """
+    Use a given document, or open one from a given path (and close it afterwards)
+
+    :param fp: Path to PDF, or Document
+    :return: context of Document
+    """
+    if isinstance(fp, Document):
+      yield fp
+    else:
+      doc = Document(fp)
+      try:
+        yield doc
+      finally:
+        doc.close()
+
+  def get(self, stage: str, fn: Callable[[], Any], version: Optional[str] = None) -> Any:
+    """
+    Return the output of a stage, computing it on first use only
+
+    :param stage: name of stage
+    :param fn: function that computes the output of stage
+    :param version: version tag of stage. If given, the output is also looked up in (and stored to) the extraction
+    cache. Stages whose output cannot be serialized (e.g. parsed documents) should not give one
+    :return: output of stage
+    """
+    if stage not in self.stages:
+      with Document.get_span(stage, bytes_in=len(self.data)) as span:
+        if version is None or Document.cache is None:
+          self.stages[stage] = fn()
+        else:
+          entry = Document.cache.get(self.get_digest(), stage, version)
+          span.set(cached=entry is not None)
+          if entry is None:
+            entry = {'value': fn()}
+            Document.cache.put(self.get_digest(), stage, version, entry['value'])
+          self.stages[stage] = entry['value']
+        if isinstance(self.stages[stage], (str, bytes)):
+          span.set(bytes_out=len(self.stages[stage]))
+    return self.stages[stage]
+
+  @staticmethod
+  def get_span(stage: str, **attrs) -> Union[Span, NullSpan]:
+    # stages of each page (e.g. pdfium:page:3) are traced as one stage (pdfium:page), with the page as an attribute
+    if not Tracer.sinks:
+      return Tracer.NULL_SPAN
+    name, _, page = stage.rpartition(':')
+    return Tracer.span(name, page=int(page), **attrs) if page.isdigit() else Tracer.span(stage, **attrs)
+
+  def has(self, stage: str, version: Optional[str] = None) -> bool:
+    """
+    Check if the output of a stage is available without computing it
+
+    :param stage: name of stage
+    :param version: version tag of stage (if given, the extraction cache is checked too)
+    :return: True if available, else False
+    """
+    if stage in self.stages:
+      return True
+    if version is None or Document.cache is None:
+      return False
+    return os.path.isfile(Document.cache.get_path(self.get_digest(), stage, version))
+
+  def get_digest(self) -> str:
+    # content hash of PDF, computed on first use only
+    if self.digest is None:
+      import hashlib
+      self.digest = hashlib.sha256(self.data).hexdigest()
+    return self.digest
+
+  def close(self):
+    for closer in reversed(self.closers):
+      closer()
+    self.closers.clear()
+    self.stages.clear()
+
+
+# ======================================================================================================================
+# PYPDF2 FUNCTIONS
+# ======================================================================================================================
 
 class PyPDF2:
   """
@@ -236,31 +1792,48 @@ class PyPDF2:
   """
 
   @staticmethod
-  def get_annot_urls(fp: str) -> Set[str]:
+  def get_annot_urls(fp: Union[str, Document], validator: Optional[Validator] = None) -> Set[str]:
     """
     Extract Annotated URLs from PDF
 
-    :param fp: Path to PDF
+    :param fp: Path to PDF, or Document
+    :param validator: URL validator to use (default: syntactic validation)
+    :return: Set of URLs of PDF
+    """
+    with Document.use(fp) as doc:
+      urls = doc.get('pypdf2:annot_urls', lambda: PyPDF2.read_annot_urls(doc), ExtractionCache.get_version('PyPDF2'))
+    return (validator or Validator()).get_valid_urls(urls)
+
+  @staticmethod
+  def get_page_count(doc: Document) -> Optional[int]:
+    # number of pages, if the PDF was parsed with PyPDF2
+    return doc.stages['pypdf2'].getNumPages() if 'pypdf2' in doc.stages else None
+
+  @staticmethod
+  def read_annot_urls(doc: Document) -> Set[str]:
+    """
+    Read (unvalidated) Annotated URLs from PDF
+
+    :param doc: Document
     :return: Set of URLs of PDF
     """
     from PyPDF2.pdf import PdfFileReader, PageObject
     urls = set()
-    with open(fp, "rb") as file:
-      pdf = PdfFileReader(file)
-      for page in pdf.pages:
-        page: PageObject = page.getObject()
-        if '/Annots' in page.keys():
-          for annot in page.get('/Annots'):
-            annot = annot.getObject()
-            if '/A' in annot.keys():
-              annot_a = annot['/A'].getObject()
-              if '/URI' in annot_a.keys():
-                urls.add(Util.canonicalize_url(annot_a['/URI']))
-            if '/S' in annot.keys():
-              annot_s = annot['/S'].getObject()
-              if '/URI' in annot_s.keys():
-                urls.add(Util.canonicalize_url(annot_s['/URI']))
-    return Util.get_valid_urls(urls)
+    pdf = doc.get('pypdf2', lambda: PdfFileReader(io.BytesIO(doc.data)))
+    for page in pdf.pages:
+      page: PageObject = page.getObject()
+      if '/Annots' in page.keys():
+        for annot in page.get('/Annots'):
+          annot = annot.getObject()
+          if '/A' in annot.keys():
+            annot_a = annot['/A'].getObject()
+            if '/URI' in annot_a.keys():
+              urls.add(Util.canonicalize_url(annot_a['/URI']))
+          if '/S' in annot.keys():
+            annot_s = annot['/S'].getObject()
+            if '/URI' in annot_s.keys():
+              urls.add(Util.canonicalize_url(annot_s['/URI']))
+    return urls
 
 
 # ======================================================================================================================
@@ -274,104 +1847,614 @@ class PDFMiner:
   """
 
   @staticmethod
-  def get_full_text(fp: str) -> str:
+  def get_version() -> str:
+    return ExtractionCache.get_version('pdfminer.six')
+
+  @staticmethod
+  def get_full_text(fp: Union[str, Document], workers: Optional[int] = None) -> str:
     """
     Extract Full Text from PDF
 
-    :param fp: Path to PDF
+    :param fp: Path to PDF, or Document
+    :param workers: number of processes to split the pages of PDF across (default: 1, i.e. the current process)
     :return: Full Text of PDF
     """
-    from pdfminer.high_level import extract_text
-    with open(fp, "rb") as file:
-      _content = extract_text(file)
-    return str(_content)
+    with Document.use(fp) as doc:
+      if (workers or 1) > 1:
+        return doc.get(
+          'pdfm:text', lambda: ''.join(text for text, _ in PDFMiner.read_page_ranges(doc, workers)),
+          PDFMiner.get_version()
+        )
+      return doc.get('pdfm:text', lambda: ''.join(PDFMiner.read_pages(doc)), PDFMiner.get_version())
+
+  @staticmethod
+  def harvest_urls(fp: Union[str, Document], regex: UrlRegex, validator: Optional[Validator] = None,
+                   workers: int = 2) -> Set[str]:
+    """
+    Extract full text URLs from PDF using a pool of processes, each reading a range of pages and finding the URLs
+    within it. URLs that span two ranges are stitched together, so the result is the same as reading all pages in
+    order. The full text is kept as the 'pdfm:text' stage
+
+    :param fp: Path to PDF, or Document
+    :param regex: configuration to use
+    :param validator: URL validator to use (default: syntactic validation)
+    :param workers: number of processes to split the pages of PDF across
+    :return: Set of URLs of PDF
+    """
+    with Document.use(fp) as doc:
+      ranges = PDFMiner.read_page_ranges(doc, workers, regex)
+      doc.get('pdfm:text', lambda: ''.join(text for text, _ in ranges), PDFMiner.get_version())
+    urls = Util.stitch_urls([scan for _, scan in ranges], regex)
+    return (validator or Validator()).get_valid_urls(urls)
+
+  @staticmethod
+  def iter_pages(fp: Union[str, Document]) -> Iterator[str]:
+    """
+    Extract Full Text from PDF, page by page. If the full text is cached (or an extraction cache is used), it is
+    given as one chunk instead
+
+    :param fp: Path to PDF, or Document
+    :return: iterator of Full Text of each page
+    """
+    with Document.use(fp) as doc:
+      if Document.cache is not None or doc.has('pdfm:text'):
+        yield PDFMiner.get_full_text(doc)
+      else:
+        yield from PDFMiner.read_pages(doc)
+
+  @staticmethod
+  def load_pages(fp: str) -> list:
+    """
+    Parse the pages of PDF, without reading them (once per process, for the last PDF given). This lets a pool
+    process read several ranges of a PDF
+
+    :param fp: Path to PDF
+    :return: list of PDFPage
+    """
+    from pdfminer.pdfpage import PDFPage
+
+    def _load():
+      with open(fp, 'rb') as f:
+        return list(PDFPage.get_pages(io.BytesIO(f.read()), caching=True))
+
+    return Registry.get('pdfm:pages', [fp], _load)
+
+  @staticmethod
+  def get_pool(workers: int):
+    """
+    Return the pool of page reading processes of the current process (created once per process)
+
+    :param workers: number of processes
+    :return: ProcessPoolExecutor
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing.util import Finalize
+
+    def _create():
+      pool = ProcessPoolExecutor(workers)
+      # shut down before the current process waits for its children to exit (e.g. if it is a batch worker itself),
+      # and before the queues of pool are closed (exitpriority=10)
+      Finalize(pool, pool.shutdown, exitpriority=20)
+      return pool
+
+    return Registry.get(f'pdfm:pool:{os.getpid()}:{workers}', [], _create)
+
+  @staticmethod
+  def read_page_ranges(doc: Document, workers: int, regex: Optional[UrlRegex] = None) -> List[tuple]:
+    """
+    Read Full Text from PDF using a pool of processes, by splitting its pages into consecutive ranges (several per
+    process, to balance pages of uneven cost)
+
+    :param doc: Document
+    :param workers: number of processes
+    :param regex: configuration to find the URLs of each range with (default: none)
+    :return: Full Text, and scan of URLs (see Util.scan_urls) of each range, in order
+    """
+    page_count = PDFMiner.count_pages(doc)
+    n = max(min(page_count, 4 * workers), 1)
+    # the last range reads up to the last page, in case the page count is short
+    bounds = [page_count * i // n for i in range(n)] + [None]
+    pool = PDFMiner.get_pool(workers)
+    # workers read the PDF from disk, instead of receiving it with each range
+    futures = [pool.submit(PDFMiner.read_page_range, doc.fp, start, stop, regex) for start, stop in
+               zip(bounds, bounds[1:])]
+    return [future.result() for future in futures]
+
+  @staticmethod
+  def count_pages(doc: Document) -> int:
+    """
+    Count the pages of PDF without parsing them, from the page count of its page tree (read with PyPDF2, whose
+    parsed form is shared with its annotation stage). If PyPDF2 cannot read the PDF, the pages are listed instead
+
+    :param doc: Document
+    :return: number of pages
+    """
+    from PyPDF2.pdf import PdfFileReader
+    try:
+      return doc.get('pypdf2', lambda: PdfFileReader(io.BytesIO(doc.data))).getNumPages()
+    except Exception:
+      from pdfminer.pdfpage import PDFPage
+      return sum(1 for _ in PDFPage.get_pages(io.BytesIO(doc.data)))
+
+  @staticmethod
+  def read_page_range(fp: str, start: int, stop: Optional[int], regex: Optional[UrlRegex] = None) -> tuple:
+    """
+    Read Full Text from a range of pages of PDF (in a pool process)
+
+    :param fp: Path to PDF
+    :param start: index of first page
+    :param stop: index after last page (None for up to the last page)
+    :param regex: configuration to find the URLs of range with (default: none)
+    :return: Full Text, and scan of URLs (None if no regex is given) of range
+    """
+    pages = list(PDFMiner.convert_pages(PDFMiner.load_pages(fp)[start:stop]))
+    return ''.join(pages), (Util.scan_urls(pages, regex) if regex is not None else None)
+
+  @staticmethod
+  def read_pages(doc: Document) -> Iterator[str]:
+    """
+    Read Full Text from PDF, page by page (as pdfminer.high_level.extract_text does for the whole PDF)
+
+    :param doc: Document
+    :return: iterator of Full Text of each page
+    """
+    from pdfminer.pdfpage import PDFPage
+    yield from PDFMiner.convert_pages(PDFPage.get_pages(io.BytesIO(doc.data), caching=True))
+
+  @staticmethod
+  def convert_pages(pages: Iterable[Any]) -> Iterator[str]:
+    """
+    Convert parsed pages of PDF to Full Text, page by page
+
+    :param pages: iterable of PDFPage
+    :return: iterator of Full Text of each page
+    """
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+    with io.StringIO() as output:
+      manager = PDFResourceManager(caching=True)
+      device = TextConverter(manager, output, codec='utf-8', laparams=LAParams())
+      interpreter = PDFPageInterpreter(manager, device)
+      for page in pages:
+        with Tracer.span('pdfm:page_text') as span:
+          interpreter.process_page(page)
+          page_text = output.getvalue()
+          span.set(bytes_out=len(page_text))
+        yield page_text
+        output.seek(0)
+        output.truncate()
 
 
 # ======================================================================================================================
 # GROBID FUNCTIONS
 # ======================================================================================================================
 
+class GROBIDClient:
+  """
+  Long-lived client of the GROBID service. Requests share keep-alive connections, at most max_in_flight requests are
+  pending at once (submitting more blocks the caller until one completes), and requests rejected because the
+  service is busy (503) are retried with exponential backoff
+
+  """
+
+  SERVICE = 'processFulltextDocument'
+  # form fields of each request
+  PARAMS = {
+    'generateIDs': '0',
+    'consolidateHeader': '0',
+    'consolidateCitations': '0',
+    'includeRawCitations': '0',
+    'includeRawAffiliations': '0',
+  }
+
+  def __init__(self, url: str = 'http://localhost:8070', max_in_flight: int = 4, retries: int = 8,
+               backoff: float = 0.5, max_backoff: float = 5.0, timeout: float = 300.0):
+    """
+    :param url: base URL of the GROBID service
+    :param max_in_flight: maximum number of pending requests
+    :param retries: number of retries of a request rejected with 503
+    :param backoff: initial delay between retries, in seconds (doubled on each retry)
+    :param max_backoff: maximum delay between retries, in seconds
+    :param timeout: time budget of a request, in seconds
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from concurrent.futures import ThreadPoolExecutor
+    self.url = url.rstrip('/')
+    self.max_in_flight = max_in_flight
+    self.retries = retries
+    self.backoff = backoff
+    self.max_backoff = max_backoff
+    self.timeout = timeout
+    self.session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight)
+    self.session.mount('http://', adapter)
+    self.session.mount('https://', adapter)
+    self.slots = threading.BoundedSemaphore(max_in_flight)
+    self.executor = ThreadPoolExecutor(max_in_flight, thread_name_prefix='grobid')
+
+  @staticmethod
+  def from_config(fp: str) -> 'GROBIDClient':
+    """
+    Create a client from a grobid_client config file
+
+    :param fp: path to config file
+    :return: GROBIDClient
+    """
+    with open(fp, 'r', encoding='utf-8') as f:
+      config = json.load(f)
+    server = config['grobid_server']
+    if '://' not in server:
+      server = f"http://{server}"
+    if config.get('grobid_port'):
+      server = f"{server}:{config['grobid_port']}"
+    return GROBIDClient(
+      url=server,
+      max_in_flight=int(config.get('concurrency', 4)),
+      max_backoff=float(config.get('sleep_time', 5)),
+      timeout=float(config.get('timeout', 300)),
+    )
+
+  def get_version(self) -> Optional[str]:
+    """
+    Return the version of the GROBID service
+
+    :return: version (e.g. 0.7.0), or None if the service is unavailable
+    """
+    import requests
+    try:
+      response = self.session.get(f"{self.url}/api/version", timeout=5)
+      response.raise_for_status()
+    except requests.RequestException:
+      return None
+    return response.text.strip()
+
+  def submit(self, data: bytes, name: str):
+    """
+    Submit a PDF for conversion to TEI-XML. Blocks while max_in_flight requests are pending
+
+    :param data: content of PDF
+    :param name: file name of PDF
+    :return: Future of TEI-XML
+    """
+    self.slots.acquire()
+    try:
+      future = self.executor.submit(self.process, data, name)
+    except Exception:
+      self.slots.release()
+      raise
+    future.add_done_callback(lambda _: self.slots.release())
+    return future
+
+  def process(self, data: bytes, name: str) -> str:
+    """
+    Convert a PDF to TEI-XML, retrying while the service is busy
+
+    :param data: content of PDF
+    :param name: file name of PDF
+    :return: TEI-XML of PDF
+    """
+    for attempt in range(self.retries + 1):
+      response = self.session.post(
+        f"{self.url}/api/{GROBIDClient.SERVICE}",
+        files={'input': (name, data, 'application/pdf')},
+        data=GROBIDClient.PARAMS,
+        timeout=self.timeout
+      )
+      if response.status_code != 503 or attempt == self.retries:
+        break
+      # wait as long as the service asks to, or back off exponentially
+      retry_after = response.headers.get('Retry-After', '')
+      delay = float(retry_after) if retry_after.isdigit() else self.backoff * 2 ** attempt
+      time.sleep(min(delay, self.max_backoff))
+    response.raise_for_status()
+    return response.text
+
+
 class GROBID:
   """
   GROBID utility functions for link extraction
 
   """
 
+  CONFIG_FILE = './grobid-service/config/config.json'
+
+  @staticmethod
+  def get_client() -> GROBIDClient:
+    """
+    Return the GROBID client of the current process (created once per process)
+
+    :return: GROBIDClient
+    """
+    return Registry.get(
+      f'grobid:client:{os.getpid()}', [GROBID.CONFIG_FILE], lambda: GROBIDClient.from_config(GROBID.CONFIG_FILE)
+    )
+
+  @staticmethod
+  def get_tei_xml(fp: Union[str, Document]) -> str:
+    """
+    Convert PDF to TEI-XML
+
+    :param fp: Path to PDF, or Document
+    :return: TEI-XML of PDF
+    """
+    with Document.use(fp) as doc:
+      return doc.get('grob:tei_xml', lambda: GROBID.submit(doc).result(), GROBID.get_version())
+
+  @staticmethod
+  def submit(doc: Document):
+    """
+    Start converting PDF to TEI-XML using the GROBID service (once per Document)
+
+    :param doc: Document
+    :return: Future of TEI-XML
+    """
+    return doc.get('grob:future', lambda: GROBID.get_client().submit(doc.data, os.path.basename(doc.fp)))
+
+  @staticmethod
+  def get_version() -> Optional[str]:
+    """
+    Return the version tag of the GROBID service, as its TEI-XML output depends on it
+
+    :return: version tag (e.g. grobid==0.7.0), or None if the service is unavailable
+    """
+
+    def build():
+      version = GROBID.get_client().get_version()
+      return f"grobid=={version}" if version is not None else None
+
+    version = Registry.get('version:grobid', [GROBID.CONFIG_FILE], build)
+    if version is None:
+      # the service may become available later, so ask it again next time
+      Registry.discard('version:grobid')
+    return version
+
+  @staticmethod
+  def get_annot_urls(tei: Union[str, 'TEIReader'], validator: Optional[Validator] = None) -> Set[str]:
+    """
+    Extract Annotated URLs from TEI-XML
+
+    :param tei: TEI-XML string, or TEIReader
+    :param validator: URL validator to use (default: syntactic validation)
+    :return: Set of URLs of TEI-XML
+    """
+    targets = TEIReader.use(tei, text=False).targets
+    urls = set({Util.canonicalize_url(target) for target in targets})
+    return (validator or Validator()).get_valid_urls(urls)
+
+  @staticmethod
+  def get_full_text(tei: Union[str, 'TEIReader']) -> str:
+    """
+    Extract Full Text from TEI-XML
+
+    :param tei: TEI-XML string, or TEIReader
+    :return: Full Text of TEI-XML
+    """
+    return "\n".join(TEIReader.use(tei).strings)
+
+
+class TEIReader:
+  """
+  Streaming reader of TEI-XML, used as the target of an lxml parser. Pointer targets and text nodes are collected in
+  one pass, without building a document tree. Text nodes are split and normalized as BeautifulSoup (lxml-xml) does
+
+  """
+
+  # number of characters fed to the parser at once
+  CHUNK_SIZE = 2 ** 16
+  # whitespace-only text nodes are collapsed into one character
+  ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+  def __init__(self, text: bool = True):
+    """
+    :param text: if True (default), collect text nodes. Else, collect pointer targets only
+    """
+    self.text = text
+    self.targets = []
+    self.strings = []
+    # data of the current text node
+    self.pending = []
+
+  @staticmethod
+  def read(tei_xml: str, text: bool = True) -> 'TEIReader':
+    """
+    Read TEI-XML
+
+    :param tei_xml: TEI-XML string
+    :param text: if True (default), collect text nodes. Else, collect pointer targets only
+    :return: TEIReader with pointer targets and text nodes of TEI-XML
+    """
+    from lxml import etree
+    with Tracer.span('tei', bytes_in=len(tei_xml)) as span:
+      parser = etree.XMLParser(target=TEIReader(text), encoding='utf-8', huge_tree=True)
+      for i in range(0, len(tei_xml), TEIReader.CHUNK_SIZE):
+        parser.feed(tei_xml[i:i + TEIReader.CHUNK_SIZE])
+      tei = parser.close()
+      span.set(urls_out=len(tei.targets))
+    return tei
+
+  @staticmethod
+  def use(tei: Union[str, 'TEIReader'], text: bool = True) -> 'TEIReader':
+    """
+    Use a given TEIReader, or read one from a given TEI-XML string
+
+    :param tei: TEI-XML string, or TEIReader
+    :param text: if True (default), collect text nodes when reading
+    :return: TEIReader
+    """
+    return tei if isinstance(tei, TEIReader) else TEIReader.read(tei, text)
+
+  def add(self, string: str):
+    if string.strip(TEIReader.ASCII_SPACES) == '':
+      string = '\n' if '\n' in string else ' '
+    self.strings.append(string)
+
+  def flush(self):
+    if self.pending:
+      self.add(''.join(self.pending))
+      self.pending.clear()
+
+  def start(self, tag: str, attrib: dict):
+    self.flush()
+    # match <ptr> of any namespace (tags are given as {namespace}name)
+    if tag.rpartition('}')[2] == 'ptr' and 'target' in attrib:
+      self.targets.append(attrib['target'])
+
+  def end(self, _tag: str):
+    self.flush()
+
+  def data(self, data: str):
+    if self.text:
+      self.pending.append(data)
+
+  def comment(self, text: str):
+    if self.text:
+      self.flush()
+      self.add(text)
+
+  def pi(self, target: str, data: str):
+    if self.text:
+      self.flush()
+      self.add(f"{target} {data}")
+
+  def close(self) -> 'TEIReader':
+    self.flush()
+    return self
+
+
+class PDFiumError(Exception):
+  """
+  Raised when PDFium cannot load a PDF
+
+  """
+
+
+class PDFIUM:
+  """
+PyPDFium utility functions for link extraction
+
+"""
+
+  # PDFium marks hyphens that end a line (and are not part of the text) with this character
+  LINE_HYPHEN = '\ufffe'
+
+  # reasons of FPDF_GetLastError (FPDF_ERR_*)
+  LOAD_ERRORS = {
+    1: 'unknown error',
+    2: 'file not found or could not be opened',
+    3: 'file not in PDF format or corrupted',
+    4: 'password required or incorrect password',
+    5: 'unsupported security scheme',
+    6: 'page not found or content error',
+  }
+
+  @staticmethod
+  def init():
+    """
+    Initialize PDFium (once per process)
+
+    """
+    import pypdfium as pdfium
+
+    def _init():
+      # this line is very important, otherwise it won't work
+      pdfium.FPDF_InitLibraryWithConfig(pdfium.FPDF_LIBRARY_CONFIG(2, None, None, 0))
+      return True
+
+    Registry.get('pdfium:init', [], _init)
+
   @staticmethod
-  def get_tei_xml(fp: str) -> str:
+  def load(doc: Document):
     """
-    Convert PDF to TEI-XML
+    Load PDF into PDFium (once per Document)
 
-    :param fp: Path to PDF
-    :return: TEI-XML of PDF
+    :param doc: Document
+    :return: PDFium document handle
     """
-    from grobid_client.grobid_client import GrobidClient
-    client = GrobidClient(config_path="./grobid-service/config/config.json")
-    [_pdf_file, _status, _content] = client.process_pdf(
-      service="processFulltextDocument",
-      pdf_file=fp,
-      generateIDs=False,
-      consolidate_header=False,
-      consolidate_citations=False,
-      include_raw_citations=False,
-      include_raw_affiliations=False,
-      teiCoordinates=False
-    )
-    return str(_content)
+    import pypdfium as pdfium
+
+    def _load():
+      PDFIUM.init()
+      handle = pdfium.FPDF_LoadMemDocument(doc.data, len(doc.data), None)
+      if not handle:
+        code = pdfium.FPDF_GetLastError()
+        raise PDFiumError(f"Could not load PDF: {PDFIUM.LOAD_ERRORS.get(code, 'unknown error')} (error {code})")
+      doc.closers.append(lambda: pdfium.FPDF_CloseDocument(handle))
+      return handle
+
+    return doc.get('pdfium', _load)
+
+  @staticmethod
+  def get_page_count(doc: Document) -> Optional[int]:
+    # number of pages, if the PDF was loaded into PDFium
+    import pypdfium as pdfium
+    return pdfium.FPDF_GetPageCount(doc.stages['pdfium']) if 'pdfium' in doc.stages else None
 
   @staticmethod
-  def get_annot_urls(tei_xml: str) -> Set[str]:
+  def load_page(doc: Document, i: int):
     """
-    Extract Annotated URLs from TEI-XML
+    Load a page of PDF into PDFium (once per Document, as loading parses the content of page). Pages stay loaded
+    until the Document is closed, so that the annotation and text stages share them
 
-    :param tei_xml: TEI-XML string
-    :return: Set of URLs of TEI-XML
+    :param doc: Document
+    :param i: page index
+    :return: PDFium page handle
     """
-    matches = bs4.BeautifulSoup(tei_xml, 'lxml-xml').find_all('ptr', {'target': True})
-    urls = set({Util.canonicalize_url(match['target']) for match in matches})
-    return Util.get_valid_urls(urls)
+    import pypdfium as pdfium
+
+    def _load():
+      page = pdfium.FPDF_LoadPage(PDFIUM.load(doc), i)
+      doc.closers.append(lambda: pdfium.FPDF_ClosePage(page))
+      return page
+
+    return doc.get(f'pdfium:page:{i}', _load)
 
   @staticmethod
-  def get_full_text(tei_xml: str) -> str:
+  def read_utf16(read: Callable[[Any, int], int]) -> str:
     """
-    Extract Full Text from TEI-XML
+    Read a UTF-16 string from a PDFium function that fills a buffer, using a buffer of the size it asks for
 
-    :param tei_xml: TEI-XML string
-    :return: Full Text of TEI-XML
+    :param read: function that takes (buffer, buffer length), and returns the length of string (including NUL)
+    :return: string
     """
-    lines = bs4.BeautifulSoup(tei_xml, 'lxml-xml').find_all(text=True)
-    return "\n".join(lines)
-
+    import ctypes
+    length = read(None, 0)
+    if length <= 1:
+      return ''
+    buffer = (ctypes.c_ushort * length)()
+    length = read(ctypes.cast(buffer, ctypes.POINTER(ctypes.c_ushort)), length)
+    return bytes(buffer)[:2 * (length - 1)].decode('utf-16-le', errors='replace')
 
-class PDFIUM:
-  """
-PyPDFium utility functions for link extraction
+  @staticmethod
+  def get_urls(fp: Union[str, Document], validator: Optional[Validator] = None) -> Set[str]:
+    """
+    Extract URLs that PDFium detects in the text of PDF
 
-"""
+    :param fp: Path to PDF, or Document
+    :param validator: URL validator to use (default: syntactic validation)
+    :return: Set of URLs of PDF
+    """
+    with Document.use(fp) as doc:
+      urls = doc.get('pdfium:urls', lambda: PDFIUM.read_urls(doc), ExtractionCache.get_version('pypdfium'))
+    return (validator or Validator()).get_valid_urls(urls)
 
   @staticmethod
-  def get_urls(fp: str) -> Set[str]:
+  def read_urls(doc: Document) -> Set[str]:
     """
-    Extract Annotated URLs from PDF
+    Read (unvalidated) URLs that PDFium detects in the text of PDF
 
-    :param fp: Path to PDF
+    :param doc: Document
     :return: Set of URLs of PDF
     """
     import pypdfium as pdfium
-    import ctypes
 
     urls = set()
-    buf_len = 2048
-    buffer = (ctypes.c_ushort * buf_len)()
-    buffer_ = ctypes.cast(buffer, ctypes.POINTER(ctypes.c_ushort))
-    # this line is very important, otherwise it won't work
-    pdfium.FPDF_InitLibraryWithConfig(pdfium.FPDF_LIBRARY_CONFIG(2, None, None, 0))
-
-    doc = pdfium.FPDF_LoadDocument(fp, None)
-    page_count = pdfium.FPDF_GetPageCount(doc)
+    handle = PDFIUM.load(doc)
+    page_count = pdfium.FPDF_GetPageCount(handle)
     for i in range(page_count):
       # load PDF page
-      page = pdfium.FPDF_LoadPage(doc, i)
+      page = PDFIUM.load_page(doc, i)
       # load text in PDF page
       text = pdfium.FPDFText_LoadPage(page)
       # Load links in PDF text
@@ -379,18 +2462,109 @@ PyPDFium utility functions for link extraction
       link_count = pdfium.FPDFLink_CountWebLinks(links)
       # get each URL
       for j in range(link_count):
-        url_length = pdfium.FPDFLink_GetURL(links, j, buffer_, buf_len)
-        url_nums = buffer[:url_length - 1]
-        url = ''.join(map(chr, url_nums))
+        url = PDFIUM.read_utf16(lambda buffer, length: pdfium.FPDFLink_GetURL(links, j, buffer, length))
         # ignore other protocols and mailto: links
         if url.startswith('http'):
           url = Util.canonicalize_url(url)
           urls.add(url)
       pdfium.FPDFLink_CloseWebLinks(links)
       pdfium.FPDFText_ClosePage(text)
-      pdfium.FPDF_ClosePage(page)
-    pdfium.FPDF_CloseDocument(doc)
-    return Util.get_valid_urls(urls)
+    return urls
+
+  @staticmethod
+  def get_annot_urls(fp: Union[str, Document], validator: Optional[Validator] = None) -> Set[str]:
+    """
+    Extract Annotated URLs from PDF
+
+    :param fp: Path to PDF, or Document
+    :param validator: URL validator to use (default: syntactic validation)
+    :return: Set of URLs of PDF
+    """
+    with Document.use(fp) as doc:
+      urls = doc.get('pdfium:annot_urls', lambda: PDFIUM.read_annot_urls(doc), ExtractionCache.get_version('pypdfium'))
+    return (validator or Validator()).get_valid_urls(urls)
+
+  @staticmethod
+  def read_annot_urls(doc: Document) -> Set[str]:
+    """
+    Read (unvalidated) Annotated URLs from PDF, i.e. the URI actions of link annotations
+
+    :param doc: Document
+    :return: Set of URLs of PDF
+    """
+    import pypdfium as pdfium
+    import ctypes
+
+    urls = set()
+    handle = PDFIUM.load(doc)
+    for i in range(pdfium.FPDF_GetPageCount(handle)):
+      page = PDFIUM.load_page(doc, i)
+      pos = ctypes.c_int(0)
+      link = pdfium.FPDF_LINK()
+      while pdfium.FPDFLink_Enumerate(page, ctypes.byref(pos), ctypes.byref(link)):
+        action = pdfium.FPDFLink_GetAction(link)
+        if not action or pdfium.FPDFAction_GetType(action) != pdfium.PDFACTION_URI:
+          continue
+        # URIs are byte strings (7-bit ASCII by the PDF spec), of the length (including NUL) PDFium asks for
+        length = pdfium.FPDFAction_GetURIPath(handle, action, None, 0)
+        buffer = ctypes.create_string_buffer(length)
+        pdfium.FPDFAction_GetURIPath(handle, action, buffer, length)
+        urls.add(Util.canonicalize_url(buffer.raw[:length - 1].decode('latin-1')))
+    return urls
+
+  @staticmethod
+  def get_full_text(fp: Union[str, Document]) -> str:
+    """
+    Extract Full Text from PDF
+
+    :param fp: Path to PDF, or Document
+    :return: Full Text of PDF
+    """
+    with Document.use(fp) as doc:
+      return doc.get(
+        'pdfium:text', lambda: ''.join(PDFIUM.read_pages(doc)), ExtractionCache.get_version('pypdfium')
+      )
+
+  @staticmethod
+  def iter_pages(fp: Union[str, Document]) -> Iterator[str]:
+    """
+    Extract Full Text from PDF, page by page. If the full text is cached (or an extraction cache is used), it is
+    given as one chunk instead
+
+    :param fp: Path to PDF, or Document
+    :return: iterator of Full Text of each page
+    """
+    with Document.use(fp) as doc:
+      if Document.cache is not None or doc.has('pdfium:text'):
+        yield PDFIUM.get_full_text(doc)
+      else:
+        yield from PDFIUM.read_pages(doc)
+
+  @staticmethod
+  def read_pages(doc: Document) -> Iterator[str]:
+    """
+    Read Full Text from PDF, page by page. As with PDFMiner, each page ends with a line break and a form feed
+
+    :param doc: Document
+    :return: iterator of Full Text of each page
+    """
+    import pypdfium as pdfium
+
+    handle = PDFIUM.load(doc)
+    for i in range(pdfium.FPDF_GetPageCount(handle)):
+      with Tracer.span('pdfium:page_text') as span:
+        text = pdfium.FPDFText_LoadPage(PDFIUM.load_page(doc, i))
+        try:
+          char_count = pdfium.FPDFText_CountChars(text)
+          # a character may take two UTF-16 units, so ask for twice as many (the result is cut at the NUL)
+          page_text = PDFIUM.read_utf16(
+            lambda buffer, length:
+            pdfium.FPDFText_GetText(text, 0, char_count, buffer) if buffer else 2 * char_count + 1
+          )
+        finally:
+          pdfium.FPDFText_ClosePage(text)
+        span.set(bytes_out=len(page_text))
+      yield f"{page_text.replace(PDFIUM.LINE_HYPHEN, '-')}\n\f"
 
 
 # ======================================================================================================================
@@ -404,23 +2578,48 @@ class Extractor:
 
   """
 
-  def get_text(self, fp: str) -> str:
+  # number of documents to prefetch ahead of the one being processed (see prefetch)
+  prefetch_depth = 0
+
+  def get_text(self, fp: Union[str, Document], **kwargs) -> str:
+    raise NotImplementedError('Base Class!')
+
+  def iter_text(self, fp: Union[str, Document]) -> Iterator[str]:
     raise NotImplementedError('Base Class!')
 
+  def prefetch(self, doc: Document):
+    """
+    Start slow, non-blocking stages of a document ahead of processing it (by default, nothing)
+
+    :param doc: Document
+    """
+    pass
+
   @staticmethod
-  def get_annot_urls(fp: str) -> List[str]:
-    return sorted(PyPDF2.get_annot_urls(fp))
+  def get_annot_urls(fp: Union[str, Document], **kwargs) -> List[str]:
+    return sorted(get_annotator(kwargs.get('annotator')).get_annot_urls(fp, kwargs.get('validator')))
 
-  def get_text_urls(self, fp: str, **kwargs) -> List[str]:
+  def get_text_urls(self, fp: Union[str, Document], **kwargs) -> List[str]:
     raise NotImplementedError('Base Class!')
 
-  def get_all_urls(self, fp: str, **kwargs) -> List[str]:
-    # extract annotated URLs (baseline, always valid)
-    annot_urls = set(self.get_annot_urls(fp))
-    # extract full text URLs (error-prone)
-    full_text_urls = set(self.get_text_urls(fp, **kwargs))
-    # pick unique URLs from full_text_urls
-    full_text_urls = Util.pick_uniq_urls(full_text_urls)
+  def stream_text_urls(self, fp: Union[str, Document], **kwargs) -> Iterator[Set[str]]:
+    """
+    Extract full text URLs page by page, yielding valid URLs as they are found (before picking unique URLs)
+
+    :param fp: Path to PDF, or Document
+    :param kwargs: extractor arguments (regex, and optionally validator)
+    :return: iterator of sets of new URLs
+    """
+    regex: UrlRegex = kwargs['regex']
+    yield from Util.stream_urls(self.iter_text(fp), regex, kwargs.get('validator'))
+
+  def get_all_urls(self, fp: Union[str, Document], **kwargs) -> List[str]:
+    # read PDF once, and share it between annotation and full text stages
+    with Document.use(fp) as doc:
+      # extract annotated URLs (baseline, always valid)
+      annot_urls = set(self.get_annot_urls(doc, **kwargs))
+      # extract full text URLs (error-prone, but already unique)
+      full_text_urls = set(self.get_text_urls(doc, **kwargs))
     # pick URLs from full_text_urls do not match (exact/partial) any URL in annot_urls
     full_text_urls = Util.pick_new_urls(full_text_urls, annot_urls)
     # concatenate, sort, and return
@@ -433,15 +2632,21 @@ class PDFMExtractor(Extractor):
 
   """
 
-  def get_text(self, fp: str) -> str:
-    return PDFMiner.get_full_text(fp)
+  def get_text(self, fp: Union[str, Document], **kwargs) -> str:
+    return PDFMiner.get_full_text(fp, kwargs.get('page_workers'))
 
-  def get_text_urls(self, fp: str, **kwargs) -> List[str]:
-    regex: UrlRegex = kwargs['regex']
-    # extract full text from PDF
-    full_text = self.get_text(fp)
-    # extract full text URLs
-    full_text_urls = Util.harvest_urls(full_text, regex)
+  def iter_text(self, fp: Union[str, Document]) -> Iterator[str]:
+    return PDFMiner.iter_pages(fp)
+
+  def get_text_urls(self, fp: Union[str, Document], **kwargs) -> List[str]:
+    workers = kwargs.get('page_workers') or 1
+    with Document.use(fp) as doc:
+      if workers > 1 and not doc.has('pdfm:text', PDFMiner.get_version()):
+        # extract full text URLs, page range by page range, in parallel
+        full_text_urls = PDFMiner.harvest_urls(doc, kwargs['regex'], kwargs.get('validator'), workers)
+      else:
+        # extract full text URLs, page by page
+        full_text_urls = set().union(*self.stream_text_urls(doc, **kwargs))
     # pick unique URLs from full_text_urls
     full_text_urls = Util.pick_uniq_urls(full_text_urls)
     # sort and return
@@ -454,21 +2659,31 @@ class GROBExtractor(Extractor):
 
   """
 
-  def get_text(self, fp: str) -> str:
+  def __init__(self):
+    # keep the GROBID service busy with the next documents while processing one
+    self.prefetch_depth = GROBID.get_client().max_in_flight
+
+  def prefetch(self, doc: Document):
+    if not doc.has('grob:tei_xml', GROBID.get_version()):
+      GROBID.submit(doc)
+
+  def get_text(self, fp: Union[str, Document], **kwargs) -> str:
     return GROBID.get_tei_xml(fp)
 
-  def get_text_urls(self, fp: str, **kwargs) -> List[str]:
+  def get_text_urls(self, fp: Union[str, Document], **kwargs) -> List[str]:
     regex: UrlRegex = kwargs['regex']
     # convert PDF to TEI-XML
     tei_xml = self.get_text(fp)
+    # read pointer targets and full text of TEI-XML, in one pass
+    tei = TEIReader.read(tei_xml)
     # extract annotated URLs from TEI-XML (assumed valid)
-    tei_urls = GROBID.get_annot_urls(tei_xml)
+    tei_urls = GROBID.get_annot_urls(tei, kwargs.get('validator'))
     # pick unique URLs from tei_urls
     tei_urls = Util.pick_uniq_urls(tei_urls)
     # extract full text from TEI-XML
-    full_text = GROBID.get_full_text(tei_xml)
+    full_text = GROBID.get_full_text(tei)
     # extract full text URLs
-    full_text_urls = Util.harvest_urls(full_text, regex)
+    full_text_urls = Util.harvest_urls(full_text, regex, kwargs.get('validator'))
     # pick unique URLs from full_text_urls
     full_text_urls = Util.pick_uniq_urls(full_text_urls)
     # pick URLs from full_text_urls that do not match (exact/partial) any URL in tei_urls
@@ -483,22 +2698,929 @@ class PDFIUMExtractor(Extractor):
 
   """
 
-  def get_text(self, fp: str) -> str:
-    # TODO this is a fake full text extraction, as it only returns URLs for now
-    return "\n".join(sorted(PDFIUM.get_urls(fp)))
+  def get_text(self, fp: Union[str, Document], **kwargs) -> str:
+    return PDFIUM.get_full_text(fp)
 
-  def get_text_urls(self, fp: str, **kwargs) -> List[str]:
-    # extract full text from PDF
-    # TODO this is a fake implementation, as it returns newline-concatenated URLs as full text
-    full_text = self.get_text(fp)
-    # extract full text URLs.
-    full_text_urls = set(full_text.split("\n"))
+  def iter_text(self, fp: Union[str, Document]) -> Iterator[str]:
+    return PDFIUM.iter_pages(fp)
+
+  def get_text_urls(self, fp: Union[str, Document], **kwargs) -> List[str]:
+    if kwargs.get('regex') is not None:
+      # extract full text URLs, page by page
+      full_text_urls = set().union(*self.stream_text_urls(fp, **kwargs))
+    else:
+      # without a regex option, use the URLs that PDFium detects in the full text
+      full_text_urls = PDFIUM.get_urls(fp, kwargs.get('validator'))
     # pick unique URLs from full_text_urls
     full_text_urls = Util.pick_uniq_urls(full_text_urls)
     # sort and return
     return sorted(full_text_urls)
 
 
+class EnsembleExtractor(Extractor):
+  """
+  URL extractor that runs several extractors concurrently on one document, and merges their URLs. Extractors that
+  read pages in the current process (PDFM, PDFIUM) run in threads, and GROB runs on the GROBID service. When the
+  deadline of a document expires, the URLs of the extractors that completed (and of the pages that the others read so
+  far) are returned. Slower extractors are cancelled: threads stop before their next page (and are waited for, as
+  the document is closed afterwards), and requests to GROBID are cancelled if not sent yet, or else dropped. The last
+  extractor is never cancelled, so a document takes about the longer of the deadline and the last extractor alone
+
+  """
+
+  # extractors to run, in order of precedence (URLs of an extractor are kept if they do not match those of the ones
+  # before it)
+  BACKENDS = ['GROB', 'PDFM', 'PDFIUM']
+  # time budget of a document, in seconds
+  DEADLINE = 10.0
+
+  def __init__(self):
+    from concurrent.futures import ThreadPoolExecutor
+    self.extractors = {}
+    self.executor = ThreadPoolExecutor(len(EnsembleExtractor.BACKENDS), thread_name_prefix='ensemble')
+
+  def get_extractor(self, name: str) -> Extractor:
+    # extractor of a given name (created once per ensemble)
+    if name not in self.extractors:
+      self.extractors[name] = get_extractor(name)
+    return self.extractors[name]
+
+  def get_text(self, fp: Union[str, Document], **kwargs) -> str:
+    with Document.use(fp) as doc:
+      results = self.race(doc, 'text', **kwargs)
+    # full text of the first extractor that completed, or else the longest partial full text
+    complete = [text for text, is_complete in results.values() if is_complete]
+    return complete[0] if complete else max((text for text, _ in results.values()), key=len)
+
+  def get_text_urls(self, fp: Union[str, Document], **kwargs) -> List[str]:
+    with Document.use(fp) as doc:
+      results = self.race(doc, 'urls', **kwargs)
+    # merge URLs of the extractors that completed, and then the partial URLs of the others, in order of precedence
+    ordered = [urls for urls, is_complete in results.values() if is_complete]
+    ordered += [urls for urls, is_complete in results.values() if not is_complete]
+    full_text_urls = set()
+    for urls in ordered:
+      # pick unique URLs from urls, that do not match (exact/partial) any URL merged so far
+      full_text_urls.update(Util.pick_new_urls(Util.pick_uniq_urls(set(urls)), full_text_urls))
+    # sort and return
+    return sorted(full_text_urls)
+
+  def race(self, doc: Document, mode: str, **kwargs) -> Dict[str, Tuple[Any, bool]]:
+    """
+    Run the extractors on a document concurrently, until all of them complete or the deadline expires. The last
+    extractor (the cheapest) is not cancelled, so that the result is never worse than its own
+
+    :param doc: Document
+    :param mode: output of each extractor (text, or urls)
+    :param kwargs: extractor arguments (regex, and optionally validator, ensemble and ensemble_deadline)
+    :return: output of each extractor that completed or read part of the document, and whether it completed (in
+      order of precedence)
+    """
+    from concurrent.futures import wait, FIRST_COMPLETED
+    names = kwargs.get('ensemble') or EnsembleExtractor.BACKENDS
+    deadline = kwargs.get('ensemble_deadline')
+    deadline = EnsembleExtractor.DEADLINE if deadline is None else deadline
+    events = {name: threading.Event() for name in names}
+    results, errors = {}, {}
+    with Tracer.span('ensemble', extractors=list(names)) as span:
+      time_end = time.monotonic() + deadline
+      futures = {self.start(name, doc, mode, events[name], **kwargs): name for name in names}
+      pending = set(futures)
+      try:
+        while pending:
+          expired = time.monotonic() >= time_end
+          if expired:
+            # cancel the slower extractors (threads stop before their next page, and requests to GROBID are dropped)
+            for future in pending:
+              if futures[future] != names[-1]:
+                events[futures[future]].set()
+                future.cancel()
+            pending = set(future for future in pending if futures[future] != 'GROB' or futures[future] == names[-1])
+          timeout = None if expired else time_end - time.monotonic()
+          done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+          for future in done:
+            if future.cancelled():
+              continue
+            if futures[future] == 'GROB' != names[-1] and time.monotonic() >= time_end:
+              # TEI-XML arrived after the deadline, so it is dropped instead of read
+              continue
+            try:
+              results[futures[future]] = self.finish(futures[future], future, doc, mode, **kwargs)
+            except Exception as ex:
+              errors[futures[future]] = ex
+      finally:
+        # on error, cancel every extractor, and wait for the threads to stop (the document is closed afterwards)
+        for event in events.values():
+          event.set()
+        for future in pending:
+          future.cancel()
+        wait([future for future in pending if futures[future] != 'GROB'])
+      span.set(completed=[name for name in names if name in results and results[name][1]],
+               partial=[name for name in names if name in results and not results[name][1]],
+               failed=sorted(errors))
+    if not results:
+      if errors:
+        raise next(iter(errors.values()))
+      raise TimeoutError(f'No extractor read the document within {deadline} seconds')
+    return {name: results[name] for name in names if name in results}
+
+  def start(self, name: str, doc: Document, mode: str, cancelled: threading.Event, **kwargs):
+    """
+    Start an extractor on a document
+
+    :param name: name of extractor
+    :param doc: Document
+    :param mode: output of extractor (text, or urls)
+    :param cancelled: event set once the extractor should stop
+    :param kwargs: extractor arguments (regex, and optionally validator)
+    :return: Future (of TEI-XML for GROB, or of the output and whether it completed for the others)
+    """
+    if name == 'GROB':
+      if doc.has('grob:tei_xml', GROBID.get_version()):
+        # TEI-XML is already available, so there is no request to wait for
+        from concurrent.futures import Future
+        future = Future()
+        future.set_result(None)
+        return future
+      return GROBID.submit(doc)
+    return self.executor.submit(self.read, self.get_extractor(name), doc, mode, cancelled, **kwargs)
+
+  def finish(self, name: str, future, doc: Document, mode: str, **kwargs) -> Tuple[Any, bool]:
+    # output of a completed extractor, and whether it completed
+    if name == 'GROB':
+      future.result()
+      e = self.get_extractor(name)
+      # full text of TEI-XML (as the other extractors give plain text), or its URLs
+      return (GROBID.get_full_text(e.get_text(doc)), True) if mode == 'text' else (e.get_text_urls(doc, **kwargs), True)
+    return future.result()
+
+  @staticmethod
+  def read(e: Extractor, doc: Document, mode: str, cancelled: threading.Event, **kwargs) -> Tuple[Any, bool]:
+    """
+    Read the pages of a document with an extractor, until it is cancelled
+
+    :param e: extractor (that reads pages in the current process)
+    :param doc: Document
+    :param mode: output of extractor (text, or urls)
+    :param cancelled: event set once the extractor should stop
+    :param kwargs: extractor arguments (regex, and optionally validator)
+    :return: full text or full text URLs of the pages read, and whether every page was read
+    """
+    pages = e.iter_text(doc)
+    state = {'complete': False}
+
+    def until_cancelled() -> Iterator[str]:
+      for page in pages:
+        if cancelled.is_set():
+          return
+        yield page
+      state['complete'] = True
+
+    try:
+      if mode == 'text':
+        output = ''.join(until_cancelled())
+      else:
+        output = set().union(*Util.stream_urls(until_cancelled(), kwargs['regex'], kwargs.get('validator')))
+    finally:
+      pages.close()
+    return output, state['complete']
+
+
+# ======================================================================================================================
+# COMMANDS
+# ======================================================================================================================
+
+COMMANDS = ['U_ANN', 'TXT', 'U_TXT', 'U_ALL']
+EXTRACTORS = {
+  'PDFM': PDFMExtractor, 'PDFIUM': PDFIUMExtractor, 'GROB': GROBExtractor, 'ENSEMBLE': EnsembleExtractor,
+}
+ANNOTATORS = {'PYPDF2': PyPDF2, 'PDFIUM': PDFIUM}
+# modules imported by each extractor (and annotator). They are imported on first use, so that each command only loads
+# the libraries it needs
+MODULES = {
+  'PDFM': ['pdfminer.pdfpage', 'pdfminer.converter', 'pdfminer.layout', 'pdfminer.pdfinterp'],
+  'PDFIUM': ['pypdfium'],
+  'GROB': ['requests', 'lxml.etree'],
+  'PYPDF2': ['PyPDF2.pdf'],
+}
+MODULES['ENSEMBLE'] = [module for name in EnsembleExtractor.BACKENDS for module in MODULES[name]]
+
+
+def get_extractor(name: Optional[str]) -> Extractor:
+  """
+  Create the extractor of a given name
+
+  :param name: name of extractor (PDFM, PDFIUM, GROB, or ENSEMBLE)
+  :return: extractor instance
+  """
+  if name not in EXTRACTORS:
+    raise NotImplementedError('Extractor Does Not Exist!')
+  return EXTRACTORS[name]()
+
+
+def get_annotator(name: Optional[str]):
+  """
+  Return the annotated URL backend of a given name
+
+  :param name: name of backend (PYPDF2 or PDFIUM). If None, PYPDF2
+  :return: backend (a class with get_annot_urls)
+  """
+  name = name or 'PYPDF2'
+  if name not in ANNOTATORS:
+    raise NotImplementedError('Annotator Does Not Exist!')
+  return ANNOTATORS[name]
+
+
+def get_modules(cmd: str, extractor: Optional[str] = None, annotator: Optional[str] = None,
+                online: bool = False) -> List[str]:
+  """
+  Return the modules that a command imports
+
+  :param cmd: command to run
+  :param extractor: name of extractor (not needed for U_ANN)
+  :param annotator: name of annotated URL backend (used by U_ANN and U_ALL). If None, PYPDF2
+  :param online: whether URLs are verified online
+  :return: names of modules
+  """
+  modules = ['validators']
+  if cmd in ['U_ANN', 'U_ALL']:
+    modules += MODULES[annotator or 'PYPDF2']
+  if cmd != 'U_ANN':
+    # full text is transliterated once it has non-ASCII characters
+    modules += MODULES.get(extractor, []) + ['unidecode']
+  if online:
+    modules += ['asyncio', 'aiohttp']
+  return list(dict.fromkeys(modules))
+
+
+def profile_imports(modules: Iterable[str]) -> List[Tuple[str, float]]:
+  """
+  Import modules one by one, and measure the time each takes. Modules that are already imported (e.g. as a dependency
+  of an earlier one) take no time
+
+  :param modules: names of modules
+  :return: (module, duration in seconds) of each module
+  """
+  import importlib
+  durations = []
+  for module in modules:
+    time_start = time.perf_counter()
+    importlib.import_module(module)
+    durations.append((module, time.perf_counter() - time_start))
+  return durations
+
+
+def profile_regexes(option: Optional[int] = None) -> List[Tuple[str, float]]:
+  """
+  Build the regexes of a command (once per process), and measure the time each set takes. Every command builds the
+  regexes of URL validation, and commands with a regex option build those of the option
+
+  :param option: regex option (if any)
+  :return: (regexes, duration in seconds) of each set of regexes
+  """
+  builds = [
+    ('regex:validator', lambda: (Validator.get_syntax_regex(), UrlRegex.get_blacklist_terms_regex())),
+  ]
+  if option is not None:
+    builds.append((f'regex:{option}', lambda: UrlRegex(option)))
+  durations = []
+  for name, build in builds:
+    time_start = time.perf_counter()
+    build()
+    durations.append((name, time.perf_counter() - time_start))
+  return durations
+
+
+def run_command(cmd: str, fp: Union[str, Document], e: Optional[Extractor] = None, **kwargs) -> str:
+  """
+  Run a command on a PDF and return its output
+
+  :param cmd: command to run (U_ANN, TXT, U_TXT, or U_ALL)
+  :param fp: path to PDF, or Document
+  :param e: extractor to use (not needed for U_ANN)
+  :param kwargs: extractor arguments (e.g. regex, validator, annotator, page_workers)
+  :return: output of command
+  """
+  if cmd != 'U_ANN' and e is None:
+    raise NotImplementedError('Extractor Does Not Exist!')
+  if cmd not in COMMANDS:
+    raise NotImplementedError('Command Does Not Exist!')
+  # spans of stages are attributed to the document and command
+  Tracer.context = {'document': os.path.basename(fp.fp if isinstance(fp, Document) else fp), 'command': cmd}
+  with Tracer.span('command', extractor=type(e).__name__ if e else kwargs.get('annotator')) as span:
+    if cmd == 'U_ANN':
+      result = "\n".join(Extractor.get_annot_urls(fp, **kwargs))
+    elif cmd == 'TXT':
+      result = e.get_text(fp, **kwargs)
+    elif cmd == 'U_TXT':
+      result = "\n".join(e.get_text_urls(fp, **kwargs))
+    else:
+      result = "\n".join(e.get_all_urls(fp, **kwargs))
+    span.set(bytes_out=len(result))
+  return result
+
+
+# ======================================================================================================================
+# BATCH EXECUTION
+# ======================================================================================================================
+
+class BatchResult(NamedTuple):
+  """
+  Result of running a command on one PDF of a batch
+
+  """
+  fp: str
+  result: Optional[str]
+  duration: float
+  error: Optional[str]
+  # stage aggregates of the worker process (see Tracer.collect)
+  metrics: Optional[List[dict]] = None
+  # peak resident memory of the worker process while running the command, in bytes
+  peak_memory: Optional[int] = None
+  # whether the worker process went over its memory ceiling (and should be replaced)
+  over_memory: bool = False
+  # whether the command ran with the fallback backends
+  fallback: bool = False
+  # number of pages of PDF (None if no parser that ran knows it), and size of PDF in bytes
+  pages: Optional[int] = None
+  size: Optional[int] = None
+
+  def get_record(self, **info) -> dict:
+    """
+    Return the timing record of the result (as written by --timing)
+
+    :param info: attributes of the run (e.g. command, extractor, regex)
+    :return: timing record
+    """
+    stages = {stage: entry['seconds'] for stage, entry in (self.metrics or [{}])[0].items()}
+    return {
+      **info, 'document': os.path.basename(self.fp), 'duration': self.duration, 'stages': stages,
+      'pages': self.pages, 'bytes': self.size, 'peak_memory': self.peak_memory, 'fallback': self.fallback,
+      'error': self.error,
+    }
+
+
+class Batch:
+  """
+  Process-pool scheduler to run a command over many PDFs. Each worker process builds its extractor and regex
+  once, and results are yielded as documents complete
+
+  """
+
+  # warm state of the current worker process (set by init_worker)
+  state = {}
+
+  @staticmethod
+  def list_inputs(spec: str) -> List[str]:
+    """
+    Resolve a directory, glob pattern, or manifest file into a list of PDFs
+
+    :param spec: directory of PDFs, glob pattern, or manifest file (one path per line)
+    :return: list of paths to PDFs
+    """
+    import glob
+    if os.path.isdir(spec):
+      return sorted(glob.glob(os.path.join(spec, '*.pdf')))
+    elif os.path.isfile(spec):
+      if spec.lower().endswith('.pdf'):
+        return [spec]
+      with open(spec, 'r', encoding='utf-8') as f:
+        lines = map(str.strip, f.readlines())
+        return [line for line in lines if line and not line.startswith('#')]
+    else:
+      return sorted(glob.glob(spec, recursive=True))
+
+  @staticmethod
+  def get_output_name(fp: str, cmd: str, extractor: Optional[str] = None, regex: Optional[int] = None) -> str:
+    """
+    Return the output file name of a command (same naming as the Makefile targets)
+
+    :param fp: path to PDF
+    :param cmd: command to run
+    :param extractor: name of extractor
+    :param regex: regex option
+    :return: output file name
+    """
+    parts = [os.path.basename(fp)]
+    if cmd == 'U_ANN':
+      parts.append(cmd)
+    elif cmd == 'TXT':
+      parts.append(extractor)
+    else:
+      parts.append(extractor)
+      if regex is not None:
+        parts.append(f"R{regex}")
+      parts.append(cmd)
+    return f"{'-'.join(parts)}.txt"
+
+  @staticmethod
+  def init_worker(cmd: str, extractor: Optional[str] = None, regex: Optional[int] = None, kwargs: dict = None,
+                  cache: Optional[ExtractionCache] = None, sinks: Optional[list] = None, limits: Optional[dict] = None):
+    """
+    Build the warm state (extractor, regex, extraction cache, tracing sinks, memory limits) of a worker process once
+
+    """
+    Document.cache = cache
+    # memory ceiling (max_memory), grace period of MemoryMonitor (grace), and fallback extractor (fallback)
+    Batch.state.update(limits or {})
+    if sinks is not None:
+      Tracer.sinks = sinks
+    Batch.state['cmd'] = cmd
+    Batch.state['e'] = get_extractor(extractor) if cmd != 'U_ANN' else None
+    Batch.state['kwargs'] = dict(kwargs or {})
+    if regex is not None:
+      Batch.state['kwargs']['regex'] = UrlRegex(regex)
+
+  @staticmethod
+  def process(fp: Union[str, Document], fallback: bool = False, bounded: bool = True) -> BatchResult:
+    """
+    Run the command of the current worker process on a PDF, within the memory ceiling of the worker (if any)
+
+    :param fp: path to PDF, or Document
+    :param fallback: if True, run the command with the fallback backends (see get_fallback)
+    :param bounded: if False, run the command without the memory ceiling
+    :return: result of command (error is set instead of result if the command failed)
+    """
+    e, kwargs = Batch.get_fallback() if fallback else (Batch.state['e'], Batch.state['kwargs'])
+    monitor = MemoryMonitor(Batch.state.get('max_memory') if bounded else None, Batch.state.get('grace'))
+    pages = size = None
+    time_start = time.time_ns()
+    try:
+      with monitor, Document.use(fp) as doc:
+        size = len(doc.data)
+        result = run_command(Batch.state['cmd'], doc, e, **kwargs)
+        pages = PyPDF2.get_page_count(doc) or PDFIUM.get_page_count(doc)
+      error = None
+    except Exception as ex:
+      result = None
+      error = f"{type(ex).__name__}: {ex}"
+    time_end = time.time_ns()
+    duration = (time_end - time_start) * 1e-9
+    # stage aggregates of this document (merged back into the sinks of the main process)
+    metrics = Tracer.collect()
+    if pages is None and metrics:
+      # pages converted to text, if no parser that knows the page count was loaded
+      pages = metrics[0].get('pdfm:page_text', {}).get('count')
+    fp = fp.fp if isinstance(fp, Document) else fp
+    return BatchResult(fp, result, duration, error, metrics, monitor.peak, monitor.exceeded, fallback, pages, size)
+
+  @staticmethod
+  def get_fallback() -> Tuple[Optional[Extractor], dict]:
+    """
+    Return the extractor and kwargs of the current worker process to retry documents with after they went over the
+    memory ceiling: the fallback extractor, and PDFium for annotated URLs
+
+    :return: extractor (None for U_ANN), and kwargs
+    """
+    if 'fallback_e' not in Batch.state:
+      name = Batch.state.get('fallback') or 'PDFIUM'
+      Batch.state['fallback_e'] = get_extractor(name) if Batch.state['cmd'] != 'U_ANN' else None
+      Batch.state['fallback_kwargs'] = dict(Batch.state['kwargs'], annotator='PDFIUM')
+    return Batch.state['fallback_e'], Batch.state['fallback_kwargs']
+
+  @staticmethod
+  def process_local(fp: Union[str, Document]) -> BatchResult:
+    # run the command in the current process, and retry with the fallback backends if it went over the ceiling. The
+    # current process cannot be replaced (and may keep the memory it took), so the retry runs without the ceiling
+    result = Batch.process(fp)
+    Tracer.merge(result.metrics or [])
+    if result.over_memory:
+      result = Batch.process(fp, fallback=True, bounded=False)
+      Tracer.merge(result.metrics or [])
+    return result
+
+  @staticmethod
+  def prefetch(fp: str) -> Union[str, Document]:
+    """
+    Open a PDF, and let the extractor of the current worker process start on it ahead of processing
+
+    :param fp: path to PDF
+    :return: Document, or the path to PDF if it failed (so that the error is reported when processing it)
+    """
+    try:
+      doc = Document(fp)
+    except Exception:
+      return fp
+    with contextlib.suppress(Exception):
+      Batch.state['e'].prefetch(doc)
+    return doc
+
+  @staticmethod
+  def run(fps: Iterable[str], cmd: str, extractor: Optional[str] = None, regex: Optional[int] = None,
+          workers: Optional[int] = None, cache: Optional[ExtractionCache] = None, max_memory: Optional[int] = None,
+          fallback: Optional[str] = None, **kwargs) -> Iterator[BatchResult]:
+    """
+    Run a command over many PDFs, yielding results in order of completion. If a memory ceiling is given, a worker
+    that goes over it is replaced, and its document is retried with the fallback backends
+
+    :param fps: paths to PDFs
+    :param cmd: command to run
+    :param extractor: name of extractor (not needed for U_ANN)
+    :param regex: regex option
+    :param workers: number of worker processes (default: CPU count). If 1, run in the current process
+    :param cache: extraction cache to reuse stage outputs from (default: none)
+    :param max_memory: memory ceiling of each worker process, in bytes (default: none)
+    :param fallback: name of extractor to retry documents with after they went over the ceiling (default: PDFIUM)
+    :param kwargs: other extractor arguments (e.g. validator)
+    :return: iterator of results
+    """
+    limits = {'max_memory': max_memory, 'fallback': fallback}
+    if workers == 1:
+      Batch.init_worker(cmd, extractor, regex, kwargs, cache, limits=dict(limits, grace=None))
+      e = Batch.state['e']
+      if e is None or e.prefetch_depth == 0:
+        yield from map(Batch.process_local, fps)
+        return
+      # keep the next documents prefetched while processing one
+      fps = iter(fps)
+      window = collections.deque()
+      while True:
+        window.extend(map(Batch.prefetch, itertools.islice(fps, e.prefetch_depth + 1 - len(window))))
+        if not window:
+          break
+        doc = window.popleft()
+        try:
+          yield Batch.process_local(doc)
+        finally:
+          if isinstance(doc, Document):
+            doc.close()
+      return
+
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    from concurrent.futures.process import BrokenProcessPool
+    workers = workers or os.cpu_count() or 1
+    fps = iter(fps)
+    initargs = (cmd, extractor, regex, kwargs, cache, Tracer.fork(), limits)
+    pool = ProcessPoolExecutor(workers, initializer=Batch.init_worker, initargs=initargs)
+    # documents in flight, with the number of times each was retried, whether it runs with the fallback backends, and
+    # whether it runs alone (see suspects)
+    pending = {}
+    queue = []
+    # documents that were in flight when a worker exited. Any of them may have caused it, so they are retried one at a
+    # time, and a retry is only counted against a document that breaks the pool while running alone
+    suspects = collections.deque()
+    try:
+      while True:
+        # keep a bounded number of documents in flight, so that large inputs are streamed
+        room = 4 * workers - len(pending) - len(queue) - len(suspects)
+        queue.extend((fp, 0, False) for fp in itertools.islice(fps, max(room, 0)))
+        if not (queue or pending or suspects):
+          break
+        if suspects:
+          if not pending:
+            fp, attempt, use_fallback = suspects.popleft()
+            pending[pool.submit(Batch.process, fp, use_fallback)] = (fp, attempt, use_fallback, True)
+        else:
+          for fp, attempt, use_fallback in queue:
+            pending[pool.submit(Batch.process, fp, use_fallback)] = (fp, attempt, use_fallback, False)
+          queue = []
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        recycle = False
+        for future in done:
+          fp, attempt, use_fallback, alone = pending.pop(future)
+          try:
+            result = future.result()
+          except BrokenProcessPool as ex:
+            # a worker exited (e.g. stuck in native code over the ceiling), and took the documents in flight with it
+            recycle = True
+            if not alone:
+              suspects.append((fp, attempt, use_fallback))
+            elif attempt < 3:
+              # use the fallback backends for documents that keep breaking workers
+              suspects.appendleft((fp, attempt + 1, use_fallback or attempt >= 1))
+            else:
+              yield BatchResult(fp, None, 0.0, f"{type(ex).__name__}: {ex}", fallback=use_fallback)
+            continue
+          Tracer.merge(result.metrics or [])
+          if result.over_memory:
+            # replace the worker, as memory freed by the command may not be returned to the system
+            recycle = True
+            if not use_fallback:
+              queue.append((fp, attempt + 1, True))
+              continue
+          yield result
+        if recycle:
+          # wait for the documents that are running (their futures are handled on the next round), retry the ones that
+          # did not start in the new pool (cancelled futures never complete, so they are not waited for)
+          pool.shutdown(wait=True, cancel_futures=True)
+          for future in [future for future in pending if future.cancelled()]:
+            fp, attempt, use_fallback, alone = pending.pop(future)
+            (suspects if alone else queue).append((fp, attempt, use_fallback))
+          pool = ProcessPoolExecutor(workers, initializer=Batch.init_worker, initargs=initargs)
+    finally:
+      pool.shutdown(cancel_futures=True)
+
+
+# ======================================================================================================================
+# SERVER
+# ======================================================================================================================
+
+class Server:
+  """
+  Long-running extraction server. PDFs are posted to a local HTTP (or Unix socket) API, and processed by a pool of
+  worker processes that keep their libraries, regexes, extractors and PDFium/GROBID clients warm between requests.
+  At most one request per worker is processed at once, up to queue_size more wait for a worker, and any beyond that
+  are rejected with 503 (as GROBID does)
+
+  API:
+    POST /<command>?extractor=...&regex=...&annotator=...&name=...  (body: PDF) -> output of command
+    GET /health -> status of server (JSON)
+    GET /metrics -> request counts and durations (JSON)
+
+  """
+
+  # warm state of the current worker process (set by init_worker)
+  state = {}
+
+  def __init__(self, workers: Optional[int] = None, queue_size: Optional[int] = None, timeout: float = 300.0,
+               defaults: Optional[dict] = None, kwargs: Optional[dict] = None, cache: Optional[ExtractionCache] = None):
+    """
+    :param workers: number of worker processes (default: CPU count)
+    :param queue_size: maximum number of requests waiting for a worker (default: 4 per worker)
+    :param timeout: time budget of a request, in seconds
+    :param defaults: default extractor, regex and annotator of requests that do not give one
+    :param kwargs: other extractor arguments (e.g. validator)
+    :param cache: extraction cache to reuse stage outputs from (default: none)
+    """
+    self.workers = workers or os.cpu_count() or 1
+    self.queue_size = 4 * self.workers if queue_size is None else queue_size
+    self.timeout = timeout
+    self.defaults = dict(defaults or {})
+    self.initargs = (kwargs, cache, self.defaults, Tracer.fork())
+    self.lock = threading.Lock()
+    self.pool = self.start_pool()
+    # requests submitted to the pool, and not completed yet
+    self.in_flight = 0
+    self.time_start = time.time()
+    self.counts = collections.Counter()
+    self.durations = {}
+
+  def start_pool(self):
+    """
+    Start the worker pool, and wait until every worker is warm
+
+    :return: worker pool
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    pool = ProcessPoolExecutor(self.workers, initializer=Server.init_worker, initargs=self.initargs)
+    for future in [pool.submit(os.getpid) for _ in range(self.workers)]:
+      future.result()
+    return pool
+
+  @staticmethod
+  def init_worker(kwargs: Optional[dict], cache: Optional[ExtractionCache], defaults: dict,
+                  sinks: Optional[list] = None):
+    """
+    Build the warm state of a worker process once: import the libraries of every extractor, initialize PDFium and
+    the GROBID client, and build the extractor and regex that requests default to
+
+    """
+    import importlib
+    Document.cache = cache
+    Tracer.sinks = sinks or []
+    Server.state['kwargs'] = dict(kwargs or {})
+    Server.state['extractors'] = {}
+    for modules in MODULES.values():
+      for module in modules:
+        with contextlib.suppress(ImportError):
+          importlib.import_module(module)
+    with contextlib.suppress(Exception):
+      PDFIUM.init()
+    with contextlib.suppress(Exception):
+      GROBID.get_client()
+    if defaults.get('extractor') in EXTRACTORS:
+      Server.get_extractor(defaults['extractor'])
+    if defaults.get('regex') is not None:
+      UrlRegex(defaults['regex'])
+
+  @staticmethod
+  def get_extractor(name: str) -> Extractor:
+    # extractor of the current worker process (created once per process)
+    if name not in Server.state['extractors']:
+      Server.state['extractors'][name] = get_extractor(name)
+    return Server.state['extractors'][name]
+
+  @staticmethod
+  def process(cmd: str, name: str, data: bytes, extractor: Optional[str] = None, regex: Optional[int] = None,
+              annotator: Optional[str] = None) -> Tuple[str, float, List[dict]]:
+    """
+    Run a command on a PDF in the current worker process
+
+    :param cmd: command to run
+    :param name: file name of PDF
+    :param data: content of PDF
+    :param extractor: name of extractor (not needed for U_ANN)
+    :param regex: regex option
+    :param annotator: name of annotated URL backend
+    :return: output of command, time taken to run it (in seconds), and stage aggregates (see Tracer.collect)
+    """
+    time_start = time.time_ns()
+    kwargs = dict(Server.state['kwargs'], annotator=annotator)
+    if regex is not None:
+      kwargs['regex'] = UrlRegex(regex)
+    e = Server.get_extractor(extractor) if cmd != 'U_ANN' else None
+    doc = Document(name, data)
+    try:
+      result = run_command(cmd, doc, e, **kwargs)
+    finally:
+      doc.close()
+    time_end = time.time_ns()
+    return result, (time_end - time_start) * 1e-9, Tracer.collect()
+
+  def extract(self, cmd: str, params: Dict[str, str], data: bytes) -> Tuple[int, str]:
+    """
+    Handle an extraction request
+
+    :param cmd: command to run
+    :param params: query parameters of request (extractor, regex, annotator, name)
+    :param data: content of PDF
+    :return: HTTP status, and output of command (or error message)
+    """
+    from concurrent.futures import TimeoutError
+    from concurrent.futures.process import BrokenProcessPool
+    extractor = params.get('extractor', self.defaults.get('extractor'))
+    annotator = params.get('annotator', self.defaults.get('annotator'))
+    if cmd not in COMMANDS:
+      return self.count(cmd, 404, 'Command Does Not Exist!')
+    if cmd != 'U_ANN' and extractor not in EXTRACTORS:
+      return self.count(cmd, 400, 'Extractor Does Not Exist!')
+    if annotator is not None and annotator not in ANNOTATORS:
+      return self.count(cmd, 400, 'Annotator Does Not Exist!')
+    try:
+      regex = int(params['regex']) if 'regex' in params else self.defaults.get('regex')
+    except ValueError:
+      return self.count(cmd, 400, 'Option Does Not Exist!')
+    if len(data) == 0:
+      return self.count(cmd, 400, 'No PDF Given!')
+    # admit request if a worker or a queue slot is free
+    with self.lock:
+      busy = self.in_flight >= self.workers + self.queue_size
+      if not busy:
+        self.in_flight += 1
+      pool = self.pool
+    if busy:
+      return self.count(cmd, 503, 'Service Unavailable')
+    time_start = time.time_ns()
+    name = os.path.basename(params.get('name', 'input.pdf'))
+    args = (cmd, name, data, extractor, regex, annotator)
+    try:
+      try:
+        future = pool.submit(Server.process, *args)
+      except BrokenProcessPool:
+        # a worker died while idle, so replace the pool and try again
+        pool = self.restart_pool(pool)
+        future = pool.submit(Server.process, *args)
+    except Exception:
+      self.release()
+      raise
+    # keep the slot until the worker is done, even if the request times out
+    future.add_done_callback(lambda _: self.release())
+    try:
+      result, duration, metrics = future.result(self.timeout)
+    except TimeoutError:
+      return self.count(cmd, 504, 'Timed Out')
+    except BrokenProcessPool as ex:
+      # a worker died (e.g. crashed on a malformed PDF), so replace the pool
+      self.restart_pool(pool)
+      return self.count(cmd, 500, f"{type(ex).__name__}: {ex}")
+    except NotImplementedError as ex:
+      return self.count(cmd, 400, str(ex))
+    except Exception as ex:
+      return self.count(cmd, 500, f"{type(ex).__name__}: {ex}")
+    time_end = time.time_ns()
+    Tracer.merge(metrics)
+    return self.count(cmd, 200, result, duration, (time_end - time_start) * 1e-9)
+
+  def release(self):
+    with self.lock:
+      self.in_flight -= 1
+
+  def restart_pool(self, pool):
+    """
+    Replace a broken worker pool (unless another request already did)
+
+    :param pool: broken worker pool
+    :return: current worker pool
+    """
+    with self.lock:
+      if self.pool is pool:
+        self.pool = self.start_pool()
+        pool.shutdown(wait=False)
+      return self.pool
+
+  def count(self, cmd: str, status: int, content: str, duration: Optional[float] = None,
+            latency: Optional[float] = None) -> Tuple[int, str]:
+    """
+    Record the outcome of a request in the metrics
+
+    :param cmd: command of request
+    :param status: HTTP status of response
+    :param content: content of response
+    :param duration: time taken to run the command, in seconds (successful requests only)
+    :param latency: time taken to respond, including time spent waiting for a worker (successful requests only)
+    :return: HTTP status, and content of response
+    """
+    with self.lock:
+      self.counts[status] += 1
+      if duration is not None:
+        entry = self.durations.setdefault(cmd, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'wait_seconds': 0.0})
+        entry['count'] += 1
+        entry['seconds'] += duration
+        entry['max_seconds'] = max(entry['max_seconds'], duration)
+        entry['wait_seconds'] += max(latency - duration, 0.0)
+    return status, content
+
+  def get_health(self) -> dict:
+    with self.lock:
+      return {
+        'status': 'ok',
+        'workers': self.workers,
+        'in_flight': self.in_flight,
+        'queued': max(self.in_flight - self.workers, 0),
+      }
+
+  def get_metrics(self) -> dict:
+    health = self.get_health()
+    with self.lock:
+      return {
+        'uptime': time.time() - self.time_start,
+        'workers': self.workers,
+        'queue_size': self.queue_size,
+        'in_flight': health['in_flight'],
+        'queued': health['queued'],
+        'requests': sum(self.counts.values()),
+        'responses': {str(status): n for status, n in sorted(self.counts.items())},
+        'commands': {cmd: dict(entry) for cmd, entry in self.durations.items()},
+      }
+
+  def serve(self, address: str):
+    """
+    Serve requests until interrupted
+
+    :param address: HOST:PORT to listen on, or path to a Unix socket
+    """
+    import signal
+    import socketserver
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import urlsplit, parse_qsl
+    server = self
+
+    class Handler(BaseHTTPRequestHandler):
+      # keep connections alive between requests
+      protocol_version = 'HTTP/1.1'
+
+      def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/health':
+          self.reply(200, json.dumps(server.get_health()), 'application/json')
+        elif path == '/metrics':
+          self.reply(200, json.dumps(server.get_metrics()), 'application/json')
+        else:
+          self.reply(404, 'Not Found', 'text/plain')
+
+      def do_POST(self):
+        url = urlsplit(self.path)
+        data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        status, content = server.extract(url.path.strip('/'), dict(parse_qsl(url.query)), data)
+        self.reply(status, content, 'text/plain')
+
+      def reply(self, status: int, content: str, content_type: str):
+        data = content.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', f"{content_type}; charset=utf-8")
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+      def address_string(self) -> str:
+        # clients of a Unix socket have no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    if ':' in address and os.path.sep not in address:
+      host, port = address.rsplit(':', 1)
+      httpd = ThreadingHTTPServer((host or 'localhost', int(port)), Handler)
+    else:
+      class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+      with contextlib.suppress(FileNotFoundError):
+        os.remove(address)
+      httpd = UnixHTTPServer(address, Handler)
+    print(f'Extraction server listening on {address} with {self.workers} workers', file=sys.stderr)
+    # shut down cleanly when stopped by a service manager, too
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+      httpd.serve_forever()
+    except KeyboardInterrupt:
+      pass
+    finally:
+      httpd.server_close()
+      self.pool.shutdown(cancel_futures=True)
+      if isinstance(httpd, socketserver.UnixStreamServer):
+        with contextlib.suppress(FileNotFoundError):
+          os.remove(address)
+
+
 # ======================================================================================================================
 # MAIN EXECUTION
 # ======================================================================================================================
@@ -507,50 +3629,204 @@ if __name__ == '__main__':
   import argparse
 
   parser = argparse.ArgumentParser(description='Link Extractor')
-  parser.add_argument('-c', required=True, help="command to run", choices=['U_ANN', 'TXT', 'U_TXT', 'U_ALL'])
-  parser.add_argument('-e', required=False, help="extractor to use", choices=['PDFM', 'PDFIUM', 'GROB'])
+  parser.add_argument('-c', required=False, help="command to run (required unless serving)", choices=COMMANDS)
+  parser.add_argument('-e', required=False, help="extractor to use", choices=list(EXTRACTORS))
   parser.add_argument('-r', metavar='OPTION_NUMBER', required=False, help="regex option to use", type=int)
-  parser.add_argument('-i', metavar='INPUT_FILE', required=True, help="path to input file", type=str)
-  parser.add_argument('-o', metavar='OUTPUT_FILE', required=False, help="path to output file", type=str)
+  parser.add_argument('-a', required=False, default='PYPDF2', choices=list(ANNOTATORS),
+                      help="annotated URL backend to use (default: PYPDF2)")
+  parser.add_argument('-i', metavar='INPUT_FILE', required=False, type=str,
+                      help="path to input file (or directory, glob, or manifest of input files for batch mode; "
+                           "required unless serving)")
+  parser.add_argument('-o', metavar='OUTPUT_FILE', required=False, type=str,
+                      help="path to output file (or output directory for batch mode)")
+  parser.add_argument('-j', metavar='WORKERS', required=False, type=int,
+                      help="number of worker processes for batch and server mode (default: CPU count)")
+  parser.add_argument('--page-workers', metavar='WORKERS', required=False, type=int,
+                      help="number of processes to split the pages of each PDF across (PDFM only, for large PDFs; "
+                           "default: 1)")
+  parser.add_argument('--online', action='store_true', help="verify that URLs are reachable (instead of syntax only)")
+  parser.add_argument('--deadline', metavar='SECONDS', required=False, default=60.0, type=float,
+                      help="time budget to verify the URLs of each document online (default: 60)")
+  parser.add_argument('--url-cache', metavar='CACHE_FILE', required=False, type=str,
+                      help="path to a persistent cache of URL verdicts, shared across runs and workers")
+  parser.add_argument('--url-cache-ttl', metavar='SECONDS', required=False, type=float,
+                      help="time-to-live of cached URL verdicts (default: no expiry)")
+  parser.add_argument('--cache-dir', metavar='CACHE_DIR', required=False, type=str,
+                      help="path to a cache of extracted text, TEI-XML and URLs, shared across runs and workers")
+  parser.add_argument('--cache-size', metavar='MEGABYTES', required=False, default=1024, type=int,
+                      help="maximum size of the extraction cache (default: 1024)")
+  parser.add_argument('--serve', metavar='ADDRESS', required=False, type=str,
+                      help="run as a server on HOST:PORT (or a Unix socket path), with -e, -r and -a as the defaults "
+                           "of requests")
+  parser.add_argument('--queue-size', metavar='REQUESTS', required=False, type=int,
+                      help="maximum number of requests waiting for a worker in server mode (default: 4 per worker)")
+  parser.add_argument('--timeout', metavar='SECONDS', required=False, default=300.0, type=float,
+                      help="time budget of each request in server mode (default: 300)")
+  parser.add_argument('--max-memory', metavar='MEGABYTES', required=False, type=int,
+                      help="memory ceiling of each worker process. Workers that go over it are replaced, and their "
+                           "document is retried with the fallback extractor (default: none)")
+  parser.add_argument('--ensemble', metavar='EXTRACTOR', required=False, nargs='+',
+                      choices=[name for name in EXTRACTORS if name != 'ENSEMBLE'],
+                      help="with -e ENSEMBLE, extractors to run, in order of precedence (default: GROB PDFM PDFIUM)")
+  parser.add_argument('--ensemble-deadline', metavar='SECONDS', required=False, type=float,
+                      help="with -e ENSEMBLE, time budget of each document (default: 10)")
+  parser.add_argument('--fallback', required=False, default='PDFIUM', choices=list(EXTRACTORS),
+                      help="extractor to retry documents with after they go over --max-memory (default: PDFIUM)")
+  parser.add_argument('--trace', metavar='TRACE_FILE', required=False, type=str,
+                      help="path to append a JSONL record of each pipeline stage to (duration, sizes, URL counts)")
+  parser.add_argument('--metrics', metavar='METRICS_FILE', required=False, type=str,
+                      help="path to write per-stage metrics to on exit (Prometheus text format)")
+  parser.add_argument('--timing', metavar='TIMING_FILE', required=False, type=str,
+                      help="path to append a JSONL timing record of each document to (see timeit.py)")
+  parser.add_argument('--profile-startup', action='store_true',
+                      help="report the time taken to import the modules of a command (-c, -e, -a), and to build "
+                           "its regexes (-r), and exit")
+  parser.add_argument('--startup-budget', metavar='MILLISECONDS', required=False, type=float,
+                      help="with --profile-startup, fail if imports take longer than this (regex builds excluded)")
   args = parser.parse_args()
+  if args.profile_startup:
+    if args.c is None:
+      parser.error('the following arguments are required: -c')
+    # CPU time of interpreter startup and of loading this file (imports included)
+    durations = [('main', time.process_time())]
+    durations += profile_imports(get_modules(args.c, args.e, args.a, args.online))
+    total = sum(duration for _, duration in durations)
+    for module, duration in durations:
+      print(f'{module:<24} {duration * 1e3:9.1f} ms')
+    print(f'{"total (imports)":<24} {total * 1e3:9.1f} ms')
+    # regexes are built on first use, so they are reported apart from (and not checked against) the import budget
+    builds = profile_regexes(args.r)
+    for name, duration in builds:
+      print(f'{name:<24} {duration * 1e3:9.1f} ms')
+    print(f'{"total (regexes)":<24} {sum(duration for _, duration in builds) * 1e3:9.1f} ms')
+    if args.startup_budget is not None and total * 1e3 > args.startup_budget:
+      sys.exit(f'imports took {total * 1e3:.1f} ms, over the budget of {args.startup_budget} ms')
+    sys.exit(0)
+  if args.serve is None and (args.c is None or args.i is None):
+    parser.error('the following arguments are required: -c, -i')
+  if args.serve is not None and args.page_workers:
+    parser.error('--page-workers is not supported in server mode')
+  if args.serve is not None and args.max_memory:
+    parser.error('--max-memory is not supported in server mode')
+  if args.serve is not None and args.timing:
+    parser.error('--timing is not supported in server mode (see --metrics)')
+  max_memory = args.max_memory * 2 ** 20 if args.max_memory else None
+
+  # prepare tracing sinks (tracing is disabled without any)
+  if args.trace:
+    Tracer.sinks.append(JsonlSink(args.trace))
+  if args.metrics:
+    Tracer.sinks.append(MetricsSink(args.metrics))
+  if args.timing and not any(isinstance(sink, MetricsSink) for sink in Tracer.sinks):
+    # aggregate stages in memory only, to time the stages of each document
+    Tracer.sinks.append(MetricsSink())
+  if Tracer.sinks:
+    import atexit
+    atexit.register(Tracer.close)
+
+  # prepare extraction cache
+  cache = ExtractionCache(args.cache_dir, args.cache_size * 2 ** 20) if args.cache_dir else None
+
+  # prepare kwargs shared by all inputs
+  shared_kw = {'annotator': args.a}
+  if args.page_workers:
+    shared_kw['page_workers'] = args.page_workers
+  if args.ensemble:
+    shared_kw['ensemble'] = args.ensemble
+  if args.ensemble_deadline is not None:
+    shared_kw['ensemble_deadline'] = args.ensemble_deadline
+  if args.online or args.url_cache:
+    shared_kw['validator'] = Validator(
+      online=args.online,
+      verifier=Verifier(deadline=args.deadline) if args.online else None,
+      cache=ValidationCache(args.url_cache, args.url_cache_ttl) if args.url_cache else None
+    )
 
-  # execute command
-  if args.c == 'U_ANN':
-    time_start = time.time_ns()
-    result = "\n".join(sorted(PyPDF2.get_annot_urls(args.i)))
-    time_end = time.time_ns()
-  else:
-    # select extractor to use
-    if args.e == 'PDFM':
-      e = PDFMExtractor()
-    elif args.e == 'PDFIUM':
-      e = PDFIUMExtractor()
-    elif args.e == 'GROB':
-      e = GROBExtractor()
-    else:
-      raise NotImplementedError('Extractor Does Not Exist!')
-    # prepare kwargs
-    kw = {}
+  # prepare timing records (one per document, tagged with the run and its options)
+  timing_info = {
+    'run': f'{time.strftime("%Y%m%dT%H%M%S")}-{os.getpid()}', 'command': args.c,
+    'extractor': args.e if args.c != 'U_ANN' else None, 'annotator': args.a if args.c in ['U_ANN', 'U_ALL'] else None,
+    'regex': args.r,
+  }
+
+  def write_timing(r: BatchResult):
+    if args.timing:
+      with open(args.timing, 'a') as f_timing:
+        f_timing.write(json.dumps({'time': time.time(), **r.get_record(**timing_info)}) + '\n')
+
+  if args.serve is not None:
+    # serve requests with warm worker processes
+    defaults = {'extractor': args.e, 'regex': args.r, 'annotator': args.a}
+    kw = {key: value for key, value in shared_kw.items() if key != 'annotator'}
+    Server(args.j, args.queue_size, args.timeout, defaults, kw, cache).serve(args.serve)
+  elif os.path.isfile(args.i) and args.i.lower().endswith('.pdf'):
+    # prepare extractor and kwargs
+    Document.cache = cache
+    e = get_extractor(args.e) if args.c != 'U_ANN' else None
+    kw = dict(shared_kw)
     if args.r is not None:
       kw['regex'] = UrlRegex(args.r)
-    # run extractor
+    # execute command (and retry with the fallback backends, without the ceiling, if it goes over the memory ceiling)
     time_start = time.time_ns()
-    if args.c == 'TXT':
-      result = e.get_text(args.i)
-    elif args.c == 'U_TXT':
-      result = "\n".join(e.get_text_urls(args.i, **kw))
-    elif args.c == 'U_ALL':
-      result = "\n".join(e.get_all_urls(args.i, **kw))
-    else:
-      raise NotImplementedError('Command Does Not Exist!')
+    monitor = MemoryMonitor(max_memory, grace=None)
+    try:
+      with monitor, Document.use(args.i) as doc:
+        result = run_command(args.c, doc, e, **kw)
+        pages = PyPDF2.get_page_count(doc) or PDFIUM.get_page_count(doc)
+    except MemoryLimitExceeded:
+      pass
+    # retry even if the command completed, as MemoryLimitExceeded may have been swallowed by a handler within it
+    over_memory = fallback = monitor.exceeded
+    if over_memory:
+      print(f'exceeded {args.max_memory} MB, retrying with {args.fallback}', file=sys.stderr)
+      e = get_extractor(args.fallback) if args.c != 'U_ANN' else None
+      kw['annotator'] = 'PDFIUM'
+      with MemoryMonitor() as monitor, Document.use(args.i) as doc:
+        result = run_command(args.c, doc, e, **kw)
+        pages = PyPDF2.get_page_count(doc) or PDFIUM.get_page_count(doc)
     time_end = time.time_ns()
 
-  duration = (time_end - time_start) * 1e-9
-  print(f'generated in {duration} seconds')
-
-  # write output
-  if args.o:
-    with open(args.o, 'w') as f_out:
-      f_out.write(result)
+    duration = (time_end - time_start) * 1e-9
+    print(f'generated in {duration} seconds (peak memory: {monitor.peak / 2 ** 20:.1f} MB)')
+    metrics = Tracer.collect()
+    Tracer.merge(metrics)
+    if pages is None and metrics:
+      pages = metrics[0].get('pdfm:page_text', {}).get('count')
+    write_timing(BatchResult(args.i, result, duration, None, metrics, monitor.peak, over_memory, fallback, pages,
+                             os.path.getsize(args.i)))
+
+    # write output
+    if args.o:
+      with open(args.o, 'w') as f_out:
+        f_out.write(result)
+    else:
+      print(result)
   else:
-    print(result)
+    # validate arguments before spawning workers
+    if args.c != 'U_ANN' and args.e not in EXTRACTORS:
+      raise NotImplementedError('Extractor Does Not Exist!')
+    if args.o:
+      os.makedirs(args.o, exist_ok=True)
+    info = f"[Command: {args.c}]"
+    if args.c != 'U_ANN':
+      info += f" [Executor: {args.e}]"
+    if args.r is not None:
+      info += f" [Regex: {args.r}]"
+    # execute command on each input, and stream results as they complete
+    results = Batch.run(Batch.list_inputs(args.i), args.c, args.e, args.r, args.j, cache, max_memory, args.fallback,
+                        **shared_kw)
+    for r in results:
+      write_timing(r)
+      print(f'File: {r.fp} {info}')
+      if r.fallback:
+        print(f'exceeded {args.max_memory} MB, retried with {args.fallback}', file=sys.stderr)
+      if r.error is not None:
+        print(f'failed in {r.duration} seconds: {r.error}', file=sys.stderr)
+        continue
+      print(f'generated in {r.duration} seconds (peak memory: {(r.peak_memory or 0) / 2 ** 20:.1f} MB)')
+      # write output
+      if args.o:
+        with open(os.path.join(args.o, Batch.get_output_name(r.fp, args.c, args.e, args.r)), 'w') as f_out:
+          f_out.write(r.result)
+      else:
+        print(r.result)
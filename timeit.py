@@ -1,7 +1,14 @@
 #!/usr/bin/env python3
 
 import glob
+import json
+import math
+import os.path
 import re
+import sys
+from typing import List, Optional, Tuple
+
+import numpy as np
 import pandas as pd
 
 pd.options.display.max_columns = None
@@ -9,63 +16,206 @@ pd.options.display.max_rows = None
 pd.options.display.max_colwidth = None
 pd.options.display.expand_frame_repr = False
 
+KEYS = ['command', 'extractor', 'regex']
+EPSILON = 1e-10  # small constant to avoid ZeroDivisionError
+
+
+def read_records(fp: str) -> List[dict]:
+  # read the timing records written by main.py --timing (one JSON object per line)
+  with open(fp) as f:
+    return [json.loads(line) for line in f if line.strip()]
+
+
+def read_legacy(fp: str, n: int) -> List[dict]:
+  # read a timing-run-*.txt file (the stdout of main.py), as records without stages, pages and bytes
+  with open(fp) as f:
+    lines = f.readlines()
+  records = []
+  for i in range(0, len(lines) - 1, 2):
+    info = lines[i].strip().rsplit('/')[-1]
+    item = {'run': f'{os.path.basename(fp)}-{n}', 'document': info.split(' [', 1)[0]}
+    for m in re.finditer(r'\[(\w+):\s(\w+)\]', info):
+      item[{'executor': 'extractor'}.get(m.group(1).lower(), m.group(1).lower())] = m.group(2)
+    item['duration'] = float(lines[i + 1].strip().split(' ')[2])
+    records.append(item)
+  return records
+
+
+def load(paths: List[str]) -> pd.DataFrame:
+  """
+  Load timing records into a frame, from JSONL files written by main.py --timing, or from directories of such files
+  (*.jsonl) and of timing-run-*.txt files
+
+  :param paths: paths to timing files or directories
+  :return: one row per document and run (run, document, command, extractor, regex, duration, pages, bytes, stages)
+  """
+  records = []
+  for path in paths:
+    if os.path.isdir(path):
+      for fp in sorted(glob.glob(f'{path}/*.jsonl')):
+        records += read_records(fp)
+      for n, fp in enumerate(sorted(glob.glob(f'{path}/timing-run-*.txt'))):
+        records += read_legacy(fp, n)
+    else:
+      records += read_records(path)
+  df = pd.DataFrame(records, dtype=object)
+  for col in ['run', 'document'] + KEYS:
+    df[col] = df[col].map(lambda value: '-' if pd.isna(value) else str(value)) if col in df else '-'
+  df['duration'] = df['duration'].astype(float)
+  for col in ['pages', 'bytes']:
+    df[col] = pd.to_numeric(df[col], errors='coerce') if col in df else np.nan
+  if 'stages' not in df:
+    df['stages'] = [{}] * len(df)
+  # documents that failed have no timing to compare
+  if 'error' in df:
+    df = df[df['error'].isna()]
+  return df.reset_index(drop=True)
+
+
+def summarize(df: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+  """
+  Summarize the durations of each group: distribution over documents and runs, throughput, and the variation of the
+  total duration across runs
+
+  :param df: timing records (see load)
+  :param keys: columns to group by
+  :return: n, median, p95, p99, mean, pages/s, MB/s and cv (of the total duration of each run), indexed by keys
+  """
+  grouped = df.groupby(keys)['duration']
+  summary = pd.DataFrame({
+    'n': grouped.size(),
+    'median': grouped.median(),
+    'p95': grouped.quantile(0.95),
+    'p99': grouped.quantile(0.99),
+    'mean': grouped.mean(),
+  })
+  # throughput over the documents whose pages (or bytes) are known
+  for col, name, scale in [('pages', 'pages/s', 1), ('bytes', 'MB/s', 2 ** 20)]:
+    known = df[df[col].notna()]
+    total = known.groupby(keys)[[col, 'duration']].sum()
+    summary[name] = (total[col] / scale / np.maximum(total['duration'], EPSILON)).reindex(summary.index)
+  # coefficient of variation of the total duration of each run (NaN with a single run)
+  totals = df.groupby(keys + ['run'])['duration'].sum().groupby(level=keys)
+  summary['runs'] = totals.size()
+  summary['cv'] = totals.std() / np.maximum(totals.mean(), EPSILON)
+  return summary.sort_index()
+
+
+def summarize_stages(df: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+  """
+  Summarize the duration of each stage of each group (over the documents that ran the stage)
+
+  :param df: timing records (see load)
+  :param keys: columns to group by
+  :return: median and p95 of the duration of each stage, indexed by keys and stage
+  """
+  rows = [(*row[keys], stage, seconds) for _, row in df.iterrows() for stage, seconds in row['stages'].items()]
+  stages = pd.DataFrame(rows, columns=keys + ['stage', 'seconds'])
+  grouped = stages.groupby(keys + ['stage'])['seconds']
+  return pd.DataFrame({'median': grouped.median(), 'p95': grouped.quantile(0.95)}).sort_index()
+
+
+def wilcoxon(diffs: np.ndarray) -> float:
+  """
+  Two-sided p-value of the Wilcoxon signed-rank test that paired differences are centered on zero. The null
+  distribution is computed exactly for up to 25 pairs without ties, and approximated by a normal distribution
+  (with a correction for ties) otherwise
+
+  :param diffs: paired differences
+  :return: p-value (1.0 if every difference is zero)
+  """
+  diffs = diffs[diffs != 0]
+  n = len(diffs)
+  if n == 0:
+    return 1.0
+  abs_diffs = np.abs(diffs)
+  ranks = pd.Series(abs_diffs).rank().to_numpy()
+  w = ranks[diffs > 0].sum()
+  _, ties = np.unique(abs_diffs, return_counts=True)
+  if n <= 25 and (ties == 1).all():
+    # number of subsets of ranks 1..n with each rank sum
+    counts = np.zeros(n * (n + 1) // 2 + 1)
+    counts[0] = 1
+    for rank in range(1, n + 1):
+      counts[rank:] = counts[rank:] + counts[:-rank].copy()
+    cdf = np.cumsum(counts) / counts.sum()
+    k = int(min(w, n * (n + 1) / 2 - w))
+    return float(min(1.0, 2 * cdf[k]))
+  mean = n * (n + 1) / 4
+  var = n * (n + 1) * (2 * n + 1) / 24 - (ties ** 3 - ties).sum() / 48
+  z = (abs(w - mean) - 0.5) / math.sqrt(max(var, EPSILON))
+  return float(min(1.0, math.erfc(max(z, 0) / math.sqrt(2))))
+
+
+def compare(baseline: pd.DataFrame, df: pd.DataFrame, keys: List[str], alpha: float) -> Tuple[pd.DataFrame, bool]:
+  """
+  Compare the durations of each group against a baseline, pairing documents (on their median duration over runs)
+
+  :param baseline: timing records of the baseline (see load)
+  :param df: timing records to compare (see load)
+  :param keys: columns to group by
+  :param alpha: significance level
+  :return: pairs, baseline and current median, ratio, p-value and verdict of each group; and whether any group is
+    significantly slower
+  """
+  base = baseline.groupby(keys + ['document'])['duration'].median().rename('baseline')
+  curr = df.groupby(keys + ['document'])['duration'].median().rename('current')
+  paired = pd.concat([base, curr], axis=1, join='inner').reset_index()
+  rows = []
+  for key, group in paired.groupby(keys):
+    diffs = (group['current'] - group['baseline']).to_numpy()
+    p = wilcoxon(diffs)
+    ratio = group['current'].median() / max(group['baseline'].median(), EPSILON)
+    verdict = '-' if p >= alpha else 'slower' if np.median(diffs) > 0 else 'faster'
+    rows.append((*key, len(group), group['baseline'].median(), group['current'].median(), ratio, p, verdict))
+  table = pd.DataFrame(rows, columns=keys + ['pairs', 'baseline', 'current', 'ratio', 'p', 'verdict'])
+  table = table.set_index(keys).sort_index()
+  return table, bool((table['verdict'] == 'slower').any())
+
+
+def run(paths: List[str], prefix: Optional[str] = None, baseline: Optional[List[str]] = None, alpha: float = 0.05,
+        by_file: bool = False, stages: bool = False) -> bool:
+  df = load(paths)
+
+  print('============================\nOVERALL\n============================')
+  summary = summarize(df, KEYS)
+  print(summary, end='\n\n')
+  if prefix:
+    summary.to_csv(f"{prefix.rstrip(' /')}-summary.csv")
+
+  if stages:
+    print('============================\nSTAGES\n============================')
+    print(summarize_stages(df, KEYS), end='\n\n')
+
+  if by_file:
+    print('============================\nPER FILE\n============================')
+    print(summarize(df, KEYS + ['document'])[['n', 'median', 'p95', 'mean', 'pages/s', 'MB/s']], end='\n\n')
 
-def run(fp: str, op: str):
-  # read from all files
-  data = []
-  files = glob.glob(f'{fp}/timing-run-*.txt')
-  for n, file in enumerate(files):
-    with open(file) as f:
-      lines = f.readlines()
-    for i in range(0, len(lines) - 1, 2):
-      info = lines[i].strip().rsplit('/')[-1]
-      item = {'file': info.split(' [', 1)[0], 'n': n}
-      for m in re.finditer(r'\[(\w+):\s(\w+)\]', info):
-        item[m.group(1).lower()] = m.group(2)
-      item['value'] = float(lines[i + 1].strip().split(' ')[2])
-      data.append(item)
-
-  # create dataframe
-  df = pd.DataFrame(data).fillna('-')
-
-  # extract specific slices (regardless of file)
-  val_col = ['value']
-  ann_col = []
-  txt_col = ['executor']
-  url_col = ['executor', 'regex']
-
-  print('\n============================\nOVERALL\n============================')
-  print('\n=====U_ANN=====')
-  print(df[df['command'] == 'U_ANN'][ann_col + val_col].mean().sort_index())
-  print('\n=====TXT=====')
-  print(df[df['command'] == 'TXT'][txt_col + val_col].groupby(txt_col).mean().sort_index())
-  print('\n=====U_TXT=====')
-  print(df[df['command'] == 'U_TXT'][url_col + val_col].groupby(url_col).mean().sort_index())
-  print('\n=====U_ALL=====')
-  print(df[df['command'] == 'U_ALL'][url_col + val_col].groupby(url_col).mean().sort_index())
-
-  # extract specific slices (with files)
-  val_col = ['value']
-  ann_col = ['file']
-  txt_col = ['file', 'executor']
-  url_col = ['file', 'executor', 'regex']
-
-  print('\n============================\nPER FILE\n============================')
-  print('\n=====U_ANN=====')
-  print(df[df['command'] == 'U_ANN'][ann_col + val_col].groupby(ann_col).mean().sort_index())
-  print('\n=====TXT=====')
-  print(df[df['command'] == 'TXT'][txt_col + val_col].groupby(txt_col).mean().sort_index())
-  print('\n=====U_TXT=====')
-  print(df[df['command'] == 'U_TXT'][url_col + val_col].groupby(url_col).mean().sort_index())
-  print('\n=====U_ALL=====')
-  print(df[df['command'] == 'U_ALL'][url_col + val_col].groupby(url_col).mean().sort_index())
+  if not baseline:
+    return True
+  print('============================\nCOMPARISON\n============================')
+  table, slower = compare(load(baseline), df, KEYS, alpha)
+  print(table, end='\n\n')
+  if prefix:
+    table.to_csv(f"{prefix.rstrip(' /')}-compare.csv")
+  if slower:
+    print(f'significantly slower than the baseline (alpha={alpha})', file=sys.stderr)
+  return not slower
 
 
 if __name__ == '__main__':
   import argparse
 
   parser = argparse.ArgumentParser(description='Timing Summary Generator')
-  parser.add_argument('-i', metavar="INPUT_PATH", required=True, help="path to timing information directory", type=str)
+  parser.add_argument('-i', metavar="INPUT_PATH", required=True, nargs='+', type=str,
+                      help="paths to timing files (main.py --timing) or directories (of *.jsonl or timing-run-*.txt)")
   parser.add_argument('-o', metavar="OUTPUT_PATH", required=False, help="path (with prefix) to output csv", type=str)
+  parser.add_argument('-b', metavar="BASELINE_PATH", required=False, nargs='+', type=str,
+                      help="timing files or directories to compare against (fails if significantly slower)")
+  parser.add_argument('--alpha', metavar="LEVEL", required=False, default=0.05, type=float,
+                      help="significance level of the comparison (default: 0.05)")
+  parser.add_argument('--files', action='store_true', help="also print timings per file")
+  parser.add_argument('--stages', action='store_true', help="also print timings per stage")
   args = parser.parse_args()
-  run(str(args.i).rstrip('/ '), args.o)
+  ok = run([str(path).rstrip('/ ') for path in args.i], args.o, args.b, args.alpha, args.files, args.stages)
+  sys.exit(0 if ok else 1)
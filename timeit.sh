@@ -1,6 +1,9 @@
 #!/usr/bin/env sh
 
-for i in $(seq 1 10); do
-  echo "round $i of 10"
-  sh -c "make | awk '/^File: / || /^generated in/' | tee test/timing-run-$i.txt"
-done
\ No newline at end of file
+# time each command, extractor and regex option in-process (10 rounds per PDF), and compare against a baseline if
+# one is given, e.g. ./timeit.sh test/benchmark-baseline.json
+if [ -n "$1" ]; then
+  ./benchmark.py -b pipeline -n 10 --json test/benchmark.json --baseline "$1"
+else
+  ./benchmark.py -b pipeline -n 10 --json test/benchmark.json
+fi